@@ -0,0 +1,69 @@
+"""Micro-benchmark: per-file cost of post-download filter evaluation.
+
+Times `post_filter.evaluate` over synthetic paths three ways:
+  - an empty plan (the floor: a call and a FilterDecision),
+  - raw `Filters` (compiled again for every file, as evaluate did before
+    FilterPlan),
+  - a `FilterPlan` compiled once, as Run does.
+
+Only suffix and pattern filters are configured, so no file is opened and
+the numbers are the evaluation overhead alone. Run from the repo root:
+
+    uv run python scripts/bench_filters.py [--files N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+from icloudpd_web.runner.post_filter import FilterPlan, compile_filters, evaluate
+from icloudpd_web.store.models import Filters
+
+
+FILTERS = Filters(
+    file_suffixes=["heic", ".jpg", ".jpeg", ".dng", ".mov"],
+    match_patterns=[r"^IMG_\d{4}", r"^PXL_\d{8}_", r"(?i)screenshot", r"\(\d+\)\."],
+)
+
+
+def _paths(n: int) -> list[Path]:
+    names = ["IMG_{:04d}.HEIC", "PXL_2026{:04d}_123.jpg", "clip_{}.MOV", "IMG_{:04d} (1).png"]
+    return [Path("/photos") / names[i % len(names)].format(i % 10000) for i in range(n)]
+
+
+def _per_file_us(paths: list[Path], filters: Filters | FilterPlan, repeat: int) -> float:
+    def one_pass() -> None:
+        for p in paths:
+            evaluate(p, filters)
+
+    best = min(timeit.repeat(one_pass, number=1, repeat=repeat))
+    return best / len(paths) * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    paths = _paths(args.files)
+    plan = compile_filters(FILTERS)
+    floor = _per_file_us(paths, compile_filters(Filters()), args.repeat)
+    raw = _per_file_us(paths, FILTERS, args.repeat)
+    compiled = _per_file_us(paths, plan, args.repeat)
+    compile_us = min(timeit.repeat(lambda: compile_filters(FILTERS), number=100, repeat=3)) * 1e4
+
+    print(f"{args.files} paths, best of {args.repeat}")
+    print(f"  empty plan (floor)     {floor:7.2f} us/file")
+    print(f"  Filters, per file      {raw:7.2f} us/file")
+    print(f"  FilterPlan             {compiled:7.2f} us/file  ({raw / compiled:.1f}x faster)")
+    print(f"  compile_filters, once  {compile_us:7.2f} us")
+    print(f"  plan overhead over floor: {compiled - floor:.2f} us/file")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
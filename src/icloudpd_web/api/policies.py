@@ -1,18 +1,15 @@
 from __future__ import annotations
 
-import json
-from datetime import UTC, datetime
-from pathlib import Path
-
 import tomli_w
 import tomllib
 from fastapi import APIRouter, Depends, Request, Response
 from pydantic import BaseModel
 from pydantic import ValidationError as PydanticValidationError
 
+from icloudpd_web.api.summary import policy_summary
 from icloudpd_web.auth import require_auth
 from icloudpd_web.errors import ApiError, ValidationError
-from icloudpd_web.store.models import Policy, RunSummary
+from icloudpd_web.store.models import Policy
 
 
 router = APIRouter(
@@ -26,68 +23,10 @@ class PasswordBody(BaseModel):
     password: str
 
 
-def _load_last_run(policy_name: str, data_dir: Path) -> RunSummary | None:
-    """Load the most recent run sidecar for *policy_name*, or return None."""
-    runs_dir = data_dir / "runs" / policy_name
-    if not runs_dir.is_dir():
-        return None
-    sidecars = list(runs_dir.glob("*.meta.json"))
-    if not sidecars:
-        return None
-    # Pick the one with the greatest ended_at string (ISO timestamps sort lexicographically).
-    best: dict | None = None
-    for path in sidecars:
-        try:
-            meta = json.loads(path.read_text("utf-8"))
-        except (OSError, json.JSONDecodeError):
-            continue
-        if best is None or (meta.get("ended_at") or "") > (best.get("ended_at") or ""):
-            best = meta
-    if best is None:
-        return None
-    try:
-        return RunSummary(
-            run_id=best["run_id"],
-            started_at=best["started_at"],
-            ended_at=best.get("ended_at"),
-            status=best["status"],
-            exit_code=best.get("exit_code"),
-            error_id=best.get("error_id"),
-        )
-    except Exception:
-        return None
-
-
-def _summary(p: Policy, request: Request) -> dict:
-    scheduler = request.app.state.scheduler
-    runner = request.app.state.runner
-    data_dir: Path = request.app.state.data_dir
-    secret_store = request.app.state.secret_store
-    data = p.model_dump(mode="json")
-    if p.enabled:
-        data["next_run_at"] = scheduler.next_run_at(p, after=datetime.now(UTC)).isoformat()
-    else:
-        data["next_run_at"] = None
-    data["is_running"] = runner.is_running(p.name)
-    active = runner.active_run(p.name)
-    # Only report an active_run_id if the run is still in-flight (running
-    # or awaiting MFA). Terminal statuses (success/failed/stopped) leave
-    # the slot cleared by _on_complete, but guard here for races.
-    data["active_run_id"] = (
-        active.run_id
-        if active is not None and active.status in ("running", "awaiting_mfa")
-        else None
-    )
-    last_run = _load_last_run(p.name, data_dir)
-    data["last_run"] = last_run.model_dump(mode="json") if last_run is not None else None
-    data["has_password"] = secret_store.get(p.name) is not None
-    return data
-
-
 @router.get("")
 def list_policies(request: Request) -> list[dict]:
     store = request.app.state.policy_store
-    return [_summary(p, request) for p in store.all()]
+    return [policy_summary(p, request) for p in store.all()]
 
 
 @router.get("/export")
@@ -163,7 +102,7 @@ def get_policy(name: str, request: Request) -> dict:
     p = store.get(name)
     if p is None:
         raise ApiError("Policy not found", status_code=404)
-    return _summary(p, request)
+    return policy_summary(p, request)
 
 
 @router.put("/{name}")
@@ -177,7 +116,7 @@ def put_policy(name: str, body: dict, request: Request) -> dict:
         field = ".".join(str(x) for x in first["loc"])
         raise ValidationError(first["msg"], field=field) from None
     request.app.state.policy_store.put(policy)
-    return _summary(policy, request)
+    return policy_summary(policy, request)
 
 
 @router.delete("/{name}")
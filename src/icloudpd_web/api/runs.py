@@ -1,17 +1,36 @@
 from __future__ import annotations
 
-import json
+import contextlib
+import gzip
+import re
+from collections.abc import Iterator
+from dataclasses import asdict
+from datetime import datetime
 from pathlib import Path
 
-from fastapi import APIRouter, Depends, Request
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from pydantic import BaseModel
 
 from icloudpd_web.auth import require_auth
-from icloudpd_web.errors import ApiError
+from icloudpd_web.errors import ApiError, ValidationError
+from icloudpd_web.integrations.aws_sync import sync_log_path
+from icloudpd_web.runner.log_reader import read_lines, tail_lines
+from icloudpd_web.runner.log_search import LEVELS
+from icloudpd_web.runner.log_storage import find_log, is_compressed, open_log
 
 
 router = APIRouter(tags=["runs"], dependencies=[Depends(require_auth)])
 
+MAX_TAIL_LINES = 100_000
+MAX_LOG_PAGE_BYTES = 16 * 1024 * 1024
+DEFAULT_LOG_PAGE_BYTES = 1024 * 1024
+LOG_STREAM_CHUNK = 64 * 1024
+MAX_SEARCH_QUERY = 500
+MAX_SEARCH_RESULTS = 1000
+# A single byte range: "bytes=first-last", "bytes=first-" or "bytes=-suffix".
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)")
+
 
 @router.post("/policies/{name}/runs")
 async def start_run(name: str, request: Request) -> dict:
@@ -32,6 +51,29 @@ async def start_run(name: str, request: Request) -> dict:
     return {"run_id": run.run_id}
 
 
+class SweepBody(BaseModel):
+    # Safe by default: list what the filters reject without deleting it.
+    dry_run: bool = True
+
+
+@router.post("/policies/{name}/sweep")
+async def start_sweep(name: str, request: Request, body: SweepBody | None = None) -> dict:
+    """Apply the policy's current filters to the files already in its
+    directory, as a run whose log and events report each decision."""
+    policy = request.app.state.policy_store.get(name)
+    if policy is None:
+        raise ApiError("Policy not found", status_code=404)
+    if policy.filters.is_empty():
+        raise ApiError("Policy has no filters to apply", status_code=409)
+    if not Path(policy.directory).is_dir():  # noqa: ASYNC240
+        raise ApiError("Policy directory does not exist", status_code=409)
+    try:
+        run = await request.app.state.runner.sweep(policy, list_only=(body or SweepBody()).dry_run)
+    except RuntimeError as e:
+        raise ApiError(str(e), status_code=409) from None
+    return {"run_id": run.run_id}
+
+
 @router.delete("/runs/{run_id}")
 async def stop_run(run_id: str, request: Request) -> dict:
     runner = request.app.state.runner
@@ -43,34 +85,229 @@ async def stop_run(run_id: str, request: Request) -> dict:
 
 @router.get("/policies/{name}/runs")
 def list_runs(name: str, request: Request) -> list[dict]:
-    runs_dir: Path = request.app.state.data_dir / "runs" / name
-    if not runs_dir.is_dir():
-        return []
-    rows = []
-    for p in runs_dir.glob("*.log"):
-        stat = p.stat()
-        entry: dict = {
-            "run_id": p.stem,
-            "log_size": stat.st_size,
-            "mtime": stat.st_mtime,
-        }
-        sidecar = p.with_suffix(".meta.json")
-        if sidecar.is_file():
-            try:
-                meta = json.loads(sidecar.read_text("utf-8"))
-                entry.update(meta)
-            except (OSError, json.JSONDecodeError):
-                pass
-        rows.append(entry)
-    # Sort by ended_at (from sidecar) descending; fall back to mtime for stray logs.
-    rows.sort(key=lambda r: r.get("ended_at") or str(r["mtime"]), reverse=True)
+    rows = request.app.state.run_index.runs_for(name)
+    # The in-flight run has no sidecar (and so no index row) until it exits;
+    # surface it at the top so history shows what's happening now.
+    active = request.app.state.runner.active_run(name)
+    if active is not None and not any(r["run_id"] == active.run_id for r in rows):
+        entry: dict = {"run_id": active.run_id, "policy_name": name, "status": active.status}
+        with contextlib.suppress(OSError):
+            stat = active.log_path.stat()
+            entry["log_size"] = stat.st_size
+            entry["mtime"] = stat.st_mtime
+        rows.insert(0, entry)
     return rows
 
 
+@router.get("/runs/search")
+def search_logs(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=MAX_SEARCH_QUERY),
+    policy: str | None = None,
+    run_id: str | None = None,
+    level: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = Query(100, ge=1, le=MAX_SEARCH_RESULTS),
+) -> list[dict]:
+    """Search finished runs' logs, newest match first."""
+    if level is not None and level.upper() not in LEVELS:
+        raise ValidationError(f"level must be one of {', '.join(LEVELS)}", field="level")
+    hits = request.app.state.log_search.search(
+        q,
+        policy_name=policy,
+        run_id=run_id,
+        level=level.upper() if level is not None else None,
+        since=_log_timestamp(since),
+        until=_log_timestamp(until),
+        limit=limit,
+    )
+    return [asdict(h) for h in hits]
+
+
+def _log_timestamp(dt: datetime | None) -> str | None:
+    # Log lines carry naive local timestamps (see Run._emit_log).
+    if dt is None:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone().replace(tzinfo=None)
+    return dt.strftime("%Y-%m-%d %H:%M:%S")
+
+
 @router.get("/runs/{run_id}/log")
-def get_log(run_id: str, request: Request) -> FileResponse:
-    policy_name = run_id.rsplit("-", 1)[0]
-    path: Path = request.app.state.data_dir / "runs" / policy_name / f"{run_id}.log"
+def get_log(
+    run_id: str,
+    request: Request,
+    tail: int | None = Query(None, ge=0, le=MAX_TAIL_LINES),
+    offset: int | None = Query(None, ge=0),
+    limit: int = Query(DEFAULT_LOG_PAGE_BYTES, ge=1, le=MAX_LOG_PAGE_BYTES),
+) -> Response:
+    """Serve a run log: whole, by HTTP Range, or as a page of whole lines.
+
+    `?tail=N` returns the last N lines; `?offset=&limit=` returns whole
+    lines from a byte offset. Pages carry X-Log-Offset / X-Log-Next-Offset /
+    X-Log-Size headers so clients can keep paging in either direction.
+    Offsets (and Range requests) always refer to the uncompressed text,
+    even for a gzipped log.
+    """
+    log_path = _run_log_path(request, run_id)
+    path = find_log(log_path)
+    if path is None:
+        raise ApiError("Log not found", status_code=404)
+    if tail is not None and offset is not None:
+        raise ValidationError("tail and offset are mutually exclusive", field="tail")
+    if tail is None and offset is None:
+        return _whole_log(path, request, run_id)
+    with open_log(log_path) as f:
+        if tail is not None:
+            start, data = tail_lines(f, tail)
+        else:
+            assert offset is not None
+            start, data = read_lines(f, offset, limit)
+    return Response(
+        content=data,
+        media_type="text/plain",
+        headers={
+            "X-Log-Offset": str(start),
+            "X-Log-Next-Offset": str(start + len(data)),
+            "X-Log-Size": str(_log_size(request, run_id, path)),
+        },
+    )
+
+
+@router.get("/runs/{run_id}/aws")
+def get_aws_sync(run_id: str, request: Request) -> dict:
+    """Status of the S3 sync that followed a run: live while it runs,
+    from its status file afterwards."""
+    status = request.app.state.aws_sync.status(_run_log_path(request, run_id))
+    if status is None:
+        raise ApiError("No S3 sync for this run", status_code=404)
+    return status
+
+
+@router.post("/policies/{name}/aws/sync")
+async def start_full_sync(name: str, request: Request) -> dict:
+    """Run a full `aws s3 sync` of the policy's directory now, e.g. to catch
+    up after incremental uploads failed. It is reported under the policy's
+    latest run."""
+    policy = request.app.state.policy_store.get(name)
+    if policy is None:
+        raise ApiError("Policy not found", status_code=404)
+    if policy.aws is None or not policy.aws.enabled:
+        raise ApiError("S3 upload is not enabled for this policy", status_code=409)
+    last = request.app.state.runner.last_run(name)
+    if last is None:
+        raise ApiError("Policy has no runs yet", status_code=409)
+    log_path = _run_log_path(request, last.run_id)
+    aws_sync = request.app.state.aws_sync
+    if aws_sync.is_live(log_path):
+        raise ApiError("An S3 sync is already running for this run", status_code=409)
+    aws_sync.start(policy.aws, source=Path(policy.directory), log_path=log_path, policy_name=name)
+    return {"run_id": last.run_id}
+
+
+@router.get("/runs/{run_id}/aws/log")
+def get_aws_sync_log(
+    run_id: str,
+    request: Request,
+    tail: int | None = Query(None, ge=0, le=MAX_TAIL_LINES),
+) -> Response:
+    """The S3 sync's output, whole or its last `?tail=N` lines."""
+    path = sync_log_path(_run_log_path(request, run_id))
     if not path.is_file():
         raise ApiError("Log not found", status_code=404)
-    return FileResponse(path, media_type="text/plain")
+    if tail is None:
+        return FileResponse(path, media_type="text/plain")
+    with open(path, "rb") as f:
+        _, data = tail_lines(f, tail)
+    return Response(content=data, media_type="text/plain")
+
+
+def _run_log_path(request: Request, run_id: str) -> Path:
+    policy_name = run_id.rsplit("-", 1)[0]
+    return request.app.state.data_dir / "runs" / policy_name / f"{run_id}.log"
+
+
+def _whole_log(path: Path, request: Request, run_id: str) -> Response:
+    # FileResponse answers Range requests itself. A gzipped log goes out
+    # as-is to clients that accept gzip, and is inflated on the fly for the
+    # rest; a Range on it is served from the inflated text either way.
+    if not is_compressed(path):
+        return FileResponse(path, media_type="text/plain")
+    vary = {"Vary": "Accept-Encoding"}
+    range_header = request.headers.get("range")
+    if range_header is not None:
+        size = _log_size(request, run_id, path)
+        return _log_range(_run_log_path(request, run_id), range_header, size, vary)
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        return FileResponse(
+            path, media_type="text/plain", headers={"Content-Encoding": "gzip", **vary}
+        )
+
+    def inflate() -> Iterator[bytes]:
+        with gzip.open(path, "rb") as f:
+            while chunk := f.read(LOG_STREAM_CHUNK):
+                yield chunk
+
+    return StreamingResponse(inflate(), media_type="text/plain", headers=vary)
+
+
+def _log_range(log_path: Path, header: str, size: int, headers: dict[str, str]) -> Response:
+    """A 206 with one byte range of the uncompressed log, or a 416 when
+    *header* isn't a single range within *size* bytes."""
+    span = _byte_range(header, size)
+    if span is None:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", **headers})
+    start, end = span
+
+    def read() -> Iterator[bytes]:
+        with open_log(log_path) as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0 and (chunk := f.read(min(LOG_STREAM_CHUNK, remaining))):
+                remaining -= len(chunk)
+                yield chunk
+
+    return StreamingResponse(
+        read(),
+        status_code=206,
+        media_type="text/plain",
+        headers={
+            "Content-Range": f"bytes {start}-{end}/{size}",
+            "Content-Length": str(end - start + 1),
+            "Accept-Ranges": "bytes",
+            **headers,
+        },
+    )
+
+
+def _byte_range(header: str, size: int) -> tuple[int, int] | None:
+    """(first, last) byte, inclusive, of a single-range Range header
+    against *size* bytes; None if it isn't one or can't be satisfied."""
+    m = _RANGE_RE.fullmatch(header.strip())
+    if m is None or not any(m.groups()):
+        return None
+    first, last = m.groups()
+    if not first:
+        if int(last) == 0:
+            return None
+        start, end = max(0, size - int(last)), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end:
+        return None
+    return start, end
+
+
+def _log_size(request: Request, run_id: str, path: Path) -> int:
+    """Uncompressed size of the log at *path*."""
+    if not is_compressed(path):
+        return path.stat().st_size
+    row = request.app.state.run_index.get(run_id)
+    if row is not None and row.get("log_size") is not None:
+        return int(row["log_size"])
+    # Unindexed: the gzip trailer holds the size modulo 2**32.
+    with open(path, "rb") as f:
+        f.seek(-4, 2)
+        return int.from_bytes(f.read(4), "little")
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import asyncio
+
 from fastapi import APIRouter, Depends, Request
 
 from icloudpd_web.auth import require_auth
@@ -19,10 +21,28 @@ def get_settings(request: Request) -> dict:
     return store.load().model_dump(mode="json")
 
 
+@router.get("/notifications")
+def notification_stats(request: Request) -> dict:
+    """Delivery counters for Apprise notifications since startup."""
+    return request.app.state.notifier.stats()
+
+
 @router.put("")
-def put_settings(body: ServerSettings, request: Request) -> dict:
-    store = request.app.state.settings_store
-    store.save(body)
-    request.app.state.notifier.update(body.apprise)
+async def put_settings(body: ServerSettings, request: Request) -> dict:
+    # Async for Runner.set_limits; file writes, Apprise plugin setup and
+    # executor shutdown go to a worker thread.
+    await asyncio.to_thread(request.app.state.settings_store.save, body)
+    await asyncio.to_thread(request.app.state.notifier.update, body.apprise)
     request.app.state.runner._retention = body.retention_runs  # noqa: SLF001
+    request.app.state.runner._compress_logs = body.compress_logs  # noqa: SLF001
+    request.app.state.scheduler.set_options(
+        jitter_minutes=body.schedule_jitter_minutes,
+        catch_up_hours=body.schedule_catch_up_hours,
+    )
+    await asyncio.to_thread(
+        request.app.state.filter_pool.configure, body.filter_workers, kind=body.filter_executor
+    )
+    await request.app.state.runner.set_limits(
+        max_concurrent=body.max_concurrent_runs, max_per_account=body.max_runs_per_account
+    )
     return body.model_dump(mode="json")
@@ -1,20 +1,30 @@
 from __future__ import annotations
 
-import asyncio
 import json
 from collections.abc import AsyncIterator
+from pathlib import Path
 
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import StreamingResponse
 
+from icloudpd_web.api.summary import policy_summary
 from icloudpd_web.auth import require_auth
 from icloudpd_web.errors import ApiError
+from icloudpd_web.runner.event_log import has_event_log, last_seq, replay_events_async
+from icloudpd_web.runner.log_storage import find_log
+from icloudpd_web.runner.run import Run
 
 
 router = APIRouter(tags=["streams"], dependencies=[Depends(require_auth)])
 
+# Idle policies-stream clients get an SSE comment this often so proxies keep
+# the connection open and dead clients are noticed.
+KEEPALIVE_SECONDS = 15.0
+# Statuses a run doesn't leave; a run's event stream ends at the first.
+_FINAL_STATUSES = frozenset({"success", "failed", "stopped"})
 
-def _sse(event: str, seq: int | None, data: object) -> bytes:
+
+def _sse(event: str, seq: int | str | None, data: object) -> bytes:
     lines = []
     if seq is not None:
         lines.append(f"id: {seq}")
@@ -25,26 +35,74 @@ def _sse(event: str, seq: int | None, data: object) -> bytes:
     return "\n".join(lines).encode("utf-8")
 
 
+def _policies_event_id(request: Request, generation: int) -> str:
+    return f"{request.app.state.policy_store.boot_id}:{generation}"
+
+
+def _parse_policies_event_id(last_id: str | None) -> tuple[str, int] | None:
+    """(boot id, generation) from a policies-stream Last-Event-ID. An id
+    without a boot id (from before they were added) parses with an empty
+    one, which matches no process."""
+    if not last_id:
+        return None
+    boot, _, generation = last_id.rpartition(":")
+    if not generation.isdigit():
+        return None
+    return boot, int(generation)
+
+
+def _generation_event(request: Request, generation: int) -> bytes:
+    names = [p.name for p in request.app.state.policy_store.all()]
+    return _sse(
+        "generation",
+        _policies_event_id(request, generation),
+        {"generation": generation, "names": names},
+    )
+
+
+def _policy_delta(request: Request, generation: int, kind: str, data: dict) -> bytes:
+    """Render one store change as a typed SSE frame.
+
+    Everything except policy_deleted carries the policy's current summary
+    (the same shape as GET /policies/{name}) so clients can patch their
+    list in place instead of refetching it.
+    """
+    if kind == "generation":
+        return _generation_event(request, generation)
+    payload: dict = {"generation": generation, **data}
+    if kind != "policy_deleted":
+        policy = request.app.state.policy_store.get(data.get("name", ""))
+        payload["policy"] = policy_summary(policy, request) if policy is not None else None
+    return _sse(kind, _policies_event_id(request, generation), payload)
+
+
 @router.get("/policies/stream")
 async def policies_stream(request: Request) -> StreamingResponse:
     store = request.app.state.policy_store
-    last_id = request.headers.get("last-event-id")
-    start_gen = int(last_id) if last_id and last_id.isdigit() else store.generation
+    last = _parse_policies_event_id(request.headers.get("last-event-id"))
+    boot, start_gen = last if last is not None else (store.boot_id, store.generation)
 
     async def gen() -> AsyncIterator[bytes]:
-        gen_seen = start_gen
+        gen_seen, boot_seen = start_gen, boot
         while True:
-            if await request.is_disconnected():
-                return
-            if store.generation != gen_seen:
-                gen_seen = store.generation
-                names = [p.name for p in store.all()]
-                yield _sse(
-                    "generation",
-                    gen_seen,
-                    {"generation": gen_seen, "names": names},
-                )
-            await asyncio.sleep(1)
+            # A client from an earlier process resyncs at once: its
+            # generation may well equal ours without meaning the same state.
+            if boot_seen == store.boot_id:
+                current = await store.wait_changed(gen_seen, max_wait=KEEPALIVE_SECONDS)
+                if await request.is_disconnected():
+                    return
+                if current == gen_seen:
+                    yield b": keepalive\n\n"
+                    continue
+            changes = store.changes_since(gen_seen, boot_id=boot_seen)
+            if changes is None:
+                # Too far behind for deltas: tell the client to refetch.
+                gen_seen, boot_seen = store.generation, store.boot_id
+                yield _generation_event(request, gen_seen)
+                continue
+            for generation, kind, data in changes:
+                gen_seen = generation
+                yield _policy_delta(request, generation, kind, data)
 
     return StreamingResponse(gen(), media_type="text/event-stream")
 
@@ -53,17 +111,39 @@ async def policies_stream(request: Request) -> StreamingResponse:
 async def run_events(run_id: str, request: Request) -> StreamingResponse:
     runner = request.app.state.runner
     run = runner.get_run(run_id)
-    if run is None:
-        raise ApiError("Run not found", status_code=404)
     last_id = request.headers.get("last-event-id")
     since = int(last_id) if last_id and last_id.isdigit() else None
+    if run is None:
+        return _replay_from_disk(run_id, request, since)
 
     async def gen() -> AsyncIterator[bytes]:
         async for ev in run.subscribe(since=since):
             if await request.is_disconnected():
                 return
             yield _sse(ev.kind, ev.seq, ev.data)
-            if ev.kind == "status":
+            # A queued run reports "queued" and then "running" before it
+            # ends; only a final status closes the stream.
+            if ev.kind == "status" and ev.data.get("status") in _FINAL_STATUSES:
                 return
 
     return StreamingResponse(gen(), media_type="text/event-stream")
+
+
+def _replay_from_disk(run_id: str, request: Request, since: int | None) -> StreamingResponse:
+    """Serve the events of a run that is no longer in memory (e.g. after a
+    restart) from its on-disk journal. Without a Last-Event-ID, mirror the
+    live behavior and send only the last BUFFER_CAP events."""
+    policy_name = run_id.rsplit("-", 1)[0]
+    log_path: Path = request.app.state.data_dir / "runs" / policy_name / f"{run_id}.log"
+    if find_log(log_path) is None or not has_event_log(log_path):
+        raise ApiError("Run not found", status_code=404)
+    if since is None:
+        since = max(0, last_seq(log_path) - Run.BUFFER_CAP)
+
+    # Read in chunks on worker threads, so the disk reads never block the
+    # event loop (nor take a threadpool hop per event).
+    async def gen() -> AsyncIterator[bytes]:
+        async for ev in replay_events_async(log_path, since=since):
+            yield _sse(ev.kind, ev.seq, ev.data)
+
+    return StreamingResponse(gen(), media_type="text/event-stream")
@@ -0,0 +1,31 @@
+from __future__ import annotations
+
+from fastapi import Request
+
+from icloudpd_web.store.models import Policy
+
+
+def policy_summary(p: Policy, request: Request) -> dict:
+    """A policy with its live state (schedule, runs, password), as returned
+    by GET /policies/{name} and sent on the policies stream."""
+    scheduler = request.app.state.scheduler
+    runner = request.app.state.runner
+    secret_store = request.app.state.secret_store
+    data = p.model_dump(mode="json")
+    next_fire = scheduler.next_fire(p.name) if p.enabled else None
+    data["next_run_at"] = next_fire.isoformat() if next_fire is not None else None
+    data["is_running"] = runner.is_running(p.name)
+    active = runner.active_run(p.name)
+    # Only report an active_run_id if the run is still in-flight (queued,
+    # running or awaiting MFA). Terminal statuses (success/failed/stopped)
+    # leave the slot cleared by _on_complete, but guard here for races.
+    data["active_run_id"] = (
+        active.run_id
+        if active is not None and active.status in ("queued", "running", "awaiting_mfa")
+        else None
+    )
+    data["queue_position"] = runner.queue_position(p.name)
+    last_run = runner.last_run(p.name)
+    data["last_run"] = last_run.model_dump(mode="json") if last_run is not None else None
+    data["has_password"] = secret_store.get(p.name) is not None
+    return data
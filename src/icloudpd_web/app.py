@@ -18,9 +18,16 @@ from icloudpd_web.config import SettingsStore
 from icloudpd_web.errors import install_handlers
 from icloudpd_web.integrations.apprise_notifier import AppriseNotifier
 from icloudpd_web.integrations.aws_sync import AwsSync
+from icloudpd_web.integrations.s3_upload import CliUploader
+from icloudpd_web.integrations.upload_manifest import UploadManifest
+from icloudpd_web.runner.exif_cache import CACHE_NAME as EXIF_CACHE_NAME
+from icloudpd_web.runner.filter_pool import FilterPool
+from icloudpd_web.runner.log_search import LogSearch
 from icloudpd_web.runner.mfa import MfaRegistry
 from icloudpd_web.runner.run import Run
+from icloudpd_web.runner.run_index import RunIndex
 from icloudpd_web.runner.runner import Runner
+from icloudpd_web.runner.sweep import SweepRun
 from icloudpd_web.scheduler.scheduler import Scheduler
 from icloudpd_web.static import install_static
 from icloudpd_web.store.policy_store import PolicyStore
@@ -29,17 +36,35 @@ from icloudpd_web.store.secrets import SecretStore
 
 ICLOUDPD_BINARY = "icloudpd"
 
+# Runner event name -> policies-stream delta kind.
+_RUN_DELTA_KINDS = {
+    "queued": "run_queued",
+    "started": "run_started",
+    "progress": "run_progress",
+    "completed": "run_finished",
+}
+
 
 @asynccontextmanager
 async def _lifespan(app: FastAPI) -> AsyncIterator[None]:
     app.state.scheduler_task = asyncio.create_task(app.state.scheduler.run_forever())
+    # Index any finished logs the search index hasn't seen (first start,
+    # or runs that finished while the index was unavailable).
+    app.state.search_sync_task = asyncio.create_task(asyncio.to_thread(app.state.log_search.sync))
+    app.state.aws_sync.resume_interrupted(app.state.data_dir / "runs", app.state.policy_store.get)
     try:
         yield
     finally:
+        app.state.log_search.close()
+        with suppress(Exception):
+            await app.state.search_sync_task
         app.state.scheduler.stop()
         app.state.scheduler_task.cancel()
         with suppress(asyncio.CancelledError, Exception):
             await app.state.scheduler_task
+        await app.state.aws_sync.close()
+        await asyncio.to_thread(app.state.notifier.close)
+        await asyncio.to_thread(app.state.filter_pool.close)
 
 
 def _default_icloudpd_argv(argv_tail: list[str]) -> list[str]:
@@ -71,37 +96,100 @@ def create_app(
     settings = settings_store.load()
 
     notifier = AppriseNotifier(settings.apprise)
-    aws_sync = AwsSync()
+    aws_sync = AwsSync(
+        uploader=CliUploader(data_dir / "multipart"),
+        manifest=UploadManifest(data_dir / "uploads.sqlite3"),
+    )
     mfa_registry = MfaRegistry(mfa_dir)
+    run_index = RunIndex(runs_dir)
+    log_search = LogSearch(runs_dir)
 
     def _on_run_event(run: Run, event: str) -> None:
-        policy_store.bump()
+        policy_store.bump(
+            _RUN_DELTA_KINDS.get(event, "generation"),
+            {
+                "name": run.policy_name,
+                "run_id": run.run_id,
+                "status": run.status,
+                "progress": dict(run.progress),
+                "queue_position": run.queue_position,
+            },
+        )
+        if isinstance(run, SweepRun):
+            # Nothing to upload or notify about.
+            return
         if event == "started":
             notifier.emit("start", policy_name=run.policy_name, summary=_summarize(run))
+            policy = policy_store.get(run.policy_name)
+            aws = policy.aws if policy is not None else None
+            if (
+                policy is not None
+                and aws is not None
+                and aws.enabled
+                and aws.upload_while_downloading
+            ):
+                aws_sync.start_pipeline(
+                    aws,
+                    source=Path(policy.directory),
+                    log_path=run.log_path,
+                    policy_name=run.policy_name,
+                )
             return
         if event != "completed":
             return
         summary = _summarize(run)
         policy = policy_store.get(run.policy_name)
+        # A pipelined upload keeps whatever the run got, even if it failed.
+        pipelined = aws_sync.finish_pipeline(run.log_path, run.downloaded_list)
         if run.status == "success":
             notifier.emit("success", policy_name=run.policy_name, summary=summary)
-            if policy is not None and policy.aws is not None and policy.aws.enabled:
-                asyncio.create_task(aws_sync.run(policy.aws, source=Path(policy.directory)))
+            if (
+                not pipelined
+                and policy is not None
+                and policy.aws is not None
+                and policy.aws.enabled
+            ):
+                aws_sync.start(
+                    policy.aws,
+                    source=Path(policy.directory),
+                    log_path=run.log_path,
+                    policy_name=run.policy_name,
+                    files=run.downloaded_list,
+                )
         elif run.status == "failed":
             notifier.emit("failure", policy_name=run.policy_name, summary=summary)
 
+    async def _on_downloaded(run: Run, path: Path) -> None:
+        await aws_sync.feed(run.log_path, path)
+
+    filter_pool = FilterPool(
+        settings.filter_workers,
+        kind=settings.filter_executor,
+        exif_cache=data_dir / EXIF_CACHE_NAME,
+    )
     runner = Runner(
         runs_base=runs_dir,
+        on_downloaded=_on_downloaded,
+        filter_pool=filter_pool,
         icloudpd_argv=icloudpd_argv,
         retention=settings.retention_runs,
         on_run_event=_on_run_event,
         mfa_registry=mfa_registry,
+        run_index=run_index,
+        compress_logs=settings.compress_logs,
+        log_search=log_search,
+        max_concurrent=settings.max_concurrent_runs,
+        max_per_account=settings.max_runs_per_account,
+        log_in_use=aws_sync.is_live,
     )
 
     scheduler = Scheduler(
         store=policy_store,
         runner=runner,
         password_lookup=secret_store.get,
+        jitter_minutes=settings.schedule_jitter_minutes,
+        catch_up_hours=settings.schedule_catch_up_hours,
+        state_path=data_dir / "scheduler.json",
     )
 
     app.state.data_dir = data_dir
@@ -112,6 +200,9 @@ def create_app(
     app.state.notifier = notifier
     app.state.aws_sync = aws_sync
     app.state.mfa_registry = mfa_registry
+    app.state.run_index = run_index
+    app.state.log_search = log_search
+    app.state.filter_pool = filter_pool
     app.state.runner = runner
     app.state.scheduler = scheduler
 
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import os
 from pathlib import Path
+from typing import Literal
 
 import tomli_w
 import tomllib
@@ -18,6 +19,26 @@ class AppriseSettings(BaseModel):
 class ServerSettings(BaseModel):
     apprise: AppriseSettings = Field(default_factory=AppriseSettings)
     retention_runs: int = 10
+    # Gzip run logs once a run finishes; they are read back transparently.
+    compress_logs: bool = True
+    # Runs allowed at once across all policies; 0 means unlimited. Extra
+    # runs wait in the Runner's queue.
+    max_concurrent_runs: int = Field(default=0, ge=0)
+    # Runs allowed at once per Apple ID (policies sharing a username);
+    # 0 means unlimited. Concurrent runs on one account can get throttled
+    # by iCloud and re-prompt for MFA; 1 avoids that. Unlimited by default
+    # so upgrading doesn't serialize policies that already share an account.
+    max_runs_per_account: int = Field(default=0, ge=0)
+    # Default start-time spread for policies without their own
+    # jitter_minutes, so many policies on one cron don't all start at once.
+    schedule_jitter_minutes: int = Field(default=0, ge=0, le=1440)
+    # Make up a scheduled start missed while the server was down or
+    # stalled, once, if it was missed by at most this many hours; 0 = off.
+    schedule_catch_up_hours: float = Field(default=0, ge=0, le=168)
+    # Workers evaluating post-download filters, shared by all runs; 0 means
+    # one per CPU. "process" decodes images in parallel past the GIL.
+    filter_workers: int = Field(default=0, ge=0, le=256)
+    filter_executor: Literal["thread", "process"] = "thread"
 
 
 class SettingsStore:
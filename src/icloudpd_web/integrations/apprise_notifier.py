@@ -1,7 +1,12 @@
 from __future__ import annotations
 
+import contextlib
 import logging
-from typing import Literal
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Literal
 
 import apprise
 
@@ -12,11 +17,47 @@ log = logging.getLogger(__name__)
 
 Event = Literal["start", "success", "failure"]
 
+# Notifications waiting for delivery. emit() runs on the event loop and
+# must never block, so past this many a new notification is dropped.
+QUEUE_MAX = 100
+# Attempts per notification, and the backoff before each retry.
+MAX_ATTEMPTS = 3
+RETRY_BACKOFF_SECONDS = (2.0, 10.0)
+# Socket connect/read timeout for each target, unless its URL sets its
+# own `cto` / `rto`.
+DELIVERY_TIMEOUT_SECONDS = 10.0
+
+
+@dataclass
+class DeliveryStats:
+    queued: int = 0
+    delivered: int = 0
+    failed: int = 0
+    retried: int = 0
+    dropped: int = 0
+    last_error: str | None = None
+    last_delivered_at: float | None = None
+    last_failed_at: float | None = None
+
 
 class AppriseNotifier:
+    """Sends run notifications through Apprise without blocking the caller.
+
+    emit() only enqueues; a single daemon worker thread delivers, retrying
+    failed sends with backoff, so a slow webhook or SMTP server never
+    stalls the event loop. stats() reports delivery counts.
+    """
+
     def __init__(self, settings: AppriseSettings) -> None:
         self._settings = settings
         self._client: apprise.Apprise | None = None
+        self._queue: queue.Queue[tuple[apprise.Apprise, str, str] | None] = queue.Queue(
+            maxsize=QUEUE_MAX
+        )
+        self._stats = DeliveryStats()
+        self._stats_lock = threading.Lock()
+        self._closed = threading.Event()
+        self._worker: threading.Thread | None = None
         self._rebuild()
 
     def update(self, settings: AppriseSettings) -> None:
@@ -29,7 +70,14 @@ class AppriseNotifier:
             return
         client = apprise.Apprise()
         for url in self._settings.urls:
-            client.add(url)
+            server = apprise.Apprise.instantiate(url)
+            if server is None:
+                log.warning("ignoring invalid apprise url")
+                continue
+            if "cto=" not in url and "rto=" not in url:
+                server.socket_connect_timeout = DELIVERY_TIMEOUT_SECONDS
+                server.socket_read_timeout = DELIVERY_TIMEOUT_SECONDS
+            client.add(server)
         self._client = client
 
     def _enabled_for(self, event: Event) -> bool:
@@ -42,12 +90,98 @@ class AppriseNotifier:
         return False
 
     def emit(self, event: Event, *, policy_name: str, summary: str) -> None:
-        if self._client is None:
+        if self._client is None or self._closed.is_set():
             return
         if not self._enabled_for(event):
             return
         title = f"[icloudpd-web] {policy_name} {event}"
         try:
-            self._client.notify(title=title, body=summary)
-        except Exception:
-            log.exception("apprise emit failed for %s/%s", policy_name, event)
+            self._queue.put_nowait((self._client, title, summary))
+        except queue.Full:
+            log.warning("apprise queue full; dropping %s/%s", policy_name, event)
+            self._count(dropped=1)
+            return
+        self._count(queued=1)
+        self._ensure_worker()
+
+    def stats(self) -> dict[str, Any]:
+        with self._stats_lock:
+            data = asdict(self._stats)
+        data["pending"] = self._queue.unfinished_tasks
+        return data
+
+    def wait_idle(self, timeout: float) -> bool:
+        """Block until every queued notification has been handled. For tests
+        and shutdown; returns False if *timeout* passed first."""
+        deadline = time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Stop the worker, giving queued notifications up to *timeout*
+        seconds in all to go out. Retries in progress are abandoned, and
+        whatever is still queued after that is dropped, not sent."""
+        deadline = time.monotonic() + timeout
+        self.wait_idle(timeout)
+        self._closed.set()
+        if self._worker is not None:
+            # A full queue already wakes the worker; it exits once it has
+            # dropped the backlog.
+            with contextlib.suppress(queue.Full):
+                self._queue.put_nowait(None)
+            self._worker.join(max(0.0, deadline - time.monotonic()))
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._worker = threading.Thread(target=self._work, name="apprise-notifier", daemon=True)
+        self._worker.start()
+
+    def _work(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                if self._closed.is_set():
+                    self._count(dropped=1)
+                else:
+                    self._deliver(*item)
+            finally:
+                self._queue.task_done()
+            if self._closed.is_set() and self._queue.empty():
+                return
+
+    def _deliver(self, client: apprise.Apprise, title: str, body: str) -> None:
+        error = "notify returned False"
+        for attempt in range(MAX_ATTEMPTS):
+            if attempt:
+                self._count(retried=1)
+                backoff = RETRY_BACKOFF_SECONDS[min(attempt, len(RETRY_BACKOFF_SECONDS)) - 1]
+                if self._closed.wait(backoff):
+                    break
+            try:
+                if client.notify(title=title, body=body):
+                    with self._stats_lock:
+                        self._stats.delivered += 1
+                        self._stats.last_delivered_at = time.time()
+                    return
+                error = "notify returned False"
+            except Exception as e:
+                log.exception("apprise emit failed for %s", title)
+                error = f"{type(e).__name__}: {e}"
+        log.warning("apprise delivery failed for %s: %s", title, error)
+        with self._stats_lock:
+            self._stats.failed += 1
+            self._stats.last_error = error
+            self._stats.last_failed_at = time.time()
+
+    def _count(self, **deltas: int) -> None:
+        with self._stats_lock:
+            for name, delta in deltas.items():
+                setattr(self._stats, name, getattr(self._stats, name) + delta)
@@ -1,50 +1,577 @@
+"""Mirror a policy's download directory to S3.
+
+A full sync runs `aws s3 sync` over the whole directory. An incremental
+one (`AwsConfig.incremental`) uploads just the files a run downloaded,
+skipping those the `UploadManifest` says are already there. A pipelined
+one (`AwsConfig.upload_while_downloading`) does the same while the run is
+still going: the run feeds each file it keeps into a bounded queue, and
+once it ends, a reconciliation pass over its file list uploads whatever
+the queue missed or failed on.
+
+Output is streamed, never accumulated: lines go to a per-run log next to
+the run's own (`<run_id>.aws`), upload/progress lines update an
+`AwsSyncStatus`, and only a short tail is kept in memory. When a sync
+started with `AwsSync.start` begins and ends, its status is written to
+`<run_id>.aws.json` so the runs API can report it after a restart. One
+that was still running when the server stopped is marked "interrupted",
+and `resume_interrupted` picks incremental ones up again at startup.
+"""
+
 from __future__ import annotations
 
 import asyncio
-import os
-from collections.abc import Callable
-from dataclasses import dataclass
+import collections
+import contextlib
+import json
+import logging
+import re
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator
+from dataclasses import asdict, dataclass, field
 from pathlib import Path
+from types import TracebackType
+from typing import IO, Any, Literal
+
+from icloudpd_web.runner.run import downloaded_list_path
+from icloudpd_web.store.models import AwsConfig, Policy
+
+from .s3_upload import CliUploader, Uploader, aws_env, object_key
+from .upload_manifest import UploadManifest
+
+
+log = logging.getLogger(__name__)
+
+# Lines of output kept in memory (and in the status) per sync.
+TAIL_LINES = 50
+READ_CHUNK = 64 * 1024
+# A "line" longer than this is cut; the CLI's lines are short.
+MAX_LINE_BYTES = 64 * 1024
+# Files uploaded at once by an incremental upload.
+UPLOAD_CONCURRENCY = 4
+# Files a pipelined upload lets pile up before feed() blocks, which in turn
+# stalls the run's output and so icloudpd itself.
+PIPELINE_QUEUE_MAX = 16
 
-from icloudpd_web.store.models import AwsConfig
+SyncState = Literal["running", "success", "failed", "interrupted"]
+SyncMode = Literal["sync", "incremental", "pipelined"]
+
+# "upload: ./a.jpg to s3://b/a.jpg", "upload failed: ./a.jpg to s3://...";
+# incremental uploads log the same, plus "skip: <path> (<why>)".
+_UPLOAD_RE = re.compile(r"^upload: ")
+_UPLOAD_FAILED_RE = re.compile(r"^upload failed: ")
+_SKIP_RE = re.compile(r"^skip: ")
+# "Completed 1.2 MiB/3.4 MiB (2.1 MiB/s) with 3 file(s) remaining"; the
+# total carries a "~" while the CLI is still listing.
+_PROGRESS_RE = re.compile(
+    r"^Completed ([\d.]+) (\w+)/~?([\d.]+) (\w+) .*with (\d+) file\(s\) remaining"
+)
+_UNITS = {
+    "Byte": 1,
+    "Bytes": 1,
+    "B": 1,
+    "KiB": 1024,
+    "MiB": 1024**2,
+    "GiB": 1024**3,
+    "TiB": 1024**4,
+}
 
 
 @dataclass
 class AwsSyncResult:
     skipped: bool
     exit_code: int | None = None
+    # The last TAIL_LINES lines of output, not all of it.
     output: str = ""
+    uploaded: int = 0
+    failed: int = 0
+
+
+@dataclass
+class AwsSyncStatus:
+    run_id: str
+    policy_name: str
+    status: SyncState = "running"
+    mode: SyncMode = "sync"
+    started_at: float = field(default_factory=time.time)
+    ended_at: float | None = None
+    exit_code: int | None = None
+    uploaded: int = 0
+    failed: int = 0
+    skipped: int = 0
+    bytes_done: int | None = None
+    bytes_total: int | None = None
+    files_remaining: int | None = None
+    tail: list[str] = field(default_factory=list)
+
+
+def sync_log_path(log_path: Path) -> Path:
+    return log_path.with_suffix(".aws")
+
+
+def sync_status_path(log_path: Path) -> Path:
+    return log_path.with_suffix(".aws.json")
 
 
 class AwsSync:
-    def __init__(self, argv_fn: Callable[[str, str], list[str]] | None = None) -> None:
+    def __init__(
+        self,
+        argv_fn: Callable[[str, str], list[str]] | None = None,
+        *,
+        uploader: Uploader | None = None,
+        manifest: UploadManifest | None = None,
+    ) -> None:
         self._argv_fn = argv_fn or _default_argv
+        self._uploader: Uploader = uploader or CliUploader()
+        self._manifest = manifest
+        # Syncs in flight, by run_id. Finished ones are read from disk.
+        self._live: dict[str, AwsSyncStatus] = {}
+        self._tasks: set[asyncio.Task[AwsSyncResult]] = set()
+        # Pipelined uploads waiting on their run, by run_id.
+        self._pipelines: dict[str, _Pipeline] = {}
+
+    def start(
+        self,
+        cfg: AwsConfig,
+        *,
+        source: Path,
+        log_path: Path,
+        policy_name: str,
+        files: Path | None = None,
+    ) -> asyncio.Task[AwsSyncResult]:
+        """Sync *source* in the background for the run logged at *log_path*.
+
+        With `cfg.incremental` and a *files* list (see Run.downloaded_list)
+        only those files are uploaded; otherwise the whole directory is
+        synced. The task is retained here and its outcome logged, so
+        callers may fire and forget.
+        """
+        status = AwsSyncStatus(run_id=log_path.stem, policy_name=policy_name)
+
+        def work(out: Path) -> Awaitable[AwsSyncResult]:
+            if cfg.incremental and files is not None:
+                return self.upload_files(
+                    cfg, source=source, files=files, log_path=out, status=status
+                )
+            return self.run(cfg, source=source, log_path=out, status=status)
+
+        return self._spawn(log_path, status, work)
+
+    def start_pipeline(
+        self, cfg: AwsConfig, *, source: Path, log_path: Path, policy_name: str
+    ) -> asyncio.Task[AwsSyncResult]:
+        """Begin uploading for a run as it downloads. The run hands over
+        files with feed() and must call finish_pipeline() when it ends."""
+        status = AwsSyncStatus(run_id=log_path.stem, policy_name=policy_name, mode="pipelined")
+        pipeline = _Pipeline()
+        self._pipelines[status.run_id] = pipeline
+
+        def work(out: Path) -> Awaitable[AwsSyncResult]:
+            return self._pipelined(cfg, source, out, status, pipeline)
+
+        return self._spawn(log_path, status, work)
+
+    async def feed(self, log_path: Path, path: Path) -> None:
+        """Queue a file the run logged at *log_path* just kept. Waits while
+        the queue is full; a no-op if the run has no pipelined upload."""
+        pipeline = self._pipelines.get(log_path.stem)
+        if pipeline is None or pipeline.ended.done():
+            return
+        try:
+            pipeline.queue.put_nowait(path)
+            return
+        except asyncio.QueueFull:
+            pass
+        # Wait for room, unless the upload stops taking files meanwhile.
+        put = asyncio.ensure_future(pipeline.queue.put(path))
+        await asyncio.wait((put, pipeline.closed), return_when=asyncio.FIRST_COMPLETED)
+        put.cancel()
+
+    def finish_pipeline(self, log_path: Path, files: Path) -> bool:
+        """Tell a pipelined upload its run is over; *files* lists everything
+        the run downloaded. Returns False if the run had no pipeline."""
+        pipeline = self._pipelines.pop(log_path.stem, None)
+        if pipeline is None:
+            return False
+        if not pipeline.ended.done():
+            pipeline.ended.set_result(files)
+        return True
+
+    def _spawn(
+        self,
+        log_path: Path,
+        status: AwsSyncStatus,
+        work: Callable[[Path], Awaitable[AwsSyncResult]],
+    ) -> asyncio.Task[AwsSyncResult]:
+        self._live[status.run_id] = status
+        task = asyncio.create_task(self._tracked(log_path, status, work))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def is_live(self, log_path: Path) -> bool:
+        return log_path.stem in self._live
+
+    def status(self, log_path: Path) -> dict[str, Any] | None:
+        """The sync status for the run logged at *log_path*, if it had one."""
+        live = self._live.get(log_path.stem)
+        if live is not None:
+            return asdict(live)
+        try:
+            return json.loads(sync_status_path(log_path).read_text("utf-8"))
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    async def close(self) -> None:
+        """Cancel syncs still running (their subprocesses are killed)."""
+        for task in list(self._tasks):
+            task.cancel()
+        for task in list(self._tasks):
+            with contextlib.suppress(asyncio.CancelledError, Exception):
+                await task
+
+    def resume_interrupted(
+        self, runs_base: Path, get_policy: Callable[[str], Policy | None]
+    ) -> list[str]:
+        """Restart incremental uploads cut short by the last shutdown (or a
+        crash, which leaves them "running" on disk). Files already uploaded
+        are skipped by the manifest and a partly sent multipart upload
+        resumes, so little is sent twice. Returns the run ids resumed."""
+        resumed = []
+        for path in sorted(runs_base.glob("*/*.aws.json")):
+            try:
+                saved = json.loads(path.read_text("utf-8"))
+            except (OSError, json.JSONDecodeError):
+                continue
+            if saved.get("status") not in ("running", "interrupted"):
+                continue
+            if saved.get("mode") not in ("incremental", "pipelined"):
+                continue
+            policy = get_policy(str(saved.get("policy_name")))
+            aws = policy.aws if policy is not None else None
+            if policy is None or aws is None or not aws.enabled or not aws.incremental:
+                continue
+            log_path = path.with_name(path.name.removesuffix(".aws.json") + ".log")
+            if self.is_live(log_path):
+                continue
+            self.start(
+                aws,
+                source=Path(policy.directory),
+                log_path=log_path,
+                policy_name=policy.name,
+                files=downloaded_list_path(log_path),
+            )
+            resumed.append(log_path.stem)
+        if resumed:
+            log.info("resuming %d interrupted S3 upload(s)", len(resumed))
+        return resumed
 
-    async def run(self, cfg: AwsConfig, *, source: Path) -> AwsSyncResult:
+    async def _tracked(
+        self,
+        log_path: Path,
+        status: AwsSyncStatus,
+        work: Callable[[Path], Awaitable[AwsSyncResult]],
+    ) -> AwsSyncResult:
+        await _write_status(log_path, status)
+        try:
+            result = await work(sync_log_path(log_path))
+        except Exception:
+            log.exception("aws sync for %s failed to run", status.run_id)
+            status.status = "failed"
+            result = AwsSyncResult(skipped=False)
+        finally:
+            if status.status == "running":  # cancelled at shutdown
+                status.status = "interrupted"
+            status.ended_at = time.time()
+            await _write_status(log_path, status)
+            self._live.pop(status.run_id, None)
+            self._pipelines.pop(status.run_id, None)
+        if result.skipped:
+            return result
+        if status.status == "success":
+            log.info("aws sync for %s uploaded %d file(s)", status.run_id, status.uploaded)
+        else:
+            log.warning(
+                "aws sync for %s failed (exit %s, %d upload error(s))",
+                status.run_id,
+                status.exit_code,
+                status.failed,
+            )
+        return result
+
+    async def run(
+        self,
+        cfg: AwsConfig,
+        *,
+        source: Path,
+        log_path: Path | None = None,
+        status: AwsSyncStatus | None = None,
+    ) -> AwsSyncResult:
+        """Run one sync. Output is appended to *log_path* as it arrives and
+        parsed into *status*; memory use is bounded by TAIL_LINES."""
         if not cfg.enabled or not cfg.bucket:
+            if status is not None:
+                status.status = "success"
             return AwsSyncResult(skipped=True)
         dest = f"s3://{cfg.bucket}/{cfg.prefix}".rstrip("/")
         argv = self._argv_fn(str(source), dest)
-        env = os.environ.copy()
-        if cfg.access_key_id:
-            env["AWS_ACCESS_KEY_ID"] = cfg.access_key_id
-        if cfg.secret_access_key:
-            env["AWS_SECRET_ACCESS_KEY"] = cfg.secret_access_key
-        if cfg.region:
-            env["AWS_DEFAULT_REGION"] = cfg.region
+        status = status or AwsSyncStatus(run_id="", policy_name="")
         proc = await asyncio.create_subprocess_exec(
             *argv,
             stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.STDOUT,
-            env=env,
+            env=aws_env(cfg),
         )
-        out_bytes, _ = await proc.communicate()
+        assert proc.stdout is not None
+        try:
+            with _OutputSink(status, log_path) as sink:
+                async for line, complete in _read_lines(proc.stdout):
+                    if complete:
+                        sink.line(line)
+                    else:
+                        sink.progress(line)  # "\r" redraw; not worth keeping
+            exit_code = await proc.wait()
+        finally:
+            if proc.returncode is None:
+                with contextlib.suppress(ProcessLookupError):
+                    proc.kill()
+                await proc.wait()
+        return sink.result(exit_code)
+
+    async def upload_files(
+        self,
+        cfg: AwsConfig,
+        *,
+        source: Path,
+        files: Path,
+        log_path: Path | None = None,
+        status: AwsSyncStatus | None = None,
+    ) -> AwsSyncResult:
+        """Upload the files listed (one path per line) in *files* under
+        *source*, skipping any the manifest has at the same size and mtime.
+        Paths that are gone (e.g. removed by a filter) are skipped too."""
+        status = status or AwsSyncStatus(run_id="", policy_name="")
+        status.mode = "incremental"
+        if not cfg.enabled or not cfg.bucket:
+            status.status = "success"
+            return AwsSyncResult(skipped=True)
+        root = source.resolve()  # noqa: ASYNC240
+        queue: asyncio.Queue[Path | None] = asyncio.Queue(maxsize=UPLOAD_CONCURRENCY * 2)
+        with _OutputSink(status, log_path) as sink:
+            async with self._upload_workers(cfg, root, queue, sink):
+                for path in _listed_paths(files):
+                    await queue.put(path)
+        return sink.result(0 if status.failed == 0 else 1)
+
+    async def _pipelined(
+        self,
+        cfg: AwsConfig,
+        source: Path,
+        log_path: Path,
+        status: AwsSyncStatus,
+        pipeline: _Pipeline,
+    ) -> AwsSyncResult:
+        root = source.resolve()  # noqa: ASYNC240
+        handled: set[Path] = set()
+        try:
+            with _OutputSink(status, log_path) as sink:
+                async with self._upload_workers(cfg, root, pipeline.queue, sink, handled):
+                    files = await pipeline.ended
+                pipeline.closed.set_result(None)
+                # Reconcile with the run's own list: files that never reached
+                # the queue and files whose upload failed get one more go.
+                status.failed = 0
+                queue: asyncio.Queue[Path | None] = asyncio.Queue(maxsize=UPLOAD_CONCURRENCY * 2)
+                async with self._upload_workers(cfg, root, queue, sink):
+                    for path in _listed_paths(files):
+                        if path not in handled:
+                            await queue.put(path)
+        finally:
+            if not pipeline.closed.done():
+                pipeline.closed.set_result(None)
+        return sink.result(0 if status.failed == 0 else 1)
+
+    @contextlib.asynccontextmanager
+    async def _upload_workers(
+        self,
+        cfg: AwsConfig,
+        root: Path,
+        queue: asyncio.Queue[Path | None],
+        sink: _OutputSink,
+        handled: set[Path] | None = None,
+    ) -> AsyncIterator[None]:
+        """Upload what is put on *queue* until the block exits, then wait for
+        the queue to empty. Paths dealt with (uploaded or rightly skipped)
+        are added to *handled*."""
+
+        async def worker() -> None:
+            while (path := await queue.get()) is not None:
+                if await self._upload_one(cfg, root, path, sink) and handled is not None:
+                    handled.add(path)
+
+        workers = [asyncio.create_task(worker()) for _ in range(UPLOAD_CONCURRENCY)]
+        try:
+            yield
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
+
+    async def _upload_one(self, cfg: AwsConfig, root: Path, path: Path, sink: _OutputSink) -> bool:
+        """Upload one file unless there's no need; False if it failed."""
+        assert cfg.bucket is not None
+        try:
+            st = await asyncio.to_thread(path.stat)
+        except OSError:
+            sink.line(f"skip: {path} (no longer on disk)")
+            return True
+        key = object_key(cfg.prefix, root, path)
+        if key is None:
+            sink.line(f"skip: {path} (outside {root})")
+            return True
+        manifest = self._manifest
+        if manifest is not None and await asyncio.to_thread(
+            manifest.is_current, cfg.bucket, key, size=st.st_size, mtime=st.st_mtime
+        ):
+            sink.line(f"skip: {path} (already uploaded)")
+            return True
+        dest = f"s3://{cfg.bucket}/{key}"
+        try:
+            etag = await self._uploader.upload(cfg, path, key)
+        except Exception as e:  # noqa: BLE001
+            sink.line(f"upload failed: {path} to {dest} {e}")
+            return False
+        if manifest is not None:
+            await asyncio.to_thread(
+                manifest.record, cfg.bucket, key, size=st.st_size, mtime=st.st_mtime, etag=etag
+            )
+        sink.line(f"upload: {path} to {dest}")
+        return True
+
+
+@dataclass
+class _Pipeline:
+    queue: asyncio.Queue[Path | None] = field(
+        default_factory=lambda: asyncio.Queue(maxsize=PIPELINE_QUEUE_MAX)
+    )
+    # Resolves to the run's file list when the run ends.
+    ended: asyncio.Future[Path] = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+    # Resolves once nothing more is read from `queue`.
+    closed: asyncio.Future[None] = field(
+        default_factory=lambda: asyncio.get_running_loop().create_future()
+    )
+
+
+async def _write_status(log_path: Path, status: AwsSyncStatus) -> None:
+    # Serialized on the loop, so the status can't change mid-dump; only the
+    # write goes to a thread.
+    data = json.dumps(asdict(status))
+    try:
+        await asyncio.to_thread(sync_status_path(log_path).write_text, data, "utf-8")
+    except OSError:
+        log.warning("could not write aws sync status for %s", status.run_id)
+
+
+class _OutputSink:
+    """Where a sync's output lines go: parsed into the status, appended to
+    the log file, and kept (the last TAIL_LINES of them) in memory."""
+
+    def __init__(self, status: AwsSyncStatus, log_path: Path | None) -> None:
+        self._status = status
+        self._log_path = log_path
+        self._out: IO[str] | None = None
+        self._tail: collections.deque[str] = collections.deque(maxlen=TAIL_LINES)
+
+    def __enter__(self) -> _OutputSink:
+        if self._log_path is not None:
+            self._out = open(self._log_path, "a", encoding="utf-8")  # noqa: SIM115
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if self._out is not None:
+            self._out.close()
+
+    def progress(self, line: str) -> None:
+        _parse(line, self._status)
+
+    def line(self, line: str) -> None:
+        _parse(line, self._status)
+        if not line:
+            return
+        self._tail.append(line)
+        self._status.tail = list(self._tail)
+        if self._out is not None:
+            self._out.write(line + "\n")
+
+    def result(self, exit_code: int) -> AwsSyncResult:
+        self._status.exit_code = exit_code
+        self._status.status = "success" if exit_code == 0 else "failed"
         return AwsSyncResult(
             skipped=False,
-            exit_code=proc.returncode,
-            output=out_bytes.decode("utf-8", errors="replace"),
+            exit_code=exit_code,
+            output="".join(line + "\n" for line in self._tail),
+            uploaded=self._status.uploaded,
+            failed=self._status.failed,
         )
 
 
+def _listed_paths(files: Path) -> Iterator[Path]:
+    try:
+        f = open(files, encoding="utf-8")  # noqa: SIM115
+    except FileNotFoundError:
+        return  # the run downloaded nothing
+    with f:
+        for line in f:
+            if line := line.rstrip("\n"):
+                yield Path(line)
+
+
+async def _read_lines(stream: asyncio.StreamReader) -> AsyncIterator[tuple[str, bool]]:
+    """Yield (line, complete) pairs. The CLI redraws its progress line with
+    "\\r"; those come out with complete=False."""
+    buf = b""
+    while chunk := await stream.read(READ_CHUNK):
+        buf += chunk
+        while True:
+            cut = min((i for i in (buf.find(b"\n"), buf.find(b"\r")) if i != -1), default=-1)
+            if cut == -1:
+                break
+            line, sep, buf = buf[:cut], buf[cut : cut + 1], buf[cut + 1 :]
+            yield line.decode("utf-8", errors="replace"), sep == b"\n"
+        if len(buf) > MAX_LINE_BYTES:
+            yield buf.decode("utf-8", errors="replace"), True
+            buf = b""
+    if buf:
+        yield buf.decode("utf-8", errors="replace"), True
+
+
+def _parse(line: str, status: AwsSyncStatus) -> None:
+    if _UPLOAD_RE.match(line):
+        status.uploaded += 1
+    elif _UPLOAD_FAILED_RE.match(line):
+        status.failed += 1
+    elif _SKIP_RE.match(line):
+        status.skipped += 1
+    elif m := _PROGRESS_RE.match(line):
+        status.bytes_done = _to_bytes(m.group(1), m.group(2))
+        status.bytes_total = _to_bytes(m.group(3), m.group(4))
+        status.files_remaining = int(m.group(5))
+
+
+def _to_bytes(value: str, unit: str) -> int | None:
+    scale = _UNITS.get(unit)
+    if scale is None:
+        return None
+    return int(float(value) * scale)
+
+
 def _default_argv(src: str, dst: str) -> list[str]:
     return ["aws", "s3", "sync", src, dst]
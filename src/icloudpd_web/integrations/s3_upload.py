@@ -0,0 +1,333 @@
+"""Uploading single files to S3, for incremental (per-run) uploads.
+
+`Uploader` is the seam: `CliUploader` shells out to `aws s3api` like the
+rest of the aws integration, and tests substitute a local stand-in.
+
+Files up to `AwsConfig.part_size_mb` go up in one put-object. Larger ones
+(videos, mostly) are multipart uploads whose parts are sent
+`AwsConfig.parallel_parts` at a time. Each finished part is recorded in a
+state file, so an upload cut short by a failure or a restart resumes at
+the parts still missing instead of starting over.
+
+`aws s3api upload-part` reads its body from a file, so each part is first
+copied out to a scratch file next to the state files. At most
+`max_parts_on_disk` of them exist at once, across every upload, whatever
+`parallel_parts` says. A part isn't cut if that would leave the disk
+nearly full. Scratch files left by a process killed mid-part are removed
+when the next uploader starts.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+import tempfile
+import threading
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Protocol
+
+from icloudpd_web.store.models import AwsConfig
+
+
+log = logging.getLogger(__name__)
+
+MIB = 1024 * 1024
+# Copy buffer when cutting a part out of a file.
+_COPY_CHUNK = MIB
+# Part bodies staged on disk at once, across all uploads.
+DEFAULT_MAX_PARTS_ON_DISK = 4
+# Free space a part must leave behind on the scratch disk.
+FREE_SPACE_MARGIN = 256 * MIB
+_PART_PREFIX = "part-"
+
+
+class UploadError(Exception):
+    pass
+
+
+class Uploader(Protocol):
+    async def upload(self, cfg: AwsConfig, path: Path, key: str) -> str | None:
+        """Upload *path* to *key* in `cfg.bucket`; return the object's ETag
+        if known. Raise on failure."""
+        ...  # pragma: no cover
+
+
+def aws_env(cfg: AwsConfig) -> dict[str, str]:
+    """The environment for an aws CLI process using *cfg*'s credentials.
+
+    Unset credentials are left to the ambient environment (IAM role,
+    ~/.aws/credentials) rather than overridden with empty strings.
+    """
+    env = os.environ.copy()
+    if cfg.access_key_id:
+        env["AWS_ACCESS_KEY_ID"] = cfg.access_key_id
+    if cfg.secret_access_key:
+        env["AWS_SECRET_ACCESS_KEY"] = cfg.secret_access_key
+    if cfg.region:
+        env["AWS_DEFAULT_REGION"] = cfg.region
+    if cfg.endpoint_url:
+        env["AWS_ENDPOINT_URL"] = cfg.endpoint_url
+    return env
+
+
+def object_key(prefix: str, root: Path, path: Path) -> str | None:
+    """The S3 key `aws s3 sync root s3://bucket/prefix` would give *path*, or
+    None if *path* is not under *root* (which must be resolved)."""
+    try:
+        rel = path.resolve().relative_to(root)
+    except ValueError:
+        return None
+    prefix = prefix.strip("/")
+    return f"{prefix}/{rel.as_posix()}" if prefix else rel.as_posix()
+
+
+@dataclass
+class MultipartState:
+    """An unfinished multipart upload: enough to resume it, and to tell
+    whether the local file changed since it began."""
+
+    bucket: str
+    key: str
+    upload_id: str
+    size: int
+    mtime: float
+    part_size: int
+    parts: dict[int, str] = field(default_factory=dict)
+
+    @property
+    def part_count(self) -> int:
+        return max(1, math.ceil(self.size / self.part_size))
+
+    def matches(self, size: int, mtime: float, part_size: int) -> bool:
+        return (self.size, self.mtime, self.part_size) == (size, mtime, part_size)
+
+
+class CliUploader:
+    """Uploads with `aws s3api` commands, one process per request.
+
+    *state_dir* holds multipart state files and the part bodies being sent
+    (the CLI reads a part from a file). Without it nothing is persisted,
+    an interrupted multipart upload starts over, and parts are staged in
+    the system temp directory. One uploader is meant to own *state_dir*:
+    it deletes the part bodies it finds there on start.
+    """
+
+    def __init__(
+        self,
+        state_dir: Path | None = None,
+        *,
+        aws: Sequence[str] = ("aws",),
+        max_parts_on_disk: int = DEFAULT_MAX_PARTS_ON_DISK,
+    ) -> None:
+        self._state_dir = state_dir
+        self._aws = list(aws)
+        self._lock = threading.Lock()
+        self._parts_on_disk = asyncio.Semaphore(max(1, max_parts_on_disk))
+        if state_dir is not None:
+            state_dir.mkdir(parents=True, exist_ok=True)
+            self._remove_stale_parts(state_dir)
+
+    @staticmethod
+    def _remove_stale_parts(state_dir: Path) -> None:
+        # Left behind by a process killed mid-part (or mid-save); nothing
+        # of this uploader's can be using them yet.
+        for p in [*state_dir.glob(_PART_PREFIX + "*"), *state_dir.glob("*.tmp")]:
+            with contextlib.suppress(OSError):
+                p.unlink()
+
+    async def upload(self, cfg: AwsConfig, path: Path, key: str) -> str | None:
+        assert cfg.bucket is not None
+        st = await asyncio.to_thread(path.stat)
+        part_size = cfg.part_size_mb * MIB
+        if st.st_size <= part_size:
+            out = await self._s3api(
+                cfg, "put-object", "--bucket", cfg.bucket, "--key", key, "--body", str(path)
+            )
+            return _etag(out)
+        state = await asyncio.to_thread(
+            self._resumable, cfg.bucket, key, st.st_size, st.st_mtime, part_size
+        )
+        if state is None:
+            out = await self._s3api(
+                cfg, "create-multipart-upload", "--bucket", cfg.bucket, "--key", key
+            )
+            state = MultipartState(
+                bucket=cfg.bucket,
+                key=key,
+                upload_id=str(out["UploadId"]),
+                size=st.st_size,
+                mtime=st.st_mtime,
+                part_size=part_size,
+            )
+            await asyncio.to_thread(self._save, state)
+        else:
+            log.info(
+                "resuming upload of %s at %d/%d parts", key, len(state.parts), state.part_count
+            )
+        return await self._finish_multipart(cfg, path, state)
+
+    async def _finish_multipart(
+        self, cfg: AwsConfig, path: Path, state: MultipartState
+    ) -> str | None:
+        gate = asyncio.Semaphore(cfg.parallel_parts)
+
+        async def send(number: int) -> None:
+            async with gate:
+                etag = await self._upload_part(cfg, path, state, number)
+            state.parts[number] = etag
+            await asyncio.to_thread(self._save, state)
+
+        missing = [n for n in range(1, state.part_count + 1) if n not in state.parts]
+        # Every part is attempted even if one fails, so a retry has less left.
+        results = await asyncio.gather(*(send(n) for n in missing), return_exceptions=True)
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        parts = [{"PartNumber": n, "ETag": f'"{state.parts[n]}"'} for n in sorted(state.parts)]
+        try:
+            out = await self._s3api(
+                cfg,
+                "complete-multipart-upload",
+                "--bucket",
+                state.bucket,
+                "--key",
+                state.key,
+                "--upload-id",
+                state.upload_id,
+                "--multipart-upload",
+                json.dumps({"Parts": parts}),
+            )
+        except UploadError as e:
+            if "NoSuchUpload" in str(e):
+                # Expired or aborted server-side; the next attempt starts over.
+                await asyncio.to_thread(self._forget, state)
+            raise
+        await asyncio.to_thread(self._forget, state)
+        return _etag(out)
+
+    async def _upload_part(
+        self, cfg: AwsConfig, path: Path, state: MultipartState, number: int
+    ) -> str:
+        async with self._parts_on_disk:
+            body = await asyncio.to_thread(self._cut_part, path, state, number)
+            try:
+                out = await self._s3api(
+                    cfg,
+                    "upload-part",
+                    "--bucket",
+                    state.bucket,
+                    "--key",
+                    state.key,
+                    "--upload-id",
+                    state.upload_id,
+                    "--part-number",
+                    str(number),
+                    "--body",
+                    str(body),
+                )
+            finally:
+                body.unlink(missing_ok=True)  # noqa: ASYNC240
+        etag = _etag(out)
+        if etag is None:
+            raise UploadError(f"no ETag for part {number} of {state.key}")
+        return etag
+
+    async def _s3api(self, cfg: AwsConfig, *args: str) -> dict[str, Any]:
+        proc = await asyncio.create_subprocess_exec(
+            *self._aws,
+            "s3api",
+            *args,
+            "--output",
+            "json",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=aws_env(cfg),
+        )
+        out, err = await proc.communicate()
+        if proc.returncode != 0:
+            message = err.decode("utf-8", errors="replace").strip().splitlines()
+            raise UploadError(message[-1] if message else f"exit {proc.returncode}")
+        try:
+            data = json.loads(out or b"{}")
+        except json.JSONDecodeError:
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _cut_part(self, path: Path, state: MultipartState, number: int) -> Path:
+        start = (number - 1) * state.part_size
+        length = min(state.part_size, state.size - start)
+        scratch = self._state_dir or Path(tempfile.gettempdir())
+        free = shutil.disk_usage(scratch).free
+        if free < length + FREE_SPACE_MARGIN:
+            raise UploadError(
+                f"not enough free space in {scratch} to stage part {number} of {state.key}"
+                f" ({length // MIB} MiB, {free // MIB} MiB free)"
+            )
+        fd, name = tempfile.mkstemp(prefix=_PART_PREFIX, dir=scratch)
+        with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+            src.seek(start)
+            remaining = length
+            while remaining > 0:
+                chunk = src.read(min(_COPY_CHUNK, remaining))
+                if not chunk:
+                    break
+                dst.write(chunk)
+                remaining -= len(chunk)
+        return Path(name)
+
+    # -- state files -------------------------------------------------------
+
+    def _state_path(self, bucket: str, key: str) -> Path | None:
+        if self._state_dir is None:
+            return None
+        digest = hashlib.sha256(f"{bucket}/{key}".encode()).hexdigest()[:32]
+        return self._state_dir / f"{digest}.json"
+
+    def _resumable(
+        self, bucket: str, key: str, size: int, mtime: float, part_size: int
+    ) -> MultipartState | None:
+        path = self._state_path(bucket, key)
+        if path is None or not path.is_file():
+            return None
+        try:
+            raw = json.loads(path.read_text())
+            raw["parts"] = {int(n): etag for n, etag in raw.get("parts", {}).items()}
+            state = MultipartState(**raw)
+        except (OSError, ValueError, TypeError):
+            log.warning("ignoring unreadable multipart state %s", path)
+            path.unlink(missing_ok=True)
+            return None
+        if state.bucket != bucket or state.key != key or not state.matches(size, mtime, part_size):
+            # The file (or part size) changed; its parts are no use. The old
+            # upload is left for the bucket's lifecycle rule to abort.
+            path.unlink(missing_ok=True)
+            return None
+        return state
+
+    def _save(self, state: MultipartState) -> None:
+        path = self._state_path(state.bucket, state.key)
+        if path is None:
+            return
+        with self._lock:
+            tmp = path.with_suffix(".tmp")
+            tmp.write_text(json.dumps(asdict(state)))
+            os.replace(tmp, path)
+
+    def _forget(self, state: MultipartState) -> None:
+        path = self._state_path(state.bucket, state.key)
+        if path is not None:
+            with contextlib.suppress(OSError):
+                path.unlink()
+
+
+def _etag(out: dict[str, Any]) -> str | None:
+    etag = out.get("ETag")
+    return etag.strip('"') if isinstance(etag, str) else None
@@ -0,0 +1,63 @@
+"""Which local files are already in S3, so incremental uploads skip them.
+
+One row per uploaded object, keyed by (bucket, key), with the local file's
+size and mtime at upload time and the ETag S3 returned. A file counts as
+uploaded while its size and mtime still match; hashing it again isn't
+needed to decide.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    bucket      TEXT NOT NULL,
+    key         TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    mtime       REAL NOT NULL,
+    etag        TEXT,
+    uploaded_at REAL NOT NULL,
+    PRIMARY KEY (bucket, key)
+);
+"""
+
+
+class UploadManifest:
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def is_current(self, bucket: str, key: str, *, size: int, mtime: float) -> bool:
+        """True if this exact file version was already uploaded to *key*."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime FROM uploads WHERE bucket = ? AND key = ?", (bucket, key)
+            ).fetchone()
+        return row is not None and row[0] == size and row[1] == mtime
+
+    def record(self, bucket: str, key: str, *, size: int, mtime: float, etag: str | None) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO uploads (bucket, key, size, mtime, etag, uploaded_at)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (bucket, key, size, mtime, etag, time.time()),
+            )
+
+    def etag(self, bucket: str, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag FROM uploads WHERE bucket = ? AND key = ?", (bucket, key)
+            ).fetchone()
+        return row[0] if row is not None else None
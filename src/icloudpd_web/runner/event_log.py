@@ -0,0 +1,148 @@
+"""On-disk journal of a run's events, for replay beyond the ring buffer.
+
+Next to `<run_id>.log`, a Run writes:
+
+- `<run_id>.events`: one JSON object per published event. Log events do
+  not repeat their text; they store the `[start, end)` byte span of their
+  lines in the `.log` file instead.
+- `<run_id>.events.idx`: a fixed-width table of little-endian uint64
+  journal offsets, one per seq (seq N lives at byte `(N - 1) * 8`), so a
+  replay can seek straight to any seq.
+
+Replays are streamed: events are read and materialized one at a time, so
+replaying a huge run never holds it in memory. `replay_events_async` does
+the reading in worker threads, `REPLAY_CHUNK` events per hop, for callers
+on the event loop. Spans are offsets into the
+uncompressed text, and are read in order, so they resolve the same way
+once the log has been gzipped.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import json
+import struct
+import time
+from collections.abc import AsyncIterator, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any, Literal
+
+from .log_storage import open_log
+
+
+RunEventKind = Literal["log", "log_batch", "progress", "status", "resync"]
+
+_OFFSET = struct.Struct("<Q")
+# Events read per worker-thread hop by replay_events_async.
+REPLAY_CHUNK = 256
+
+
+@dataclass
+class RunEvent:
+    seq: int
+    kind: RunEventKind
+    ts: float
+    data: dict[str, Any]
+
+
+def journal_path(log_path: Path) -> Path:
+    return log_path.with_suffix(".events")
+
+
+def index_path(log_path: Path) -> Path:
+    return log_path.with_suffix(".events.idx")
+
+
+class EventLogWriter:
+    def __init__(self, log_path: Path) -> None:
+        self._journal = open(journal_path(log_path), "wb")  # noqa: SIM115
+        self._index = open(index_path(log_path), "wb")  # noqa: SIM115
+        self._offset = 0
+
+    def append(self, ev: RunEvent, *, span: tuple[int, int] | None = None) -> None:
+        """Journal *ev*. Log events pass the byte *span* of their lines instead
+        of having their text duplicated. No-op once closed."""
+        if self._journal.closed:
+            return
+        record: dict[str, Any] = {"seq": ev.seq, "kind": ev.kind, "ts": ev.ts}
+        if span is not None:
+            record["span"] = list(span)
+        else:
+            record["data"] = ev.data
+        line = json.dumps(record, separators=(",", ":"), default=str).encode("utf-8") + b"\n"
+        self._index.write(_OFFSET.pack(self._offset))
+        self._journal.write(line)
+        self._offset += len(line)
+
+    def flush(self) -> None:
+        if self._journal.closed:
+            return
+        self._journal.flush()
+        self._index.flush()
+
+    def close(self) -> None:
+        self._journal.close()
+        self._index.close()
+
+
+def has_event_log(log_path: Path) -> bool:
+    return journal_path(log_path).is_file() and index_path(log_path).is_file()
+
+
+def last_seq(log_path: Path) -> int:
+    """The highest journaled seq for a run."""
+    return index_path(log_path).stat().st_size // _OFFSET.size
+
+
+def replay_events(
+    log_path: Path, *, since: int | None = None, until: int | None = None
+) -> Iterator[RunEvent]:
+    """Yield journaled events with `since < seq <= until`, oldest first."""
+    first = (since or 0) + 1
+    with open(index_path(log_path), "rb") as idx:
+        idx.seek((first - 1) * _OFFSET.size)
+        raw = idx.read(_OFFSET.size)
+    if len(raw) < _OFFSET.size:
+        return
+    (start,) = _OFFSET.unpack(raw)
+    with open(journal_path(log_path), "rb") as journal, open_log(log_path) as log:
+        journal.seek(start)
+        for line in journal:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                return  # torn final write from a crash; nothing after it
+            if until is not None and record["seq"] > until:
+                return
+            yield _materialize(record, log)
+
+
+async def replay_events_async(
+    log_path: Path, *, since: int | None = None, until: int | None = None
+) -> AsyncIterator[RunEvent]:
+    """`replay_events`, with the disk reads (and any inflating) off the
+    event loop."""
+    events = replay_events(log_path, since=since, until=until)
+    try:
+        while chunk := await asyncio.to_thread(
+            lambda: list(itertools.islice(events, REPLAY_CHUNK))
+        ):
+            for ev in chunk:
+                yield ev
+    finally:
+        events.close()
+
+
+def _materialize(record: dict[str, Any], log: IO[bytes]) -> RunEvent:
+    data = record.get("data")
+    if data is None:
+        begin, end = record["span"]
+        log.seek(begin)
+        text = log.read(end - begin).decode("utf-8", errors="replace")
+        lines = text.removesuffix("\n").split("\n")
+        data = {"line": lines[0]} if record["kind"] == "log" else {"lines": lines}
+    return RunEvent(
+        seq=record["seq"], kind=record["kind"], ts=record.get("ts", time.time()), data=data
+    )
@@ -0,0 +1,214 @@
+"""Photo metadata cached on disk, so filtering a file again doesn't open it.
+
+One row per path with the file's size and mtime_ns when it was read, and
+what post_filter reads from it (Make, Model, capture date, dimensions). A
+row answers for the file while its stat still matches; otherwise the file
+is read again and the row replaced. Re-evaluating a library whose files
+haven't changed then costs a stat and a lookup per file.
+
+The table is bounded: once it holds more than `max_entries` rows the least
+recently used are dropped. A hit doesn't write: `used_at` only needs to be
+roughly right, so a hit on a row refreshed within `touch_interval` changes
+nothing, and older rows are refreshed together in one transaction when
+`flush()` is called (apply_filters does, once per batch). Re-filtering an
+unchanged library is then reads only.
+
+Filter workers in other processes open the same file, so it is in WAL
+mode and writers wait on each other instead of failing. With WAL,
+`synchronous = NORMAL` still never corrupts the cache; a crash loses at
+most the last few writes, which are re-read from the files.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+from .exif_header import ImageMetadata
+
+
+CACHE_NAME = "exif.sqlite3"
+DEFAULT_MAX_ENTRIES = 500_000
+# Seconds a row's used_at may lag behind its last hit.
+DEFAULT_TOUCH_INTERVAL = 3600.0
+# After going over max_entries, prune down to this share of it, so pruning
+# doesn't happen again on the next insert.
+_PRUNE_TO = 0.9
+
+_SCHEMA = """
+PRAGMA journal_mode = WAL;
+PRAGMA synchronous = NORMAL;
+CREATE TABLE IF NOT EXISTS exif (
+    path     TEXT PRIMARY KEY,
+    size     INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    make     TEXT,
+    model    TEXT,
+    taken    TEXT,
+    width    INTEGER,
+    height   INTEGER,
+    used_at  REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS exif_by_use ON exif (used_at);
+"""
+
+
+class ExifCache:
+    def __init__(
+        self,
+        path: Path,
+        *,
+        max_entries: int = DEFAULT_MAX_ENTRIES,
+        touch_interval: float = DEFAULT_TOUCH_INTERVAL,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._max_entries = max_entries
+        self._touch_interval = touch_interval
+        # path -> time of its latest hit, for rows whose used_at is stale.
+        self._touched: dict[str, float] = {}
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+            # Approximate when other processes write too; corrected on prune.
+            self._count: int = self._conn.execute("SELECT COUNT(*) FROM exif").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._flush()
+            finally:
+                self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return int(self._conn.execute("SELECT COUNT(*) FROM exif").fetchone()[0])
+
+    def get(self, path: Path) -> ImageMetadata | None:
+        """The cached metadata for *path* if its size and mtime still match."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return self._get(path, st)
+
+    def lookup(self, path: Path, read: Callable[[Path], ImageMetadata]) -> ImageMetadata:
+        """*path*'s metadata from the cache, or from `read(path)` (then
+        cached) if there's no current row."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return read(path)
+        meta = self._get(path, st)
+        if meta is None:
+            # Stat taken before reading: if the file changes meanwhile, the
+            # row is stale on arrival and the next lookup reads it again.
+            meta = read(path)
+            self._put(path, st, meta)
+        return meta
+
+    def flush(self) -> None:
+        """Write the used_at of rows hit since the last flush."""
+        with self._lock:
+            self._flush()
+
+    def discard(self, path: Path) -> None:
+        with self._lock:
+            self._touched.pop(str(path), None)
+            cur = self._conn.execute("DELETE FROM exif WHERE path = ?", (str(path),))
+            self._count -= cur.rowcount
+
+    def _get(self, path: Path, st: os.stat_result) -> ImageMetadata | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, make, model, taken, width, height, used_at"
+                " FROM exif WHERE path = ?",
+                (str(path),),
+            ).fetchone()
+            if row is None or (row[0], row[1]) != (st.st_size, st.st_mtime_ns):
+                return None
+            now = time.time()
+            if now - row[7] >= self._touch_interval:
+                self._touched[str(path)] = now
+        return ImageMetadata(*row[2:7])
+
+    def _put(self, path: Path, st: os.stat_result, meta: ImageMetadata) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO exif (path, size, mtime_ns, make, model, taken, width,"
+                " height, used_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    str(path),
+                    st.st_size,
+                    st.st_mtime_ns,
+                    meta.make,
+                    meta.model,
+                    meta.taken,
+                    meta.width,
+                    meta.height,
+                    time.time(),
+                ),
+            )
+            # Counts replaced rows too; _prune recounts before deleting.
+            self._count += 1
+            if self._count > self._max_entries:
+                self._prune()
+
+    def _flush(self) -> None:
+        if not self._touched:
+            return
+        self._conn.execute("BEGIN")
+        try:
+            self._conn.executemany(
+                "UPDATE exif SET used_at = ? WHERE path = ?",
+                ((t, p) for p, t in self._touched.items()),
+            )
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+        self._touched.clear()
+
+    def _prune(self) -> None:
+        # Pending hits count, or a row just used could be pruned as stale.
+        self._flush()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM exif").fetchone()[0]
+        if self._count <= self._max_entries:
+            return
+        keep = int(self._max_entries * _PRUNE_TO)
+        self._conn.execute(
+            "DELETE FROM exif WHERE path IN"
+            " (SELECT path FROM exif ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (keep,),
+        )
+        self._count = self._conn.execute("SELECT COUNT(*) FROM exif").fetchone()[0]
+
+
+_shared: dict[Path, ExifCache] = {}
+_shared_lock = threading.Lock()
+
+
+def shared_cache(path: Path) -> ExifCache:
+    """This process's ExifCache for *path*, opened on first use. Filter
+    workers call it per batch, so threads share one connection and each
+    worker process opens its own."""
+    with _shared_lock:
+        cache = _shared.get(path)
+        if cache is None:
+            cache = _shared[path] = ExifCache(path)
+        return cache
+
+
+def close_shared() -> None:
+    with _shared_lock:
+        for cache in _shared.values():
+            with contextlib.suppress(sqlite3.Error):
+                cache.close()
+        _shared.clear()
@@ -0,0 +1,336 @@
+"""Make/Model (and capture date, dimensions) without decoding the photo.
+
+post_filter needs two strings from IFD0. Having Pillow open the image and
+map every tag to a name costs far more than that, especially for RAW and
+large HEIC files. `read_metadata` walks the container instead:
+
+- JPEG: the APP1 "Exif" segment;
+- TIFF and the TIFF-based RAW formats (DNG, CR2, NEF, ARW, ...): the file
+  is a TIFF header;
+- HEIC/HEIF (ISO BMFF): the `Exif` item located through the meta box.
+
+It reads the first HEAD_BYTES and then only small pieces at the offsets
+those headers give, never the image data. A file it doesn't recognise, or
+can't parse, yields None so the caller can fall back to Pillow.
+"""
+
+from __future__ import annotations
+
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+
+HEAD_BYTES = 64 * 1024
+# Longest Make/Model string read; real ones are a few dozen bytes.
+MAX_STRING = 256
+# Bounds on what a damaged or hostile file can make us walk.
+MAX_SEGMENTS = 64
+MAX_IFD_ENTRIES = 1024
+MAX_META_BYTES = 1024 * 1024
+
+TAG_WIDTH = 0x0100
+TAG_HEIGHT = 0x0101
+TAG_MAKE = 0x010F
+TAG_MODEL = 0x0110
+TAG_DATETIME = 0x0132
+TAG_EXIF_IFD = 0x8769
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_PIXEL_X = 0xA002
+TAG_PIXEL_Y = 0xA003
+_ASCII, _SHORT, _LONG = 2, 3, 4
+_IFD0_TAGS = frozenset({TAG_WIDTH, TAG_HEIGHT, TAG_MAKE, TAG_MODEL, TAG_DATETIME, TAG_EXIF_IFD})
+_EXIF_TAGS = frozenset({TAG_DATETIME_ORIGINAL, TAG_PIXEL_X, TAG_PIXEL_Y})
+# JPEG start-of-frame markers; C4, C8 and CC share the range but aren't.
+_SOF = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+@dataclass(frozen=True)
+class ImageMetadata:
+    """What post_filter and the EXIF cache keep about a photo. Any field is
+    None when the file doesn't carry it."""
+
+    make: str | None = None
+    model: str | None = None
+    # As EXIF writes it: "YYYY:MM:DD HH:MM:SS".
+    taken: str | None = None
+    width: int | None = None
+    height: int | None = None
+
+
+class _MalformedError(Exception):
+    pass
+
+
+def read_metadata(path: Path) -> ImageMetadata | None:
+    """*path*'s metadata from its headers. None if the format isn't one
+    handled here or the file is malformed."""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(HEAD_BYTES)
+            size: tuple[int, int] | None = None
+            if head[:2] == b"\xff\xd8":
+                tiff_at, size = _jpeg_exif(f, head)
+            elif head[:4] in (b"II*\0", b"MM\0*"):
+                tiff_at = 0
+            elif head[4:8] == b"ftyp":
+                tiff_at = _heif_exif(f, head)
+            else:
+                return None
+            meta = _read_tiff(f, tiff_at) if tiff_at is not None else ImageMetadata()
+    except (OSError, _MalformedError, struct.error, IndexError):
+        return None
+    if size is not None:
+        return ImageMetadata(meta.make, meta.model, meta.taken, *size)
+    return meta
+
+
+def _read_at(f: BinaryIO, offset: int, size: int) -> bytes:
+    f.seek(offset)
+    data = f.read(size)
+    if len(data) != size:
+        raise _MalformedError(f"short read at {offset}")
+    return data
+
+
+def _slice(f: BinaryIO, head: bytes, offset: int, size: int) -> bytes:
+    if offset + size <= len(head):
+        return head[offset : offset + size]
+    return _read_at(f, offset, size)
+
+
+def _jpeg_exif(f: BinaryIO, head: bytes) -> tuple[int | None, tuple[int, int] | None]:
+    """File offset of the TIFF header in the APP1 Exif segment and the
+    frame's (width, height), each None if the markers before the image
+    data don't have it."""
+    tiff_at: int | None = None
+    pos = 2
+    for _ in range(MAX_SEGMENTS):
+        marker = _slice(f, head, pos, 4)
+        if marker[0] != 0xFF:
+            raise _MalformedError("bad JPEG marker")
+        kind = marker[1]
+        if kind == 0xFF:  # fill byte
+            pos += 1
+            continue
+        if kind in (0xDA, 0xD9):  # start of scan / end of image
+            break
+        (length,) = struct.unpack(">H", marker[2:4])
+        if kind in _SOF:
+            # precision (1), then height and width
+            height, width = struct.unpack(">HH", _slice(f, head, pos + 5, 4))
+            return tiff_at, (width, height)
+        if kind == 0xE1 and length >= 8 and tiff_at is None:
+            if _slice(f, head, pos + 4, 6) == b"Exif\0\0":
+                tiff_at = pos + 10
+        pos += 2 + length
+    return tiff_at, None
+
+
+def _boxes(data: bytes, start: int, end: int) -> list[tuple[bytes, int, int]]:
+    """(type, payload start, payload end) of the ISO BMFF boxes in
+    data[start:end]."""
+    out = []
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack(">I4s", data[pos : pos + 8])
+        header = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", data[pos + 8 : pos + 16])
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise _MalformedError("bad box size")
+        out.append((kind, pos + header, pos + size))
+        pos += size
+    return out
+
+
+def _heif_exif(f: BinaryIO, head: bytes) -> int | None:
+    """File offset of the TIFF header in a HEIF file's Exif item."""
+    meta = _find_meta(f, head)
+    if meta is None:
+        return None
+    data, start = meta
+    children = {kind: (s, e) for kind, s, e in _boxes(data, start + 4, len(data))}
+    if b"iinf" not in children or b"iloc" not in children:
+        return None
+    item_id = _exif_item_id(data, *children[b"iinf"])
+    if item_id is None:
+        return None
+    extent = _item_extent(data, *children[b"iloc"], item_id)
+    if extent is None:
+        return None
+    offset, length = extent
+    if length < 4:
+        raise _MalformedError("short Exif item")
+    # The item starts with the offset from its 5th byte to the TIFF header
+    # (usually 6, skipping "Exif\0\0").
+    (skip,) = struct.unpack(">I", _read_at(f, offset, 4))
+    if skip > length - 4:
+        raise _MalformedError("bad Exif item header")
+    return offset + 4 + skip
+
+
+def _find_meta(f: BinaryIO, head: bytes) -> tuple[bytes, int] | None:
+    """The top-level meta box's bytes and where its payload starts."""
+    pos = 0
+    for _ in range(MAX_SEGMENTS):
+        if pos + 16 <= len(head):
+            header = head[pos : pos + 16]
+        else:
+            f.seek(pos)
+            header = f.read(16)
+        if len(header) < 8:
+            return None
+        size, kind = struct.unpack(">I4s", header[:8])
+        length = 8
+        if size == 1:
+            (size,) = struct.unpack(">Q", header[8:16])
+            length = 16
+        if size < length:
+            return None
+        if kind == b"meta":
+            if size > MAX_META_BYTES:
+                raise _MalformedError("meta box too large")
+            return _slice(f, head, pos, size), length
+        pos += size
+    return None
+
+
+def _exif_item_id(data: bytes, start: int, end: int) -> int | None:
+    version = data[start]
+    pos = start + 4
+    if version == 0:
+        pos += 2
+    else:
+        pos += 4
+    for kind, s, _ in _boxes(data, pos, end):
+        if kind != b"infe" or data[s] < 2:
+            continue
+        if data[s] == 2:
+            item_id, _, item_type = struct.unpack(">HH4s", data[s + 4 : s + 12])
+        else:
+            item_id, _, item_type = struct.unpack(">IH4s", data[s + 4 : s + 14])
+        if item_type == b"Exif":
+            return int(item_id)
+    return None
+
+
+def _uint(data: bytes, pos: int, size: int) -> tuple[int, int]:
+    if size == 0:
+        return 0, pos
+    if size not in (4, 8):
+        raise _MalformedError(f"bad iloc field size {size}")
+    return int.from_bytes(data[pos : pos + size], "big"), pos + size
+
+
+def _item_extent(data: bytes, start: int, end: int, item_id: int) -> tuple[int, int] | None:
+    """(file offset, length) of *item_id*'s first extent, if stored in the
+    file (construction method 0)."""
+    version = data[start]
+    offset_size, length_size = data[start + 4] >> 4, data[start + 4] & 0xF
+    base_size, index_size = data[start + 5] >> 4, data[start + 5] & 0xF
+    pos = start + 6
+    if version < 2:
+        (count,) = struct.unpack(">H", data[pos : pos + 2])
+        pos += 2
+    else:
+        (count,) = struct.unpack(">I", data[pos : pos + 4])
+        pos += 4
+    for _ in range(count):
+        if pos > end:
+            raise _MalformedError("truncated iloc")
+        if version < 2:
+            (this_id,) = struct.unpack(">H", data[pos : pos + 2])
+            pos += 2
+        else:
+            (this_id,) = struct.unpack(">I", data[pos : pos + 4])
+            pos += 4
+        method = 0
+        if version in (1, 2):
+            (method,) = struct.unpack(">H", data[pos : pos + 2])
+            method &= 0xF
+            pos += 2
+        pos += 2  # data_reference_index
+        base, pos = _uint(data, pos, base_size)
+        (extents,) = struct.unpack(">H", data[pos : pos + 2])
+        pos += 2
+        first: tuple[int, int] | None = None
+        for _ in range(extents):
+            if version in (1, 2) and index_size:
+                _, pos = _uint(data, pos, index_size)
+            offset, pos = _uint(data, pos, offset_size)
+            length, pos = _uint(data, pos, length_size)
+            if first is None:
+                first = (base + offset, length)
+        if this_id == item_id:
+            return first if method == 0 else None
+    return None
+
+
+def _read_tiff(f: BinaryIO, base: int) -> ImageMetadata:
+    """Metadata from the TIFF structure at *base*: IFD0, and the Exif IFD
+    it points to."""
+    header = _read_at(f, base, 8)
+    order = {b"II": "<", b"MM": ">"}.get(header[:2])
+    if order is None:
+        raise _MalformedError("bad TIFF byte order")
+    magic, ifd = struct.unpack(order + "HI", header[2:8])
+    if magic != 42:
+        raise _MalformedError("bad TIFF magic")
+    found = _read_ifd(f, base, ifd, order, _IFD0_TAGS)
+    exif_ifd = found.get(TAG_EXIF_IFD)
+    if isinstance(exif_ifd, int):
+        found |= _read_ifd(f, base, exif_ifd, order, _EXIF_TAGS)
+
+    def text(tag: int) -> str | None:
+        value = found.get(tag)
+        return value if isinstance(value, str) else None
+
+    def number(*tags: int) -> int | None:
+        for tag in tags:
+            value = found.get(tag)
+            if isinstance(value, int) and value > 0:
+                return value
+        return None
+
+    return ImageMetadata(
+        make=text(TAG_MAKE),
+        model=text(TAG_MODEL),
+        taken=text(TAG_DATETIME_ORIGINAL) or text(TAG_DATETIME),
+        width=number(TAG_PIXEL_X, TAG_WIDTH),
+        height=number(TAG_PIXEL_Y, TAG_HEIGHT),
+    )
+
+
+def _read_ifd(
+    f: BinaryIO, base: int, ifd: int, order: str, tags: frozenset[int]
+) -> dict[int, str | int]:
+    """The ASCII, SHORT and LONG values of *tags* in the IFD at *ifd*."""
+    (count,) = struct.unpack(order + "H", _read_at(f, base + ifd, 2))
+    if count > MAX_IFD_ENTRIES:
+        raise _MalformedError("too many IFD entries")
+    entries = _read_at(f, base + ifd + 2, 12 * count)
+    found: dict[int, str | int] = {}
+    for i in range(count):
+        entry = entries[12 * i : 12 * i + 12]
+        tag, kind, n = struct.unpack(order + "HHI", entry[:8])
+        if tag not in tags:
+            continue
+        if kind == _SHORT and n == 1:
+            (found[tag],) = struct.unpack(order + "H", entry[8:10])
+        elif kind == _LONG and n == 1:
+            (found[tag],) = struct.unpack(order + "I", entry[8:12])
+        elif kind == _ASCII:
+            n = min(n, MAX_STRING)
+            if n <= 4:
+                raw = entry[8 : 8 + n]
+            else:
+                (offset,) = struct.unpack(order + "I", entry[8:12])
+                raw = _read_at(f, base + offset, n)
+            # As Pillow reads ASCII tags: one trailing NUL dropped, latin-1.
+            found[tag] = raw.removesuffix(b"\0").decode("latin-1")
+    return found
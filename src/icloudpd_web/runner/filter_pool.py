@@ -0,0 +1,152 @@
+"""A dedicated worker pool for post-download filters.
+
+Filtering a file means opening it with Pillow for its EXIF tags and maybe
+deleting it. Doing that on the loop's default executor, one task per file,
+competes with everything else queued there (log compression, index
+writes) and with a 50k-photo first sync buries them. Runs instead hand
+their downloaded paths to a `FilterPool` in batches: each batch is one
+round trip to a worker that evaluates and deletes in one go.
+
+The pool is threads by default. With `kind="process"` it is processes,
+which decode in parallel without sharing the GIL, at the cost of worker
+start-up and pickling each batch.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+from .exif_cache import ExifCache, close_shared, shared_cache
+from .post_filter import FilterPlan, evaluate
+
+
+log = logging.getLogger(__name__)
+
+PoolKind = Literal["thread", "process"]
+
+# Paths per batch, and how long a partial batch waits for more.
+FILTER_BATCH_SIZE = 32
+FILTER_BATCH_INTERVAL = 0.2
+# Batches a run may have in flight before it stops reading icloudpd's
+# output (and so stalls the download) until one finishes.
+MAX_BATCHES_IN_FLIGHT = 4
+
+
+@dataclass
+class FilterOutcome:
+    path: Path
+    kept: bool
+    reason: str
+    # Set if the file could not be evaluated or, when rejected, deleted.
+    error: str | None = None
+
+
+def apply_filters(
+    paths: list[Path], plan: FilterPlan, exif_cache: Path | None = None, delete: bool = True
+) -> list[FilterOutcome]:
+    """Evaluate each path and, if *delete*, delete the rejected ones,
+    reading EXIF through the cache at *exif_cache* if given. Runs in a
+    worker, so it must stay a picklable module-level function."""
+    cache = shared_cache(exif_cache) if exif_cache is not None and plan.needs_exif else None
+    try:
+        return [_apply_one(path, plan, cache, delete=delete) for path in paths]
+    finally:
+        if cache is not None:
+            # One write for the whole batch's cache hits.
+            cache.flush()
+
+
+def _apply_one(
+    path: Path, plan: FilterPlan, cache: ExifCache | None, *, delete: bool
+) -> FilterOutcome:
+    try:
+        decision = evaluate(path, plan, cache=cache)
+    except Exception as e:  # noqa: BLE001
+        return FilterOutcome(path, True, "", error=f"evaluation failed for {path}: {e}")
+    if decision.kept or not delete:
+        return FilterOutcome(path, decision.kept, decision.reason)
+    try:
+        os.unlink(decision.path)
+    except OSError as e:
+        return FilterOutcome(path, False, decision.reason, error=f"could not delete {path}: {e}")
+    if cache is not None:
+        cache.discard(path)
+    return FilterOutcome(path, False, decision.reason)
+
+
+class FilterPool:
+    """Executor for filter batches, shared by all runs. *workers* of 0
+    means one per CPU. The executor starts on first use. *exif_cache* is
+    the ExifCache file workers read EXIF through; None reads every file."""
+
+    def __init__(
+        self, workers: int = 0, *, kind: PoolKind = "thread", exif_cache: Path | None = None
+    ) -> None:
+        self._workers = workers
+        self._kind = kind
+        self._exif_cache = exif_cache
+        self._executor: Executor | None = None
+
+    @property
+    def size(self) -> int:
+        return self._workers or os.cpu_count() or 1
+
+    @property
+    def kind(self) -> PoolKind:
+        return self._kind
+
+    def configure(self, workers: int, *, kind: PoolKind) -> None:
+        """Change size or kind. Batches already submitted finish on the old
+        executor; later ones go to a new one."""
+        if (workers, kind) == (self._workers, self._kind):
+            return
+        old, self._executor = self._executor, None
+        self._workers, self._kind = workers, kind
+        if old is not None:
+            old.shutdown(wait=False)
+
+    async def run(
+        self, paths: list[Path], plan: FilterPlan, *, delete: bool = True
+    ) -> list[FilterOutcome]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._ensure_executor(), apply_filters, paths, plan, self._exif_cache, delete
+        )
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+        # Thread workers' connections live in this process.
+        close_shared()
+
+    def _ensure_executor(self) -> Executor:
+        if self._executor is None:
+            if self._kind == "process":
+                # Not fork: the server has threads, and a forked child can
+                # inherit one of their locks held.
+                self._executor = ProcessPoolExecutor(
+                    self.size, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(self.size, thread_name_prefix="filter")
+            log.info("filter pool: %d %s worker(s)", self.size, self._kind)
+        return self._executor
+
+
+_default: FilterPool | None = None
+
+
+def default_pool() -> FilterPool:
+    """The pool for Runs not given one (tests, discovery runs)."""
+    global _default
+    if _default is None:
+        _default = FilterPool()
+    return _default
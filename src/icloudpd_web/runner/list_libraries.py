@@ -12,6 +12,7 @@ without spaces or log prefixes (e.g. 'PrimarySync',
 from __future__ import annotations
 
 import re
+from collections.abc import Iterable
 
 
 # icloudpd emits library identifiers as either "PrimarySync" (personal
@@ -28,10 +29,12 @@ _LIBRARY_NAME_RE = re.compile(
 )
 
 
-def parse_library_names(log_text: str) -> list[str]:
+def parse_library_names(log_text: str | Iterable[str]) -> list[str]:
+    """Library names from a log, given as text or as an iterable of lines."""
+    lines = log_text.splitlines() if isinstance(log_text, str) else log_text
     names: list[str] = []
     seen: set[str] = set()
-    for raw in log_text.splitlines():
+    for raw in lines:
         line = raw.strip()
         if not line:
             continue
@@ -0,0 +1,87 @@
+"""Partial reads of run logs, so huge logs never travel whole.
+
+Both readers work on byte offsets and always return whole lines, which
+lets a client page through a log (forward from an offset, or backward
+from the tail) using the offsets returned with each page.
+"""
+
+from __future__ import annotations
+
+import collections
+import gzip
+from typing import IO
+
+
+TAIL_BLOCK_SIZE = 64 * 1024
+
+
+def tail_lines(f: IO[bytes], lines: int, *, block_size: int = TAIL_BLOCK_SIZE) -> tuple[int, bytes]:
+    """Return (start_offset, data) for the last *lines* lines of *f*.
+
+    Scans backward from EOF a block at a time, so cost is proportional to
+    the size of the tail, not of the file. That includes a gzipped log
+    opened through `open_log`, which seeks by block; only a plain gzip
+    stream (an older `.gz` with no block index) is decompressed front to
+    back, keeping the last *lines* lines.
+    """
+    if isinstance(f, gzip.GzipFile):
+        return _tail_stream(f, lines)
+    size = f.seek(0, 2)
+    if lines <= 0:
+        return size, b""
+    pos = size
+    chunks: list[bytes] = []
+    newlines = 0
+    # One newline more than wanted marks where the tail begins; a newline
+    # right at EOF only terminates the last line.
+    while pos > 0 and newlines <= lines:
+        step = min(block_size, pos)
+        pos -= step
+        f.seek(pos)
+        chunk = f.read(step)
+        chunks.append(chunk)
+        newlines += chunk.count(b"\n")
+    data = b"".join(reversed(chunks))
+    body_end = len(data) - 1 if data.endswith(b"\n") else len(data)
+    cut = body_end
+    for _ in range(lines):
+        cut = data.rfind(b"\n", 0, cut)
+        if cut == -1:
+            break
+    begin = cut + 1  # cut == -1 means the tail is the whole file
+    return pos + begin, data[begin:]
+
+
+def _tail_stream(f: IO[bytes], lines: int) -> tuple[int, bytes]:
+    kept: collections.deque[tuple[int, bytes]] = collections.deque(maxlen=max(lines, 0))
+    pos = 0
+    for line in f:
+        if lines > 0:
+            kept.append((pos, line))
+        pos += len(line)
+    if not kept:
+        return pos, b""
+    return kept[0][0], b"".join(line for _, line in kept)
+
+
+def read_lines(f: IO[bytes], offset: int, limit: int) -> tuple[int, bytes]:
+    """Return (start_offset, data): whole lines starting at or after *offset*,
+    at most *limit* bytes.
+
+    An offset that lands mid-line skips ahead to the next line start. A
+    single line longer than *limit* is returned cut at *limit* so paging
+    always makes progress.
+    """
+    if offset > 0:
+        f.seek(offset - 1)
+        if f.read(1) != b"\n":
+            f.readline()
+    else:
+        f.seek(0)
+    start = f.tell()
+    data = f.read(limit)
+    if len(data) == limit and f.read(1):
+        last_nl = data.rfind(b"\n")
+        if last_nl != -1:
+            data = data[: last_nl + 1]
+    return start, data
@@ -1,19 +1,73 @@
 from __future__ import annotations
 
 import contextlib
+from collections.abc import Callable
 from pathlib import Path
+from typing import TYPE_CHECKING
 
+from .log_storage import BLOCK_INDEX_SUFFIX, COMPRESSED_SUFFIX
 
-def prune_logs(dir: Path, *, keep: int) -> int:
+
+if TYPE_CHECKING:
+    from .log_search import LogSearch
+    from .run_index import RunIndex
+
+
+# Per-run files that live and die with `<run_id>.log`: the gzipped log and
+# its block index, the status sidecar, the event journal + its seq index, the list of files it
+# downloaded, and the S3 sync's log and status.
+COMPANION_SUFFIXES = (
+    ".log" + COMPRESSED_SUFFIX,
+    ".log" + COMPRESSED_SUFFIX + BLOCK_INDEX_SUFFIX,
+    ".meta.json",
+    ".events",
+    ".events.idx",
+    ".files",
+    ".aws",
+    ".aws.json",
+)
+
+
+def prune_logs(
+    dir: Path,
+    *,
+    keep: int,
+    index: RunIndex | None = None,
+    search: LogSearch | None = None,
+    in_use: Callable[[Path], bool] | None = None,
+) -> int:
+    """Delete all but the newest *keep* runs in *dir*, with their companion
+    files, and return how many runs are left. A run past retention for
+    which `in_use(log_path)` is true (e.g. its S3 upload is still going,
+    writing `.aws`/`.aws.json` and reading `.files`) is left for a later
+    prune."""
     if not dir.is_dir():
         return 0
-    files = [p for p in dir.iterdir() if p.is_file() and p.suffix == ".log"]
-    files.sort(key=lambda p: p.stat().st_mtime, reverse=True)
-    for p in files[keep:]:
+    # One entry per run, keyed by the logical `.log` path whether the log
+    # is still plain or already compressed.
+    runs: dict[Path, float] = {}
+    for p in dir.iterdir():
+        if not p.is_file():
+            continue
+        if p.suffix == ".log":
+            logical = p
+        elif p.name.endswith(".log" + COMPRESSED_SUFFIX):
+            logical = p.with_suffix("")
+        else:
+            continue
+        runs[logical] = max(runs.get(logical, 0.0), p.stat().st_mtime)
+    files = sorted(runs, key=runs.__getitem__, reverse=True)
+    pruned = [p for p in files[keep:] if in_use is None or not in_use(p)]
+    if index is not None:
+        index.remove(p.stem for p in pruned)
+    # Before the files go: unindexing a run's lines re-reads its log.
+    if search is not None:
+        search.remove(p.stem for p in pruned)
+    for p in pruned:
         with contextlib.suppress(OSError):
             p.unlink()
-        # Remove the matching sidecar, if it exists.
-        sidecar = p.with_suffix(".meta.json")
-        with contextlib.suppress(OSError):
-            sidecar.unlink()
-    return min(len(files), keep)
+        # Remove the matching compressed log, sidecar and event journal.
+        for suffix in COMPANION_SUFFIXES:
+            with contextlib.suppress(OSError):
+                p.with_suffix(suffix).unlink()
+    return len(files) - len(pruned)
@@ -0,0 +1,383 @@
+"""Full-text search over retained run logs.
+
+Each finished run's log is fed, line by line, into an SQLite FTS5 index in
+`runs/search.sqlite3`. A query is then one index lookup instead of a grep
+through every log. Runs are indexed when they finish
+(Runner._on_complete) and dropped when retention prunes them, and
+`sync()` reconciles the index with whatever is on disk at startup. Live
+runs are not searchable until they finish; their lines are already on the
+run's event stream.
+
+The index holds no log text. `line_text` is a contentless FTS5 table
+(tokens only), and the rowid of each of its rows is the id of a row in
+`line_meta`, an ordinary table that holds the line's run, number, byte
+offset, timestamp and level. The policy, level and time filters and the
+newest-first order all use `line_meta`'s indexes. A hit's text is read
+back from the log itself, which `open_log` can seek even when gzipped.
+
+A contentless table can only forget a line if it is given the line's text
+again, so removing a run re-reads its log. Retention removes a run from
+the index before deleting its files. A run whose log vanished some other
+way leaves its tokens behind. They match nothing: `line_meta` ids are
+never reused, so those tokens don't join to any row.
+"""
+
+from __future__ import annotations
+
+import itertools
+import logging
+import re
+import sqlite3
+import threading
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from .log_storage import find_log, open_log
+
+
+log = logging.getLogger(__name__)
+
+SEARCH_NAME = "search.sqlite3"
+# Lines inserted per transaction. The lock is released between batches so
+# searches aren't starved while a big log is being indexed.
+INDEX_BATCH_LINES = 5000
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+# "2026-04-20 11:17:10 INFO     Downloaded ..." -- see Run._emit_log.
+_LINE_RE = re.compile(
+    r"^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\s+(?:(" + "|".join(LEVELS) + r")\b)?"
+)
+
+_TERM_RE = re.compile(r'"([^"]*)"|(\S+)')
+
+_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS line_text USING fts5(text, content='', columnsize=0);
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY,
+    run_id      TEXT NOT NULL UNIQUE,
+    policy_name TEXT NOT NULL,
+    lines       INTEGER          -- NULL until the whole log is indexed
+);
+CREATE INDEX IF NOT EXISTS runs_by_policy ON runs (policy_name);
+CREATE TABLE IF NOT EXISTS line_meta (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    run         INTEGER NOT NULL,
+    line_no     INTEGER NOT NULL,
+    byte_offset INTEGER NOT NULL,
+    ts          TEXT,
+    level       TEXT
+);
+CREATE INDEX IF NOT EXISTS line_meta_by_ts ON line_meta (ts, run, line_no);
+CREATE INDEX IF NOT EXISTS line_meta_by_run ON line_meta (run, ts, line_no);
+CREATE INDEX IF NOT EXISTS line_meta_by_level ON line_meta (level, ts, run, line_no);
+"""
+
+# Tables from before the index went contentless; they held every line's text.
+_LEGACY_TABLES = ("lines", "indexed_runs")
+
+
+@dataclass
+class SearchHit:
+    run_id: str
+    policy_name: str
+    line_no: int
+    offset: int
+    ts: str | None
+    level: str | None
+    line: str
+
+
+class LogSearch:
+    def __init__(self, runs_base: Path) -> None:
+        self._runs_base = runs_base
+        self._runs_base.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(
+            runs_base / SEARCH_NAME, check_same_thread=False, isolation_level=None
+        )
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._closed = False
+        with self._lock:
+            tables = {
+                r[0]
+                for r in self._conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            }
+            # Dropped rather than migrated: sync() indexes the logs again.
+            for table in _LEGACY_TABLES:
+                if table in tables:
+                    self._conn.execute(f"DROP TABLE {table}")
+            self._conn.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            self._conn.close()
+
+    def is_indexed(self, run_id: str) -> bool:
+        with self._lock:
+            if self._closed:
+                return False
+            row = self._conn.execute(
+                "SELECT 1 FROM runs WHERE run_id = ? AND lines IS NOT NULL", (run_id,)
+            ).fetchone()
+        return row is not None
+
+    def index_run(self, policy_name: str, run_id: str, log_path: Path) -> int:
+        """Index every line of a finished run's log. Returns lines indexed.
+
+        Idempotent: a run already indexed is left alone, and lines left over
+        from an interrupted earlier attempt are replaced.
+        """
+        if find_log(log_path) is None or self.is_indexed(run_id):
+            return 0
+        self._forget(run_id, log_path)
+        with self._lock:
+            if self._closed:
+                return 0
+            run = self._conn.execute(
+                "INSERT INTO runs (run_id, policy_name) VALUES (?, ?)", (run_id, policy_name)
+            ).lastrowid
+        assert run is not None
+        count = 0
+        batch: list[tuple[Any, ...]] = []
+        with open_log(log_path) as f:
+            offset = 0
+            for line_no, raw in enumerate(f, start=1):
+                text = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                ts, level = _parse_line(text)
+                batch.append((text, line_no, offset, ts, level))
+                offset += len(raw)
+                if len(batch) >= INDEX_BATCH_LINES:
+                    if not self._insert(run, batch):
+                        return count
+                    count += len(batch)
+                    batch = []
+        if not self._insert(run, batch, lines=count + len(batch)):
+            return count
+        return count + len(batch)
+
+    def _insert(self, run: int, batch: list[tuple[Any, ...]], *, lines: int | None = None) -> bool:
+        with self._lock:
+            if self._closed:
+                return False
+            self._conn.execute("BEGIN")
+            try:
+                # AUTOINCREMENT and the lock make this batch's ids the next
+                # len(batch) after the sequence; they become the FTS rowids.
+                row = self._conn.execute(
+                    "SELECT seq FROM sqlite_sequence WHERE name = 'line_meta'"
+                ).fetchone()
+                first = (row[0] if row is not None else 0) + 1
+                self._conn.executemany(
+                    "INSERT INTO line_meta (run, line_no, byte_offset, ts, level)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    ((run, *meta) for _, *meta in batch),
+                )
+                self._conn.executemany(
+                    "INSERT INTO line_text (rowid, text) VALUES (?, ?)",
+                    ((first + i, b[0]) for i, b in enumerate(batch)),
+                )
+                if lines is not None:
+                    self._conn.execute("UPDATE runs SET lines = ? WHERE id = ?", (lines, run))
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return True
+
+    def remove(self, run_ids: Iterable[str]) -> None:
+        """Drop runs from the index. Call it while their logs still exist,
+        so their tokens can be deleted too."""
+        for run_id in run_ids:
+            self._forget(run_id)
+
+    def _forget(self, run_id: str, log_path: Path | None = None) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            row = self._conn.execute(
+                "SELECT id, policy_name FROM runs WHERE run_id = ?", (run_id,)
+            ).fetchone()
+            if row is None:
+                return
+            ids = [
+                r[0]
+                for r in self._conn.execute(
+                    "SELECT id FROM line_meta WHERE run = ? ORDER BY line_no", (row["id"],)
+                )
+            ]
+            # Rows first: if deleting the tokens below fails part way, the
+            # rest are orphans that match nothing, never a half-deleted run.
+            self._conn.execute("BEGIN")
+            self._conn.execute("DELETE FROM line_meta WHERE run = ?", (row["id"],))
+            self._conn.execute("DELETE FROM runs WHERE id = ?", (row["id"],))
+            self._conn.execute("COMMIT")
+        if log_path is None:
+            log_path = self._runs_base / row["policy_name"] / f"{run_id}.log"
+        if not ids or find_log(log_path) is None:
+            return
+        # Lines were indexed from the top, one row each, so an interrupted
+        # attempt's ids pair up with the log's first lines.
+        try:
+            with open_log(log_path) as f:
+                lines = zip(ids, f, strict=False)
+                while batch := list(itertools.islice(lines, INDEX_BATCH_LINES)):
+                    if not self._delete_tokens(batch):
+                        return
+        except (OSError, EOFError):
+            log.warning("could not read %s to unindex it", log_path, exc_info=True)
+
+    def _delete_tokens(self, batch: list[tuple[int, bytes]]) -> bool:
+        with self._lock:
+            if self._closed:
+                return False
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT INTO line_text (line_text, rowid, text) VALUES ('delete', ?, ?)",
+                    (
+                        (rowid, raw.decode("utf-8", errors="replace").rstrip("\r\n"))
+                        for rowid, raw in batch
+                    ),
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return True
+
+    def sync(self) -> int:
+        """Index finished runs on disk that aren't indexed yet, and drop runs
+        whose logs are gone. Returns the number of runs newly indexed."""
+        on_disk = dict(self._finished_runs())
+        with self._lock:
+            if self._closed:
+                return 0
+            known = {
+                r[0]: r[1] is not None for r in self._conn.execute("SELECT run_id, lines FROM runs")
+            }
+        self.remove(known.keys() - on_disk.keys())
+        added = 0
+        for run_id in sorted(on_disk.keys() - {rid for rid, done in known.items() if done}):
+            if self._closed:
+                break
+            log_path = on_disk[run_id]
+            try:
+                self.index_run(log_path.parent.name, run_id, log_path)
+            except (OSError, EOFError):
+                log.warning("could not index run log %s", log_path, exc_info=True)
+                continue
+            added += 1
+        return added
+
+    def _finished_runs(self) -> Iterator[tuple[str, Path]]:
+        # Only runs with a sidecar are finished; a live run's log is still
+        # growing and gets indexed by Runner when it exits.
+        for sidecar in self._runs_base.glob("*/*.meta.json"):
+            run_id = sidecar.name.removesuffix(".meta.json")
+            log_path = sidecar.with_name(run_id + ".log")
+            if find_log(log_path) is not None:
+                yield run_id, log_path
+
+    def search(
+        self,
+        query: str,
+        *,
+        policy_name: str | None = None,
+        run_id: str | None = None,
+        level: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        limit: int = 100,
+    ) -> list[SearchHit]:
+        """Lines matching every whitespace-separated term of *query*, newest
+        first. Terms match as phrases, so `IMG_1234.HEIC` finds that file
+        name; wrap several words in double quotes to match them in order.
+        *since*/*until* are "YYYY-MM-DD HH:MM:SS" strings in the logs' local
+        time."""
+        match = _match_expr(query)
+        if match is None:
+            return []
+        sql = [
+            "SELECT r.run_id, r.policy_name, m.line_no, m.byte_offset, m.ts, m.level"
+            " FROM line_meta m JOIN runs r ON r.id = m.run"
+            " WHERE m.id IN (SELECT rowid FROM line_text WHERE line_text MATCH ?)"
+        ]
+        params: list[Any] = [match]
+        if policy_name is not None:
+            sql.append("AND m.run IN (SELECT id FROM runs WHERE policy_name = ?)")
+            params.append(policy_name)
+        if run_id is not None:
+            sql.append("AND m.run = (SELECT id FROM runs WHERE run_id = ?)")
+            params.append(run_id)
+        if level is not None:
+            sql.append("AND m.level = ?")
+            params.append(level)
+        if since is not None:
+            sql.append("AND m.ts >= ?")
+            params.append(since)
+        if until is not None:
+            sql.append("AND m.ts <= ?")
+            params.append(until)
+        sql.append("ORDER BY m.ts DESC, m.run DESC, m.line_no DESC LIMIT ?")
+        params.append(limit)
+        with self._lock:
+            if self._closed:
+                return []
+            rows = self._conn.execute(" ".join(sql), params).fetchall()
+        lines = self._read_hit_lines(rows)
+        return [
+            SearchHit(
+                run_id=r["run_id"],
+                policy_name=r["policy_name"],
+                line_no=r["line_no"],
+                offset=r["byte_offset"],
+                ts=r["ts"],
+                level=r["level"],
+                line=lines[(r["run_id"], r["byte_offset"])],
+            )
+            for r in rows
+            if (r["run_id"], r["byte_offset"]) in lines
+        ]
+
+    def _read_hit_lines(self, rows: list[sqlite3.Row]) -> dict[tuple[str, int], str]:
+        # One open per run, reading its hits in file order. A run whose log
+        # went away since the query loses its hits.
+        by_run: dict[tuple[str, str], list[int]] = {}
+        for r in rows:
+            by_run.setdefault((r["policy_name"], r["run_id"]), []).append(r["byte_offset"])
+        lines: dict[tuple[str, int], str] = {}
+        for (policy_name, run_id), offsets in by_run.items():
+            try:
+                with open_log(self._runs_base / policy_name / f"{run_id}.log") as f:
+                    for offset in sorted(offsets):
+                        f.seek(offset)
+                        raw = f.readline()
+                        lines[run_id, offset] = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+            except (OSError, EOFError):
+                log.warning("could not read hits from run log %s", run_id, exc_info=True)
+        return lines
+
+
+def _parse_line(text: str) -> tuple[str | None, str | None]:
+    m = _LINE_RE.match(text)
+    if m is None:
+        return None, None
+    return m.group(1), m.group(2)
+
+
+def _match_expr(query: str) -> str | None:
+    # Quote each term as an FTS5 phrase: user input never reaches the query
+    # syntax, and punctuation inside a term ("IMG_1234.HEIC") becomes token
+    # adjacency rather than an error. "Double-quoted" runs stay one phrase.
+    terms = [
+        quoted or bare
+        for quoted, bare in _TERM_RE.findall(query)
+        if any(ch.isalnum() for ch in quoted or bare)
+    ]
+    if not terms:
+        return None
+    return " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
@@ -0,0 +1,198 @@
+"""Where a run log lives on disk, and compressing it once the run is over.
+
+A run writes plain `<run_id>.log` while it is live. When it finishes the
+log may be gzipped to `<run_id>.log.gz`; finished logs are dominated by
+near-identical "Downloaded ..." lines and shrink by an order of magnitude.
+Everything that reads logs goes through `find_log` / `open_log`, which
+accept the logical `.log` path and decompress transparently as they
+stream, so byte offsets (event journal spans, paging) always refer to the
+uncompressed text.
+
+The `.gz` is one ordinary gzip stream (any gzip client can inflate it), but
+the deflate state is fully flushed every `BLOCK_SIZE` bytes of text, so
+inflating can restart at each block. `<run_id>.log.gz.idx` records where
+each block begins -- little-endian uint64 pairs of (text offset, `.gz`
+offset), plus a final pair for the end of the text -- and `open_log` uses
+it to seek: reading the tail or a page of a huge gzipped log inflates a
+block or two, not everything before it. A `.gz` without an index (from an
+older version) is still read, front to back.
+"""
+
+from __future__ import annotations
+
+import bisect
+import contextlib
+import gzip
+import io
+import os
+import shutil
+import struct
+import zlib
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO
+
+
+COMPRESSED_SUFFIX = ".gz"
+BLOCK_INDEX_SUFFIX = ".idx"
+COMPRESS_LEVEL = 6
+# Uncompressed bytes between full flushes: the most a seek has to inflate.
+BLOCK_SIZE = 256 * 1024
+
+_ENTRY = struct.Struct("<QQ")
+
+
+def compressed_path(log_path: Path) -> Path:
+    return log_path.with_name(log_path.name + COMPRESSED_SUFFIX)
+
+
+def block_index_path(log_path: Path) -> Path:
+    return log_path.with_name(log_path.name + COMPRESSED_SUFFIX + BLOCK_INDEX_SUFFIX)
+
+
+def is_compressed(path: Path) -> bool:
+    return path.suffix == COMPRESSED_SUFFIX
+
+
+def find_log(log_path: Path) -> Path | None:
+    """The file actually holding *log_path*'s text, or None if neither exists.
+
+    The plain file wins: it is briefly present alongside the `.gz` while a
+    compression is finishing up.
+    """
+    if log_path.is_file():
+        return log_path
+    gz = compressed_path(log_path)
+    return gz if gz.is_file() else None
+
+
+def open_log(log_path: Path) -> IO[bytes]:
+    """Open the log for binary reading, decompressing on the fly if needed."""
+    found = find_log(log_path)
+    if found is None:
+        raise FileNotFoundError(log_path)
+    if is_compressed(found):
+        index = _read_block_index(block_index_path(log_path))
+        if index is None:
+            return gzip.open(found, "rb")
+        return io.BufferedReader(_BlockReader(found, index), buffer_size=BLOCK_SIZE)
+    return open(found, "rb")  # noqa: SIM115
+
+
+def iter_log_lines(log_path: Path) -> Iterator[str]:
+    """Stream the log's lines (without line endings), one at a time."""
+    with open_log(log_path) as f:
+        for raw in f:
+            yield raw.decode("utf-8", errors="replace").rstrip("\r\n")
+
+
+def compress_log(
+    log_path: Path, *, level: int = COMPRESS_LEVEL, block_size: int = BLOCK_SIZE
+) -> Path:
+    """Gzip *log_path* in place of the plain file, with its block index, and
+    return the new path.
+
+    Both are written to temp files and renamed, the index first, so a
+    reader never sees a partial `.gz` or one without its index. The plain
+    file's mtime is kept; retention orders logs by it.
+    """
+    gz = compressed_path(log_path)
+    idx = block_index_path(log_path)
+    tmp = gz.with_name(gz.name + ".tmp")
+    idx_tmp = idx.with_name(idx.name + ".tmp")
+    try:
+        entries = _write_blocks(log_path, tmp, level=level, block_size=block_size)
+        idx_tmp.write_bytes(b"".join(_ENTRY.pack(*e) for e in entries))
+        shutil.copystat(log_path, tmp)
+        os.replace(idx_tmp, idx)
+        os.replace(tmp, gz)
+    except BaseException:
+        for p in (tmp, idx_tmp):
+            with contextlib.suppress(OSError):
+                p.unlink()
+        raise
+    log_path.unlink()
+    return gz
+
+
+def _write_blocks(
+    src_path: Path, dst_path: Path, *, level: int, block_size: int
+) -> list[tuple[int, int]]:
+    # A gzip member written by hand, so the deflate stream can be fully
+    # flushed between blocks: after a full flush, inflating can start
+    # fresh at that byte.
+    entries: list[tuple[int, int]] = []
+    crc = 0
+    raw = 0
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        mtime = int(os.fstat(src.fileno()).st_mtime)
+        dst.write(b"\x1f\x8b\x08\x00" + struct.pack("<I", mtime) + b"\x00\xff")
+        deflate = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+        while chunk := src.read(block_size):
+            entries.append((raw, dst.tell()))
+            dst.write(deflate.compress(chunk) + deflate.flush(zlib.Z_FULL_FLUSH))
+            crc = zlib.crc32(chunk, crc)
+            raw += len(chunk)
+        entries.append((raw, dst.tell()))
+        dst.write(deflate.flush())
+        dst.write(struct.pack("<II", crc, raw & 0xFFFFFFFF))
+    return entries
+
+
+def _read_block_index(path: Path) -> list[tuple[int, int]] | None:
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    if not data or len(data) % _ENTRY.size:
+        return None
+    return list(_ENTRY.iter_unpack(data))
+
+
+class _BlockReader(io.RawIOBase):
+    """Seekable reads of a block-indexed `.gz`, inflating one block at a time."""
+
+    def __init__(self, path: Path, index: list[tuple[int, int]]) -> None:
+        self._f = open(path, "rb")  # noqa: SIM115
+        self._starts = [raw for raw, _ in index]
+        self._offsets = [offset for _, offset in index]
+        self._size = self._starts[-1]
+        self._pos = 0
+        self._block = -1
+        self._data = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._pos, io.SEEK_END: self._size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def readinto(self, buffer: bytearray | memoryview) -> int:
+        if self._pos >= self._size:
+            return 0
+        block = bisect.bisect_right(self._starts, self._pos) - 1
+        if block != self._block:
+            self._data = self._inflate(block)
+            self._block = block
+        start = self._pos - self._starts[block]
+        n = max(0, min(len(buffer), len(self._data) - start))
+        buffer[:n] = self._data[start : start + n]
+        self._pos += n
+        return n
+
+    def _inflate(self, block: int) -> bytes:
+        self._f.seek(self._offsets[block])
+        raw = self._f.read(self._offsets[block + 1] - self._offsets[block])
+        return zlib.decompressobj(-zlib.MAX_WBITS).decompress(raw)
+
+    def close(self) -> None:
+        self._f.close()
+        super().close()
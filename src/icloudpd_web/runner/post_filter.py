@@ -2,11 +2,26 @@ from __future__ import annotations
 
 import re
 from collections.abc import Iterable
-from dataclasses import dataclass
+from dataclasses import dataclass, replace
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 from icloudpd_web.store.models import Filters
 
+from .exif_header import (
+    TAG_DATETIME,
+    TAG_DATETIME_ORIGINAL,
+    TAG_EXIF_IFD,
+    TAG_MAKE,
+    TAG_MODEL,
+    ImageMetadata,
+    read_metadata,
+)
+
+
+if TYPE_CHECKING:
+    from .exif_cache import ExifCache
+
 
 @dataclass
 class FilterDecision:
@@ -33,27 +48,110 @@ _IMAGE_SUFFIXES: frozenset[str] = frozenset(
 )
 
 
+def read_image_metadata(path: Path) -> ImageMetadata:
+    """Metadata for EXIF filters, all None if unreadable. Make and Model
+    come back stripped.
+
+    Tries the header reader first; Pillow only sees files it can't parse.
+    """
+    meta = read_metadata(path) or _pillow_metadata(path)
+    return replace(
+        meta,
+        make=meta.make.strip() if meta.make is not None else None,
+        model=meta.model.strip() if meta.model is not None else None,
+    )
+
+
 def _read_exif_make_model(path: Path) -> tuple[str | None, str | None]:
     """Return (Make, Model) from EXIF, or (None, None) if unreadable."""
+    meta = read_image_metadata(path)
+    return meta.make, meta.model
+
+
+def _pillow_metadata(path: Path) -> ImageMetadata:
     try:
-        from PIL import ExifTags, Image
+        from PIL import Image
 
         with Image.open(path) as img:
             exif = img.getexif()
-            if not exif:
-                return None, None
-            tagmap = {ExifTags.TAGS.get(k, k): v for k, v in exif.items()}
-            make = tagmap.get("Make")
-            model = tagmap.get("Model")
-            return (
-                make.strip() if isinstance(make, str) else None,
-                model.strip() if isinstance(model, str) else None,
+            exif_ifd = exif.get_ifd(TAG_EXIF_IFD) if exif else {}
+
+            def text(value: object) -> str | None:
+                return value if isinstance(value, str) else None
+
+            return ImageMetadata(
+                make=text(exif.get(TAG_MAKE)),
+                model=text(exif.get(TAG_MODEL)),
+                taken=text(exif_ifd.get(TAG_DATETIME_ORIGINAL)) or text(exif.get(TAG_DATETIME)),
+                width=img.width,
+                height=img.height,
             )
     except Exception:  # noqa: BLE001
-        return None, None
+        return ImageMetadata()
+
+
+@dataclass(frozen=True)
+class FilterPlan:
+    """`Filters` prepared for evaluating many files: suffixes normalised,
+    patterns compiled, needles lowered. Build it once with compile_filters.
+
+    A field is None when its filter isn't configured; an empty needle
+    tuple (only blank entries configured) rejects every file, as before.
+    Picklable, so it can be sent to a process pool.
+    """
+
+    suffixes: frozenset[str] | None = None
+    # Usually one combined pattern; several if combining could change
+    # what a pattern matches (see _compile_patterns).
+    patterns: tuple[re.Pattern[str], ...] | None = None
+    pattern_sources: tuple[str, ...] = ()
+    makes: tuple[str, ...] | None = None
+    models: tuple[str, ...] | None = None
+
+    @property
+    def is_empty(self) -> bool:
+        return self.suffixes is None and self.patterns is None and not self.needs_exif
+
+    @property
+    def needs_exif(self) -> bool:
+        return self.makes is not None or self.models is not None
 
 
-def _check_exif(path: Path, filters: Filters) -> FilterDecision | None:
+def compile_filters(filters: Filters) -> FilterPlan:
+    def needles(values: list[str]) -> tuple[str, ...] | None:
+        if not values:
+            return None
+        return tuple(sorted(x.strip().lower() for x in values if x.strip()))
+
+    return FilterPlan(
+        suffixes=frozenset(
+            s.lower() if s.startswith(".") else f".{s.lower()}" for s in filters.file_suffixes
+        )
+        or None,
+        patterns=_compile_patterns(filters.match_patterns) if filters.match_patterns else None,
+        pattern_sources=tuple(filters.match_patterns),
+        makes=needles(filters.device_makes),
+        models=needles(filters.device_models),
+    )
+
+
+def _compile_patterns(sources: list[str]) -> tuple[re.Pattern[str], ...]:
+    """One alternation of all *sources* when that matches exactly what
+    they do separately. It doesn't if a later pattern has groups (its
+    numbered backreferences would shift) or uses inline global flags (an
+    error mid-pattern); those stay separate."""
+    compiled = tuple(re.compile(p) for p in sources)
+    if len(compiled) == 1 or any(c.groups for c in compiled[1:]):
+        return compiled
+    try:
+        return (re.compile("|".join(f"(?:{p})" for p in sources)),)
+    except re.error:
+        return compiled
+
+
+def _check_exif(
+    path: Path, plan: FilterPlan, cache: ExifCache | None = None
+) -> FilterDecision | None:
     """Evaluate EXIF-based filters (device_makes, device_models).
 
     Returns a failing FilterDecision if the file does not pass, or None if it passes.
@@ -63,36 +161,38 @@ def _check_exif(path: Path, filters: Filters) -> FilterDecision | None:
         # Non-image file (e.g. video): EXIF filters do not apply.
         return None
 
-    make, model = _read_exif_make_model(path)
+    if cache is not None:
+        meta = cache.lookup(path, read_image_metadata)
+        make, model = meta.make, meta.model
+    else:
+        make, model = _read_exif_make_model(path)
 
-    if filters.device_makes:
-        wanted_makes = [x.strip().lower() for x in filters.device_makes if x.strip()]
+    if plan.makes is not None:
         if make is None:
             return FilterDecision(
                 path, False, "EXIF Make unreadable; device_makes filter configured"
             )
         make_lc = make.lower()
-        if not any(w in make_lc for w in wanted_makes):
-            return FilterDecision(
-                path, False, f"Make {make!r} contains none of {sorted(wanted_makes)}"
-            )
+        if not any(w in make_lc for w in plan.makes):
+            return FilterDecision(path, False, f"Make {make!r} contains none of {list(plan.makes)}")
 
-    if filters.device_models:
-        wanted_models = [x.strip().lower() for x in filters.device_models if x.strip()]
+    if plan.models is not None:
         if model is None:
             return FilterDecision(
                 path, False, "EXIF Model unreadable; device_models filter configured"
             )
         model_lc = model.lower()
-        if not any(w in model_lc for w in wanted_models):
+        if not any(w in model_lc for w in plan.models):
             return FilterDecision(
-                path, False, f"Model {model!r} contains none of {sorted(wanted_models)}"
+                path, False, f"Model {model!r} contains none of {list(plan.models)}"
             )
 
     return None
 
 
-def evaluate(path: Path, filters: Filters) -> FilterDecision:
+def evaluate(
+    path: Path, filters: Filters | FilterPlan, *, cache: ExifCache | None = None
+) -> FilterDecision:
     """Return a keep/delete decision for one downloaded file.
 
     AND across fields, OR within a field.
@@ -100,27 +200,32 @@ def evaluate(path: Path, filters: Filters) -> FilterDecision:
     - match_patterns: regex applied to basename; any match passes.
     - device_makes / device_models: EXIF Make/Model; fail-closed on unreadable EXIF.
       Non-image files (videos, etc.) skip EXIF filters entirely.
+
+    Given `Filters`, compiles them first; callers evaluating many files
+    should pass a FilterPlan. With *cache*, EXIF comes from it when the
+    file is unchanged since it was last read.
     """
-    suffix = path.suffix.lower()
+    plan = filters if isinstance(filters, FilterPlan) else compile_filters(filters)
 
-    if filters.file_suffixes:
-        wanted = {
-            s.lower() if s.startswith(".") else f".{s.lower()}" for s in filters.file_suffixes
-        }
-        if suffix not in wanted:
-            return FilterDecision(path, False, f"suffix {suffix!r} not in {sorted(wanted)}")
+    if plan.suffixes is not None:
+        suffix = path.suffix.lower()
+        if suffix not in plan.suffixes:
+            return FilterDecision(path, False, f"suffix {suffix!r} not in {sorted(plan.suffixes)}")
 
-    if filters.match_patterns:
-        if not any(re.search(p, path.name) for p in filters.match_patterns):
-            return FilterDecision(path, False, f"basename matched none of {filters.match_patterns}")
+    if plan.patterns is not None:
+        if not any(p.search(path.name) for p in plan.patterns):
+            return FilterDecision(
+                path, False, f"basename matched none of {list(plan.pattern_sources)}"
+            )
 
-    if filters.device_makes or filters.device_models:
-        decision = _check_exif(path, filters)
+    if plan.needs_exif:
+        decision = _check_exif(path, plan, cache)
         if decision is not None:
             return decision
 
     return FilterDecision(path, True, "matched all configured filters")
 
 
-def evaluate_all(paths: Iterable[Path], filters: Filters) -> list[FilterDecision]:
-    return [evaluate(p, filters) for p in paths]
+def evaluate_all(paths: Iterable[Path], filters: Filters | FilterPlan) -> list[FilterDecision]:
+    plan = filters if isinstance(filters, FilterPlan) else compile_filters(filters)
+    return [evaluate(p, plan) for p in paths]
@@ -4,20 +4,36 @@ import asyncio
 import collections
 import contextlib
 import json
+import logging
 import os
 import re
 import signal
 import time
-from collections.abc import AsyncIterator, Callable
+from collections.abc import AsyncIterator, Awaitable, Callable
 from dataclasses import dataclass
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import TYPE_CHECKING, Any, Literal  # noqa: UP035
 
+from .event_log import EventLogWriter, RunEvent, RunEventKind, replay_events_async
+from .filter_pool import (
+    FILTER_BATCH_INTERVAL,
+    FILTER_BATCH_SIZE,
+    MAX_BATCHES_IN_FLIGHT,
+    FilterPool,
+    default_pool,
+)
+from .log_storage import compress_log
+from .post_filter import compile_filters
+
 
 if TYPE_CHECKING:
     from icloudpd_web.store.models import Filters
 
+    from .run_index import RunIndex
+
+
+log = logging.getLogger(__name__)
 
 PROGRESS_RE = re.compile(r"Downloading\s+(\d+)\s+of\s+(\d+)", re.IGNORECASE)
 MFA_PROMPT_RE = re.compile(r"Two-step|two.?factor", re.IGNORECASE)
@@ -26,20 +42,34 @@ _TS_PREFIX_RE = re.compile(r"^\d{4}-\d{2}-\d{2}\s")
 # output is timestamp-prefixed ("2026-04-20 11:17:10 INFO     Downloaded ...").
 DOWNLOADED_RE = re.compile(r"INFO\s+Downloaded\s+(.+?)\s*$")
 
-RunStatus = Literal["pending", "running", "success", "failed", "stopped", "awaiting_mfa"]
-RunEventKind = Literal["log", "progress", "status"]
+RunStatus = Literal["pending", "queued", "running", "success", "failed", "stopped", "awaiting_mfa"]
+
+__all__ = ["Run", "RunEvent", "RunEventKind", "RunStatus"]
 
 
-@dataclass
-class RunEvent:
-    seq: int
-    kind: RunEventKind
-    ts: float
-    data: dict[str, Any]
+@dataclass(eq=False)
+class _Subscriber:
+    """One subscribe() consumer. `None` in the queue means "wake up": either
+    the run finished, or (with `lagged` set) the queue overflowed and was
+    dropped, so the consumer must catch up from the buffer and journal."""
+
+    queue: asyncio.Queue[RunEvent | None]
+    lagged: bool = False
 
 
 class Run:
     BUFFER_CAP = 2000
+    # Per-subscriber queue bound. A consumer that falls this far behind has
+    # its queue dropped and catches up from the ring buffer instead, so a
+    # stalled client can't grow server memory.
+    SUBSCRIBER_QUEUE_CAP = 256
+    # With coalesce_logs, lines are published as one "log_batch" event per
+    # LOG_BATCH_INTERVAL seconds, or as soon as LOG_BATCH_MAX_LINES pile up.
+    LOG_BATCH_INTERVAL = 0.05
+    LOG_BATCH_MAX_LINES = 500
+    # Whether each file the filters keep gets its own log line (rejections
+    # and errors always do).
+    LOG_KEPT_FILES = True
 
     def __init__(
         self,
@@ -52,10 +82,22 @@ class Run:
         env: dict[str, str] | None = None,
         on_mfa_needed: Callable[[str], Path] | None = None,
         filters: Filters | None = None,
+        # Where filters are evaluated; the shared default pool if None.
+        filter_pool: FilterPool | None = None,
         dry_run: bool = False,
         # For the folder-structure sentinel written on first success.
         target_directory: Path | None = None,
         folder_structure_pattern: str | None = None,
+        index: RunIndex | None = None,
+        on_exit: Callable[[Run], None] | None = None,
+        on_progress: Callable[[Run], None] | None = None,
+        # Awaited with each downloaded file the filters keep, while the run
+        # is still going; output isn't read meanwhile, so a slow hook
+        # slows icloudpd down.
+        on_downloaded: Callable[[Run, Path], Awaitable[None]] | None = None,
+        coalesce_logs: bool = False,
+        # Gzip the log once the run is over (see log_storage).
+        compress_log: bool = False,
     ) -> None:
         self.run_id = run_id
         self.policy_name = policy_name
@@ -63,10 +105,19 @@ class Run:
         self._password = password
         self._env = env
         self._on_mfa_needed = on_mfa_needed
-        self._filters = filters
+        # Compiled once here and shared by every batch the run filters.
+        self._filter_plan = (
+            compile_filters(filters) if filters is not None and not filters.is_empty() else None
+        )
         self._dry_run = dry_run
         self._target_directory = target_directory
         self._folder_structure_pattern = folder_structure_pattern
+        self._index = index
+        self._on_exit = on_exit
+        self._on_progress = on_progress
+        self._on_downloaded = on_downloaded
+        self._coalesce_logs = coalesce_logs
+        self._compress_log = compress_log
         self.log_dir = log_dir
         self.log_dir.mkdir(parents=True, exist_ok=True)
         self.log_path = self.log_dir / f"{run_id}.log"
@@ -77,23 +128,80 @@ class Run:
         self.exit_code: int | None = None
         self.error_id: str | None = None
         self.progress: dict[str, Any] = {"downloaded": 0, "total": None}
+        # 1-based place in the Runner's queue while status is "queued".
+        self.queue_position: int | None = None
+        self.queued_at: datetime | None = None
 
         self._proc: asyncio.subprocess.Process | None = None
         self._buffer: collections.deque[RunEvent] = collections.deque(maxlen=self.BUFFER_CAP)
         self._seq = 0
-        self._subscribers: set[asyncio.Queue[RunEvent | None]] = set()
+        self._subscribers: set[_Subscriber] = set()
         self._log_fh: Any = None
         self._done = asyncio.Event()
         self._stopping = False
         self._mfa_poll_task: asyncio.Task[None] | None = None
+        self._filter_pool = filter_pool or default_pool()
+        # Downloaded paths waiting to be sent to the pool, and the batches
+        # sent (see _queue_for_filter).
+        self._filter_batch: list[Path] = []
+        self._filter_flush: asyncio.TimerHandle | None = None
         self._filter_tasks: list[asyncio.Task[None]] = []
         self._filter_kept = 0
         self._filter_deleted = 0
+        # False lists rejected files instead (a dry-run sweep).
+        self._delete_rejected = True
+        self._pending_lines: list[str] = []
+        self._flush_handle: asyncio.TimerHandle | None = None
+        # Events are journaled to disk (see event_log) so replays can reach
+        # past the ring buffer. Log events reference byte spans of the log.
+        self._events: EventLogWriter | None = None
+        self._log_bytes = 0
+        self._pending_start = 0
+        # Paths icloudpd reported downloading, one per line, for uploads
+        # that only want this run's files. Opened on the first download.
+        self._files_fh: Any = None
+
+    def mark_queued(self, position: int) -> None:
+        """Record this (not yet started) run's place in the Runner's queue,
+        publishing a status event when it changes."""
+        if self.status == "queued" and self.queue_position == position:
+            return
+        if self.queued_at is None:
+            self.queued_at = datetime.now(UTC)
+        self.status = "queued"
+        self.queue_position = position
+        self._publish("status", {"status": "queued", "queue_position": position})
+
+    def finish_unstarted(self, status: RunStatus, *, reason: str | None = None) -> None:
+        """Close out a run that never got a process: stopped while queued, or
+        failed to launch when dequeued. It still gets a (one-line) log and a
+        sidecar, so history and retention treat it like any other run."""
+        self.ended_at = datetime.now(UTC)
+        self.started_at = self.started_at or self.queued_at or self.ended_at
+        self.queue_position = None
+        if status == "failed":
+            self.error_id = self.run_id
+        if self._log_fh is None:
+            self._log_fh = open(self.log_path, "a", encoding="utf-8", buffering=1)  # noqa: SIM115
+        self._emit_log(
+            f"INFO     Run {status} before it started" + (f": {reason}" if reason else "")
+        )
+        self.status = status
+        self._publish("status", {"status": status, "exit_code": None, "error_id": self.error_id})
+        self._log_fh.close()
+        self._log_fh = None
+        if self._events is not None:
+            self._events.close()
+        self._write_sidecar()
+        if self._on_exit is not None:
+            self._on_exit(self)
+        for sub in list(self._subscribers):
+            if not sub.lagged:
+                self._wake(sub)
+        self._done.set()
 
     async def start(self) -> None:
-        self.started_at = datetime.now(UTC)
-        self.status = "running"
-        self._log_fh = open(self.log_path, "w", encoding="utf-8", buffering=1)  # noqa: SIM115, ASYNC230
+        self._open_log()
         # PYTHONUNBUFFERED forces line-buffered stdout/stderr in the child.
         # Without it, icloudpd's output sits in a 4KB buffer (PIPE isn't a tty)
         # and our readline() sees nothing until the process exits.
@@ -115,8 +223,33 @@ class Run:
         asyncio.create_task(self._drain(self._proc.stdout, "stdout"))
         asyncio.create_task(self._drain(self._proc.stderr, "stderr"))
         asyncio.create_task(self._wait_exit())
+        if self._stopping:
+            # stop() landed while the process was being spawned.
+            with contextlib.suppress(ProcessLookupError):
+                self._proc.send_signal(signal.SIGTERM)
+
+    def _open_log(self) -> None:
+        """Mark the run running and open its log and event journal."""
+        was_queued = self.status == "queued"
+        self.started_at = datetime.now(UTC)
+        self.status = "running"
+        self.queue_position = None
+        self._log_fh = open(self.log_path, "w", encoding="utf-8", buffering=1)  # noqa: SIM115
+        self._events = EventLogWriter(self.log_path)
+        # Events published while queued predate the journal; write them
+        # first so journal seqs stay dense.
+        for ev in self._buffer:
+            self._events.append(ev)
+        if was_queued:
+            self._publish("status", {"status": "running"})
 
     async def stop(self) -> None:
+        if self.status == "queued":
+            self.finish_unstarted("stopped")
+            return
+        if self._proc is None and self.status == "running":
+            self._stopping = True  # start() is mid-spawn; it signals once up
+            return
         if self._proc and self._proc.returncode is None:
             self._stopping = True
             with contextlib.suppress(ProcessLookupError):
@@ -126,27 +259,82 @@ class Run:
         await self._done.wait()
 
     async def subscribe(self, *, since: int | None) -> AsyncIterator[RunEvent]:
-        q: asyncio.Queue[RunEvent | None] = asyncio.Queue()
-        self._subscribers.add(q)
+        sub = _Subscriber(queue=asyncio.Queue(maxsize=self.SUBSCRIBER_QUEUE_CAP))
+        q = sub.queue
+        self._subscribers.add(sub)
         try:
             # Snapshot the buffer *after* registering so any event fired between
             # snapshot and yield is captured via the queue instead of lost.
-            replay = [e for e in self._buffer if since is None or e.seq > since]
-            max_replayed = replay[-1].seq if replay else (since or 0)
-            for ev in replay:
-                yield ev
-            # If the run already finished before we subscribed, no new events are coming.
-            if self._done.is_set():
-                return
+            # A fresh subscriber gets the hot buffer; a resuming one gets
+            # everything after its Last-Event-ID, from disk if need be.
+            last_seq = since or 0
+            if since is None:
+                for ev in list(self._buffer):
+                    yield ev
+                    last_seq = ev.seq
+            else:
+                async for ev in self._replay_after(since):
+                    yield ev
+                    last_seq = ev.seq
             while True:
+                # If the run already finished and everything queued has been
+                # delivered, no new events are coming.
+                if self._done.is_set() and q.empty():
+                    return
                 ev = await q.get()
                 if ev is None:
-                    return
-                if ev.seq <= max_replayed:
+                    if not sub.lagged:
+                        return
+                    # Re-arm before snapshotting so events published while we
+                    # replay land in the queue (and are deduped below).
+                    sub.lagged = False
+                    async for missed in self._replay_after(last_seq):
+                        yield missed
+                        last_seq = max(last_seq, missed.seq)
+                    continue
+                if ev.seq <= last_seq:
                     continue
+                last_seq = ev.seq
                 yield ev
         finally:
-            self._subscribers.discard(q)
+            self._subscribers.discard(sub)
+
+    async def _replay_after(self, last_seq: int) -> AsyncIterator[RunEvent]:
+        """Events after *last_seq*: anything the ring buffer has already
+        evicted is streamed from the on-disk journal, then the buffer.
+
+        Without a journal (run never started), a gap is reported with a
+        resync marker instead.
+        """
+        buffered = [e for e in self._buffer if e.seq > last_seq]
+        first = buffered[0].seq if buffered else self._seq + 1
+        if first > last_seq + 1:
+            if self._events is not None:
+                self._events.flush()
+                async for ev in replay_events_async(self.log_path, since=last_seq, until=first - 1):
+                    yield ev
+            else:
+                yield RunEvent(
+                    seq=last_seq,
+                    kind="resync",
+                    ts=time.time(),
+                    data={"missed_from": last_seq + 1, "resume_at": first},
+                )
+        for ev in buffered:
+            yield ev
+
+    def _wake(self, sub: _Subscriber) -> None:
+        """Queue a wake-up marker, dropping the backlog if the queue is full."""
+        try:
+            sub.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            self._mark_lagged(sub)
+
+    def _mark_lagged(self, sub: _Subscriber) -> None:
+        sub.lagged = True
+        while not sub.queue.empty():
+            sub.queue.get_nowait()
+        sub.queue.put_nowait(None)
 
     async def _drain(self, stream: asyncio.StreamReader, kind: str) -> None:
         while True:
@@ -157,48 +345,96 @@ class Run:
             self._emit_log(text)
             self._maybe_progress(text)
             if kind == "stdout":
-                self._maybe_collect_downloaded(text)
+                path = self._maybe_collect_downloaded(text)
+                if path is not None and self._filtering:
+                    await self._queue_for_filter(path)
+                elif path is not None:
+                    await self._hand_over(path)
                 if self._on_mfa_needed and MFA_PROMPT_RE.search(text):
                     self._trigger_mfa()
 
-    def _maybe_collect_downloaded(self, text: str) -> None:
-        m = DOWNLOADED_RE.search(text)
-        if not m:
-            return
-        path = Path(m.group(1).strip())
-        # Apply filter per-file so deletion happens as soon as possible.
+    @property
+    def downloaded_list(self) -> Path:
+        """File listing the paths this run downloaded (absent if none)."""
+        return downloaded_list_path(self.log_path)
+
+    @property
+    def _filtering(self) -> bool:
         # Dry-run writes no files, so filter evaluation would fail; skip.
-        if self._filters is None or self._filters.is_empty() or self._dry_run:
-            return
-        # Prune completed tasks so this list doesn't grow unboundedly during
-        # a long run (one task per downloaded file).
-        self._filter_tasks = [t for t in self._filter_tasks if not t.done()]
-        self._filter_tasks.append(asyncio.create_task(self._filter_one(path)))
+        return self._filter_plan is not None and not self._dry_run
 
-    async def _filter_one(self, path: Path) -> None:
-        """Evaluate one downloaded file against the configured filters.
+    @property
+    def _deleted_verb(self) -> str:
+        return "deleted" if self._delete_rejected else "would delete"
 
-        Runs the blocking EXIF read + unlink in an executor so the drain loop
-        stays responsive.
-        """
-        from icloudpd_web.runner.post_filter import evaluate
+    def _maybe_collect_downloaded(self, text: str) -> Path | None:
+        """Record a "Downloaded" line; returns its path, or None if *text*
+        isn't one or this is a dry run."""
+        m = DOWNLOADED_RE.search(text)
+        if not m or self._dry_run:
+            return None
+        path = Path(m.group(1).strip())
+        if self._files_fh is None:
+            self._files_fh = open(self.downloaded_list, "a", encoding="utf-8")  # noqa: SIM115
+        self._files_fh.write(f"{path}\n")
+        return path
+
+    async def _queue_for_filter(self, path: Path) -> None:
+        """Add *path* to the next filter batch. Waits (so icloudpd's output
+        isn't read) while MAX_BATCHES_IN_FLIGHT batches are being filtered."""
+        self._filter_batch.append(path)
+        if len(self._filter_batch) >= FILTER_BATCH_SIZE:
+            self._submit_filter_batch()
+        elif self._filter_flush is None:
+            loop = asyncio.get_running_loop()
+            self._filter_flush = loop.call_later(FILTER_BATCH_INTERVAL, self._submit_filter_batch)
+        self._filter_tasks = [t for t in self._filter_tasks if not t.done()]
+        if len(self._filter_tasks) >= MAX_BATCHES_IN_FLIGHT:
+            await asyncio.wait(self._filter_tasks, return_when=asyncio.FIRST_COMPLETED)
+
+    def _submit_filter_batch(self) -> None:
+        if self._filter_flush is not None:
+            self._filter_flush.cancel()
+            self._filter_flush = None
+        if not self._filter_batch:
+            return
+        batch, self._filter_batch = self._filter_batch, []
+        self._filter_tasks.append(asyncio.create_task(self._filter_batch_done(batch)))
 
-        loop = asyncio.get_running_loop()
+    async def _hand_over(self, path: Path) -> None:
+        if self._on_downloaded is None:
+            return
         try:
-            decision = await loop.run_in_executor(None, evaluate, path, self._filters)
+            await self._on_downloaded(self, path)
+        except Exception:  # noqa: BLE001
+            log.warning("on_downloaded hook failed for %s", path, exc_info=True)
+
+    async def _filter_batch_done(self, batch: list[Path]) -> None:
+        """Filter *batch* on the pool, then log each decision and add it to
+        the run's kept/deleted counts."""
+        assert self._filter_plan is not None
+        try:
+            outcomes = await self._filter_pool.run(
+                batch, self._filter_plan, delete=self._delete_rejected
+            )
         except Exception as exc:  # noqa: BLE001
-            self._emit_log(f"WARNING  Filter: evaluation failed for {path}: {exc}")
-            return
-        if decision.kept:
-            self._filter_kept += 1
-            self._emit_log(f"INFO     Filter: kept {path} ({decision.reason})")
+            for path in batch:
+                self._emit_log(f"WARNING  Filter: evaluation failed for {path}: {exc}")
             return
-        try:
-            await loop.run_in_executor(None, os.unlink, decision.path)
-            self._filter_deleted += 1
-            self._emit_log(f"INFO     Filter: deleted {path} ({decision.reason})")
-        except OSError as exc:
-            self._emit_log(f"WARNING  Filter: could not delete {path}: {exc}")
+        kept: list[Path] = []
+        for o in outcomes:
+            if o.error is not None:
+                self._emit_log(f"WARNING  Filter: {o.error}")
+            elif o.kept:
+                kept.append(o.path)
+                if self.LOG_KEPT_FILES:
+                    self._emit_log(f"INFO     Filter: kept {o.path} ({o.reason})")
+            else:
+                self._filter_deleted += 1
+                self._emit_log(f"INFO     Filter: {self._deleted_verb} {o.path} ({o.reason})")
+        self._filter_kept += len(kept)
+        for path in kept:
+            await self._hand_over(path)
 
     def _emit_log(self, text: str) -> None:
         # Prepend a timestamp so our own log lines (filter events, wrapper
@@ -208,9 +444,31 @@ class Run:
         if not _TS_PREFIX_RE.match(text):
             stamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             text = f"{stamp} {text}"
+        start = self._log_bytes
         if self._log_fh is not None:
             self._log_fh.write(text + "\n")
-        self._publish("log", {"line": text})
+            self._log_bytes += len(text.encode("utf-8")) + 1
+        if not self._coalesce_logs:
+            self._publish("log", {"line": text}, span=(start, self._log_bytes))
+            return
+        if not self._pending_lines:
+            self._pending_start = start
+        self._pending_lines.append(text)
+        if len(self._pending_lines) >= self.LOG_BATCH_MAX_LINES:
+            self._flush_logs()
+        elif self._flush_handle is None:
+            loop = asyncio.get_running_loop()
+            self._flush_handle = loop.call_later(self.LOG_BATCH_INTERVAL, self._flush_logs)
+
+    def _flush_logs(self) -> None:
+        """Publish any coalesced log lines as a single log_batch event."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending_lines:
+            return
+        lines, self._pending_lines = self._pending_lines, []
+        self._publish("log_batch", {"lines": lines}, span=(self._pending_start, self._log_bytes))
 
     def _maybe_progress(self, text: str) -> None:
         m = PROGRESS_RE.search(text)
@@ -220,6 +478,8 @@ class Run:
         total = int(m.group(2))
         self.progress = {"downloaded": downloaded, "total": total}
         self._publish("progress", dict(self.progress))
+        if self._on_progress is not None:
+            self._on_progress(self)
 
     def _trigger_mfa(self) -> None:
         """Called when an MFA prompt is detected in stdout.
@@ -250,14 +510,27 @@ class Run:
         except asyncio.CancelledError:
             pass
 
-    def _publish(self, kind: RunEventKind, data: dict[str, Any]) -> None:
+    def _publish(
+        self, kind: RunEventKind, data: dict[str, Any], *, span: tuple[int, int] | None = None
+    ) -> None:
+        # Keep ordering: lines logged before a progress/status change must
+        # reach subscribers before it.
+        if kind != "log_batch" and self._pending_lines:
+            self._flush_logs()
         self._seq += 1
         ev = RunEvent(seq=self._seq, kind=kind, ts=time.time(), data=data)
         self._buffer.append(ev)
-        for q in list(self._subscribers):
-            q.put_nowait(ev)
-
-    async def _wait_exit(self) -> None:  # noqa: C901
+        if self._events is not None:
+            self._events.append(ev, span=span if self._log_fh is not None else None)
+        for sub in list(self._subscribers):
+            if sub.lagged:
+                continue  # will catch up from the buffer
+            try:
+                sub.queue.put_nowait(ev)
+            except asyncio.QueueFull:
+                self._mark_lagged(sub)
+
+    async def _wait_exit(self) -> None:
         assert self._proc is not None
         code = await self._proc.wait()
         # Cancel any pending MFA poll task now that the process has exited.
@@ -265,6 +538,11 @@ class Run:
             self._mfa_poll_task.cancel()
             with contextlib.suppress(asyncio.CancelledError):
                 await self._mfa_poll_task
+        await self._finish(code)
+
+    async def _finish(self, code: int) -> None:  # noqa: C901
+        """Settle the run once its work exited with *code*: finish
+        filtering, publish the final status, write the sidecar."""
         self.exit_code = code
         self.ended_at = datetime.now(UTC)
         if self._stopping and code != 0:
@@ -282,23 +560,28 @@ class Run:
             from .folder_structure import remember
 
             remember(self._target_directory, self._folder_structure_pattern)
-        # Wait for any in-flight per-file filter tasks to finish, then log a
+        # Filter what's left and wait for batches in flight, then log a
         # summary. Keep status as "running" during this so is_running() stays
         # True until all deletion decisions are recorded.
-        if self._filters is not None and not self._filters.is_empty():
+        if self._filter_plan is not None:
             if self._dry_run:
                 self._emit_log(
                     "INFO     Filter skipped: dry run active; no files were "
                     "written to disk, so filters can't evaluate."
                 )
-            elif final_status == "success":
+            else:
+                self._submit_filter_batch()
                 if self._filter_tasks:
                     await asyncio.gather(*self._filter_tasks, return_exceptions=True)
+            if final_status == "success" and not self._dry_run:
                 self._emit_log(
                     f"INFO     Filter summary: kept {self._filter_kept}, "
-                    f"deleted {self._filter_deleted}"
+                    f"{self._deleted_verb} {self._filter_deleted}"
                 )
 
+        if self._files_fh is not None:
+            self._files_fh.close()
+            self._files_fh = None
         self.status = final_status
         self._publish(
             "status",
@@ -307,13 +590,27 @@ class Run:
         if self._log_fh is not None:
             self._log_fh.close()
             self._log_fh = None
+        if self._events is not None:
+            self._events.close()
+        if self._compress_log:
+            try:
+                await asyncio.to_thread(compress_log, self.log_path)
+            except OSError:
+                log.warning("could not compress %s; keeping it plain", self.log_path, exc_info=True)
         self._write_sidecar()
-        for q in list(self._subscribers):
-            q.put_nowait(None)
+        if self._on_exit is not None:
+            self._on_exit(self)
+        for sub in list(self._subscribers):
+            if not sub.lagged:
+                self._wake(sub)
         self._done.set()
 
     def _write_sidecar(self) -> None:
-        """Atomically write a .meta.json sidecar next to the log file."""
+        """Atomically write a .meta.json sidecar next to the log file.
+
+        The sidecar is mirrored into the run index (if any) so history
+        lookups never need to parse it.
+        """
         meta: dict[str, Any] = {
             "run_id": self.run_id,
             "policy_name": self.policy_name,
@@ -324,9 +621,17 @@ class Run:
             "error_id": self.error_id,
             "downloaded": self.progress.get("downloaded"),
             "total": self.progress.get("total"),
+            # Uncompressed bytes; a gzipped log's file size says nothing useful.
+            "log_size": self._log_bytes,
         }
         payload = json.dumps(meta, separators=(",", ":"), default=str).encode("utf-8")
         tmp_path = self.log_path.with_suffix(".meta.json.tmp")
         final_path = self.log_path.with_suffix(".meta.json")
         tmp_path.write_bytes(payload)
         os.replace(tmp_path, final_path)
+        if self._index is not None:
+            self._index.record(meta, log_path=self.log_path)
+
+
+def downloaded_list_path(log_path: Path) -> Path:
+    return log_path.with_suffix(".files")
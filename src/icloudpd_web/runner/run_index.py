@@ -0,0 +1,158 @@
+"""Persistent index over completed runs.
+
+Every finished Run drops a `.meta.json` sidecar next to its log. Answering
+"last run for this policy" or "history for this policy" by globbing and
+parsing those sidecars costs policies x retained-runs file reads per
+dashboard refresh, so we mirror each sidecar into a small SQLite table
+keyed by (policy_name, ended_at). The sidecars stay the source of truth:
+a missing or fresh index file is rebuilt from them on open.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import json
+import logging
+import sqlite3
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+from typing import Any
+
+from .log_storage import find_log, is_compressed
+
+
+log = logging.getLogger(__name__)
+
+INDEX_NAME = "index.sqlite3"
+
+# Column order matches the sidecar keys written by Run._write_sidecar, plus
+# the log size/mtime that list_runs reports for each entry.
+_COLUMNS = (
+    "run_id",
+    "policy_name",
+    "status",
+    "started_at",
+    "ended_at",
+    "exit_code",
+    "error_id",
+    "downloaded",
+    "total",
+    "log_size",
+    "mtime",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    policy_name TEXT NOT NULL,
+    status      TEXT,
+    started_at  TEXT,
+    ended_at    TEXT,
+    exit_code   INTEGER,
+    error_id    TEXT,
+    downloaded  INTEGER,
+    total       INTEGER,
+    log_size    INTEGER,
+    mtime       REAL
+);
+CREATE INDEX IF NOT EXISTS runs_by_policy ON runs (policy_name, ended_at DESC);
+"""
+
+
+class RunIndex:
+    def __init__(self, runs_base: Path) -> None:
+        self._runs_base = runs_base
+        self._runs_base.mkdir(parents=True, exist_ok=True)
+        self._path = runs_base / INDEX_NAME
+        fresh = not self._path.exists()
+        # FastAPI runs sync endpoints in a threadpool, so one connection is
+        # shared across threads and serialized by our own lock.
+        self._conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.executescript(_SCHEMA)
+        if fresh:
+            self.rebuild()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def record(self, meta: dict[str, Any], *, log_path: Path | None = None) -> None:
+        """Insert or replace the row for one finished run."""
+        row = {k: meta.get(k) for k in _COLUMNS}
+        found = find_log(log_path) if log_path is not None else None
+        if found is not None:
+            with contextlib.suppress(OSError):
+                st = found.stat()
+                # Sidecars record the uncompressed size; older ones don't.
+                if row["log_size"] is None and not is_compressed(found):
+                    row["log_size"] = st.st_size
+                row["mtime"] = st.st_mtime
+        placeholders = ",".join("?" for _ in _COLUMNS)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO runs ({','.join(_COLUMNS)}) VALUES ({placeholders})",
+                [_sql_value(row[k]) for k in _COLUMNS],
+            )
+
+    def remove(self, run_ids: Iterable[str]) -> None:
+        ids = [(rid,) for rid in run_ids]
+        if not ids:
+            return
+        with self._lock:
+            self._conn.executemany("DELETE FROM runs WHERE run_id = ?", ids)
+
+    def get(self, run_id: str) -> dict[str, Any] | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def runs_for(self, policy_name: str) -> list[dict[str, Any]]:
+        """All indexed runs for *policy_name*, newest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM runs WHERE policy_name = ? ORDER BY ended_at DESC",
+                (policy_name,),
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def last_runs(self) -> list[dict[str, Any]]:
+        """The most recent run for every indexed policy, one row each."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM runs r WHERE ended_at = ("
+                "  SELECT MAX(ended_at) FROM runs WHERE policy_name = r.policy_name"
+                ")"
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def rebuild(self) -> int:
+        """Repopulate the index from the on-disk sidecars. Returns rows indexed."""
+        rows: list[tuple[dict[str, Any], Path]] = []
+        for sidecar in self._runs_base.glob("*/*.meta.json"):
+            try:
+                meta = json.loads(sidecar.read_text("utf-8"))
+            except (OSError, json.JSONDecodeError):
+                log.warning("skipping unreadable run sidecar %s", sidecar)
+                continue
+            if not isinstance(meta, dict) or "run_id" not in meta:
+                continue
+            meta.setdefault("policy_name", sidecar.parent.name)
+            log_path = sidecar.with_name(sidecar.name.removesuffix(".meta.json") + ".log")
+            rows.append((meta, log_path))
+        with self._lock:
+            self._conn.execute("DELETE FROM runs")
+        for meta, log_path in rows:
+            self.record(meta, log_path=log_path)
+        return len(rows)
+
+
+def _sql_value(v: object) -> object:
+    # Sidecars serialize datetimes with str(); mirror that so index rows and
+    # sidecar JSON compare and sort identically.
+    if v is None or isinstance(v, int | float | str):
+        return v
+    return str(v)
@@ -1,25 +1,47 @@
 from __future__ import annotations
 
 import asyncio
+import bisect
 import contextlib
-from collections.abc import Callable
+import itertools
+import logging
+import time
+from collections.abc import Awaitable, Callable
 from datetime import UTC, datetime
 from pathlib import Path
 from typing import TYPE_CHECKING
 
-from icloudpd_web.store.models import Policy
+from icloudpd_web.store.models import Policy, RunSummary
 
 from .config_builder import build_argv
+from .filter_pool import FilterPool
 from .folder_structure import check_or_raise as _folder_check
 from .log_retention import prune_logs
+from .log_storage import iter_log_lines
 from .run import Run
+from .sweep import SweepRun
 
 
 if TYPE_CHECKING:
+    from .log_search import LogSearch
     from .mfa import MfaRegistry
+    from .run_index import RunIndex
+
+
+log = logging.getLogger(__name__)
+
+# Queue order when a limit is reached: lower goes first, FIFO within a
+# priority. Someone clicking Run shouldn't wait behind a cron stampede.
+TRIGGER_PRIORITY = {"manual": 0}
+DEFAULT_PRIORITY = 1
 
 
 class Runner:
+    # Minimum seconds between "progress" run events per run. Progress lines
+    # arrive once per file; forwarding each one would wake every policies
+    # stream thousands of times during a large sync.
+    PROGRESS_EVENT_INTERVAL = 1.0
+
     def __init__(
         self,
         *,
@@ -27,27 +49,85 @@ class Runner:
         icloudpd_argv: Callable[[list[str]], list[str]],
         retention: int = 10,
         on_run_event: Callable[[Run, str], None] | None = None,
+        # Passed to each download Run (see Run.on_downloaded).
+        on_downloaded: Callable[[Run, Path], Awaitable[None]] | None = None,
+        filter_pool: FilterPool | None = None,
         mfa_registry: MfaRegistry | None = None,
+        run_index: RunIndex | None = None,
+        compress_logs: bool = False,
+        log_search: LogSearch | None = None,
+        max_concurrent: int = 0,
+        max_per_account: int = 0,
+        # Whether a run's files are still in use past its end (an S3 upload
+        # still going); retention skips such runs.
+        log_in_use: Callable[[Path], bool] | None = None,
     ) -> None:
         self._runs_base = runs_base
         self._argv_fn = icloudpd_argv
         self._retention = retention
         self._on_event = on_run_event or (lambda r, ev: None)
+        self._on_downloaded = on_downloaded
+        self._filter_pool = filter_pool
         self._mfa_registry = mfa_registry
+        self._run_index = run_index
+        self._compress_logs = compress_logs
+        self._log_search = log_search
+        self._log_in_use = log_in_use
+        # Limits on simultaneous runs, overall and per Apple ID (policies
+        # sharing a username hit the same iCloud throttling and MFA state);
+        # 0 means unlimited. Runs over a limit wait in _queue, kept sorted
+        # as (priority, arrival, run), and launch as slots free up.
+        self._max_concurrent = max_concurrent
+        self._max_per_account = max_per_account
+        self._queue: list[tuple[int, int, Run]] = []
+        self._arrivals = itertools.count()
+        self._run_accounts: dict[str, str] = {}
         self._active: dict[str, Run] = {}
         self._by_id: dict[str, Run] = {}
         self._lock = asyncio.Lock()
         # Resolved shared-library names keyed by policy name. Populated on
         # first discovery per backend-process lifetime; cleared on restart.
         self._shared_lib_cache: dict[str, str] = {}
+        # Most recent finished run per policy. Seeded once from the run index
+        # and kept current by each Run's exit hook, so policy summaries never
+        # touch the disk.
+        self._last_runs: dict[str, RunSummary] = {}
+        self._progress_sent_at: dict[str, float] = {}
+        if run_index is not None:
+            for row in run_index.last_runs():
+                try:
+                    self._last_runs[row["policy_name"]] = RunSummary.model_validate(row)
+                except Exception:  # noqa: BLE001
+                    log.warning("ignoring malformed run index row %s", row.get("run_id"))
 
     def is_running(self, name: str) -> bool:
         run = self._active.get(name)
         return run is not None and run.status == "running"
 
+    def is_queued(self, name: str) -> bool:
+        run = self._active.get(name)
+        return run is not None and run.status == "queued"
+
+    def queue_position(self, name: str) -> int | None:
+        """1-based place of the policy's queued run, or None if not queued."""
+        run = self._active.get(name)
+        return run.queue_position if run is not None and run.status == "queued" else None
+
+    def queued_runs(self) -> list[Run]:
+        return [run for _, _, run in self._queue]
+
+    async def set_limits(self, *, max_concurrent: int, max_per_account: int) -> None:
+        self._max_concurrent = max_concurrent
+        self._max_per_account = max_per_account
+        await self._dispatch_queued()
+
     def get_run(self, run_id: str) -> Run | None:
         return self._by_id.get(run_id)
 
+    def last_run(self, name: str) -> RunSummary | None:
+        """Return the most recent finished run for a policy, or None."""
+        return self._last_runs.get(name)
+
     def active_runs(self) -> list[Run]:
         return [r for r in self._active.values() if r.status == "running"]
 
@@ -78,8 +158,7 @@ class Runner:
                 update={"icloudpd": {**policy.icloudpd, "library": resolved_library}}
             )
         async with self._lock:
-            if self.is_running(policy.name):
-                raise RuntimeError(f"policy {policy.name} already running")
+            self._check_idle(policy.name)
             run_id = _mk_run_id(policy.name)
             log_dir = self._runs_base / policy.name
             log_dir.mkdir(parents=True, exist_ok=True)
@@ -102,17 +181,128 @@ class Runner:
                 password=password,
                 on_mfa_needed=on_mfa_needed,
                 filters=policy.filters if not policy.filters.is_empty() else None,
+                filter_pool=self._filter_pool,
                 dry_run=bool(policy.icloudpd.get("dry_run", False)),
                 target_directory=policy.directory,
                 folder_structure_pattern=policy.icloudpd.get("folder_structure"),
+                index=self._run_index,
+                on_exit=self._remember_last_run,
+                on_progress=self._on_progress,
+                on_downloaded=self._on_downloaded,
+                coalesce_logs=True,
+                compress_log=self._compress_logs,
             )
             self._active[policy.name] = run
             self._by_id[run_id] = run
+            self._run_accounts[run_id] = _account_key(policy)
+            if self._queue_has_account(run) or not self._has_free_slot(run):
+                priority = TRIGGER_PRIORITY.get(trigger, DEFAULT_PRIORITY)
+                bisect.insort(self._queue, (priority, next(self._arrivals), run))
+                asyncio.create_task(self._on_complete(run))
+                self._renumber_queue()
+                return run
             await run.start()
             asyncio.create_task(self._on_complete(run))
             self._on_event(run, "started")
             return run
 
+    async def sweep(self, policy: Policy, *, list_only: bool) -> Run:
+        """Start applying *policy*'s filters to the files already in its
+        directory (see SweepRun). It needs no iCloud session, so it skips
+        the queue and the account limits, but like a download it holds the
+        policy: neither starts while the other is active."""
+        async with self._lock:
+            self._check_idle(policy.name)
+            run_id = _mk_run_id(policy.name)
+            log_dir = self._runs_base / policy.name
+            log_dir.mkdir(parents=True, exist_ok=True)
+            run = SweepRun(
+                run_id=run_id,
+                policy_name=policy.name,
+                log_dir=log_dir,
+                directory=Path(policy.directory),
+                filters=policy.filters,
+                list_only=list_only,
+                filter_pool=self._filter_pool,
+                index=self._run_index,
+                on_exit=self._remember_last_run,
+                on_progress=self._on_progress,
+                coalesce_logs=True,
+                compress_log=self._compress_logs,
+            )
+            self._active[policy.name] = run
+            self._by_id[run_id] = run
+            await run.start()
+            asyncio.create_task(self._on_complete(run))
+            self._on_event(run, "started")
+            return run
+
+    def _check_idle(self, name: str) -> None:
+        if self.is_running(name):
+            raise RuntimeError(f"policy {name} already running")
+        if self.is_queued(name):
+            raise RuntimeError(f"policy {name} already queued")
+
+    def _busy(self) -> list[Run]:
+        # Sweeps are local work and don't take a download's slot.
+        return [
+            r
+            for r in self._active.values()
+            if r.status in ("running", "awaiting_mfa") and not isinstance(r, SweepRun)
+        ]
+
+    def _has_free_slot(self, run: Run) -> bool:
+        """Whether *run* may start now under both concurrency limits."""
+        busy = self._busy()
+        if 0 < self._max_concurrent <= len(busy):
+            return False
+        if self._max_per_account <= 0:
+            return True
+        account = self._run_accounts.get(run.run_id)
+        same = sum(1 for r in busy if self._run_accounts.get(r.run_id) == account)
+        return same < self._max_per_account
+
+    def _queue_has_account(self, run: Run) -> bool:
+        # A new run must not overtake a queued one for the same account.
+        account = self._run_accounts.get(run.run_id)
+        return any(self._run_accounts.get(r.run_id) == account for _, _, r in self._queue)
+
+    def _renumber_queue(self) -> None:
+        for position, (_, _, run) in enumerate(self._queue, start=1):
+            if run.queue_position != position:
+                run.mark_queued(position)
+                self._on_event(run, "queued")
+
+    async def _dispatch_queued(self) -> None:
+        """Launch queued runs, in queue order, while limits allow.
+
+        A run whose account is saturated is skipped, not waited on, so
+        other accounts' runs behind it still start.
+        """
+        async with self._lock:
+            blocked: set[str | None] = set()
+            for entry in list(self._queue):
+                run = entry[2]
+                account = self._run_accounts.get(run.run_id)
+                if account in blocked:
+                    continue  # keep per-account FIFO
+                if not self._has_free_slot(run):
+                    if 0 < self._max_concurrent <= len(self._busy()):
+                        break
+                    blocked.add(account)
+                    continue
+                self._queue.remove(entry)
+                if run.status != "queued":
+                    continue
+                try:
+                    await run.start()
+                except Exception as exc:  # noqa: BLE001
+                    log.exception("failed to start queued run %s", run.run_id)
+                    run.finish_unstarted("failed", reason=str(exc))
+                    continue
+                self._on_event(run, "started")
+            self._renumber_queue()
+
     async def _resolve_library_kind(self, policy: Policy, password: str) -> str | None:
         """Translate policy.library_kind into an icloudpd library identifier.
 
@@ -142,8 +332,14 @@ class Runner:
 
     async def stop(self, run_id: str) -> bool:
         run = self._by_id.get(run_id)
-        if run is None or run.status != "running":
+        if run is None or run.status not in ("running", "queued"):
             return False
+        if run.status == "queued":
+            async with self._lock:
+                self._queue = [entry for entry in self._queue if entry[2] is not run]
+                await run.stop()
+                self._renumber_queue()
+            return True
         await run.stop()
         return True
 
@@ -167,8 +363,7 @@ class Runner:
         if password is None:
             raise ValueError("password required for library discovery")
         async with self._lock:
-            if self.is_running(policy.name):
-                raise RuntimeError(f"policy {policy.name} already running")
+            self._check_idle(policy.name)
             run_id = _mk_run_id(policy.name)
             log_dir = self._runs_base / policy.name
             log_dir.mkdir(parents=True, exist_ok=True)
@@ -201,9 +396,17 @@ class Runner:
                 password=password,
                 on_mfa_needed=on_mfa_needed,
                 filters=None,
+                index=self._run_index,
+                on_exit=self._remember_last_run,
+                on_progress=self._on_progress,
+                coalesce_logs=True,
+                compress_log=self._compress_logs,
             )
             self._active[policy.name] = run
             self._by_id[run_id] = run
+            # Discovery is short and someone is waiting on it, so it skips
+            # the queue, though it still counts against its account.
+            self._run_accounts[run_id] = _account_key(policy)
             await run.start()
             asyncio.create_task(self._on_complete(run))
             self._on_event(run, "started")
@@ -219,15 +422,36 @@ class Runner:
                 f"library discovery failed (exit {run.exit_code}); check the run log"
             )
 
-        return parse_library_names(run.log_path.read_text(encoding="utf-8", errors="replace"))
+        return parse_library_names(iter_log_lines(run.log_path))
+
+    def _remember_last_run(self, run: Run) -> None:
+        self._last_runs[run.policy_name] = RunSummary.model_validate(
+            {
+                "run_id": run.run_id,
+                "started_at": run.started_at,
+                "ended_at": run.ended_at,
+                "status": run.status,
+                "exit_code": run.exit_code,
+                "error_id": run.error_id,
+            }
+        )
+
+    def _on_progress(self, run: Run) -> None:
+        now = time.monotonic()
+        last = self._progress_sent_at.get(run.run_id)
+        if last is not None and now - last < self.PROGRESS_EVENT_INTERVAL:
+            return
+        self._progress_sent_at[run.run_id] = now
+        self._on_event(run, "progress")
 
     async def _on_complete(self, run: Run) -> None:
         await run.wait()
         if self._mfa_registry is not None:
             with contextlib.suppress(Exception):
                 self._mfa_registry.cleanup(run.policy_name)
-        prune_logs(run.log_dir, keep=self._retention)
-        # Free the active slot so _summary stops reporting a completed run
+        self._progress_sent_at.pop(run.run_id, None)
+        self._run_accounts.pop(run.run_id, None)
+        # Free the active slot so policy_summary stops reporting a completed run
         # as the "active" run. Only clear if we're still the current active
         # run — a concurrent start() may have replaced us (can't happen
         # today since start() rejects when is_running, but keeps the
@@ -235,12 +459,34 @@ class Runner:
         if self._active.get(run.policy_name) is run:
             self._active.pop(run.policy_name, None)
         self._on_event(run, "completed")
+        await self._dispatch_queued()
+        # Off the loop, and after "completed" so nothing waits on it:
+        # unindexing a pruned run re-reads its log.
+        await asyncio.to_thread(
+            prune_logs,
+            run.log_dir,
+            keep=self._retention,
+            index=self._run_index,
+            search=self._log_search,
+            in_use=self._log_in_use,
+        )
+        if self._log_search is not None:
+            try:
+                await asyncio.to_thread(
+                    self._log_search.index_run, run.policy_name, run.run_id, run.log_path
+                )
+            except (OSError, EOFError):
+                log.warning("could not index run log %s", run.log_path, exc_info=True)
 
     def active_run(self, name: str) -> Run | None:
         """Return the currently-active Run for a policy, or None."""
         return self._active.get(name)
 
 
+def _account_key(policy: Policy) -> str:
+    return policy.username.strip().lower()
+
+
 def _mk_run_id(policy_name: str) -> str:
     stamp = datetime.now(UTC).strftime("%Y%m%dT%H%M%S_%fZ")
     return f"{policy_name}-{stamp}"
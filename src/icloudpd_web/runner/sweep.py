@@ -0,0 +1,169 @@
+"""Applying a policy's filters to the files already in its directory.
+
+A download Run filters only the files icloudpd reports downloading, so
+tightening a policy's filters does nothing for the library already on
+disk. A `SweepRun` walks the directory instead and sends every file
+through the same batches a download uses (filter pool, EXIF cache,
+backpressure). It runs in-process, but to the
+Runner, the API and the events stream it is a run like any other, with
+its own log and history entry.
+
+With `list_only` the sweep deletes nothing and logs what it would delete.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import os
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from .filter_pool import FILTER_BATCH_SIZE, FilterPool
+from .run import Run
+
+
+if TYPE_CHECKING:
+    from icloudpd_web.store.models import Filters
+
+    from .run_index import RunIndex
+
+
+log = logging.getLogger(__name__)
+
+
+def iter_library_files(root: Path) -> Iterator[Path]:
+    """Regular files under *root*, streamed with os.scandir so the walk
+    never holds more than one directory listing per level.
+
+    Dot-files and dot-directories (the folder-structure sentinel, partial
+    downloads) are skipped, and symlinks aren't followed.
+    """
+    stack = [root]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                subdirs = []
+                for entry in entries:
+                    if entry.name.startswith("."):
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(Path(entry.path))
+                    elif entry.is_file(follow_symlinks=False):
+                        yield Path(entry.path)
+        except (FileNotFoundError, NotADirectoryError, PermissionError):
+            if directory == root:
+                raise
+            continue
+        # Reversed, so directories are visited in listing order.
+        stack.extend(reversed(subdirs))
+
+
+class SweepRun(Run):
+    # A sweep checks the whole library, and most of it is kept: logging
+    # each kept file would bury the rejections. The counts go out in the
+    # "progress" events instead.
+    LOG_KEPT_FILES = False
+
+    def __init__(
+        self,
+        *,
+        run_id: str,
+        policy_name: str,
+        log_dir: Path,
+        directory: Path,
+        filters: Filters,
+        list_only: bool = False,
+        filter_pool: FilterPool | None = None,
+        index: RunIndex | None = None,
+        on_exit: Callable[[Run], None] | None = None,
+        on_progress: Callable[[Run], None] | None = None,
+        coalesce_logs: bool = False,
+        compress_log: bool = False,
+    ) -> None:
+        super().__init__(
+            run_id=run_id,
+            policy_name=policy_name,
+            argv=[],
+            log_dir=log_dir,
+            filters=filters,
+            filter_pool=filter_pool,
+            index=index,
+            on_exit=on_exit,
+            on_progress=on_progress,
+            coalesce_logs=coalesce_logs,
+            compress_log=compress_log,
+        )
+        self._directory = directory
+        self._list_only = list_only
+        self._delete_rejected = not list_only
+        self._checked = 0
+        self._task: asyncio.Task[None] | None = None
+
+    async def start(self) -> None:
+        self._open_log()
+        self._task = asyncio.create_task(self._sweep())
+
+    async def stop(self) -> None:
+        if self.status == "queued":
+            self.finish_unstarted("stopped")
+            return
+        # Checked between directory chunks; batches in flight still finish.
+        self._stopping = True
+
+    async def _sweep(self) -> None:
+        mode = (
+            "listing, not deleting, rejected files"
+            if self._list_only
+            else "deleting rejected files"
+        )
+        self._emit_log(f"INFO     Sweep of {self._directory}: {mode}")
+        # Whatever ends the walk, the run is settled: otherwise it would stay
+        # "running" and hold its policy's slot for good.
+        code = 1
+        try:
+            if self._filter_plan is None:
+                self._emit_log("INFO     Sweep: policy has no filters; nothing to do")
+            else:
+                await self._walk()
+            code = 0
+        except OSError as e:
+            self._emit_log(f"ERROR    Sweep failed: {e}")
+        except asyncio.CancelledError:
+            self._stopping = True
+            raise
+        except Exception as e:
+            log.exception("sweep %s failed", self.run_id)
+            self._emit_log(f"ERROR    Sweep failed: {type(e).__name__}: {e}")
+        finally:
+            if self._stopping:
+                code = 1
+            await self._finish(code)
+
+    async def _walk(self) -> None:
+        files = iter_library_files(self._directory)
+        while not self._stopping:
+            chunk = await asyncio.to_thread(
+                lambda: list(itertools.islice(files, FILTER_BATCH_SIZE))
+            )
+            if not chunk:
+                break
+            for path in chunk:
+                await self._queue_for_filter(path)
+
+    async def _filter_batch_done(self, batch: list[Path]) -> None:
+        await super()._filter_batch_done(batch)
+        # A sweep has no downloads; its progress counts files checked.
+        self._checked += len(batch)
+        self.progress = {
+            "downloaded": self._checked,
+            "total": None,
+            "kept": self._filter_kept,
+            "deleted": self._filter_deleted,
+        }
+        self._publish("progress", dict(self.progress))
+        if self._on_progress is not None:
+            self._on_progress(self)
@@ -1,11 +1,18 @@
 from __future__ import annotations
 
 import asyncio
+import contextlib
+import heapq
+import json
 import logging
+import os
+import threading
+import zlib
 import zoneinfo
 from collections.abc import Callable
-from datetime import UTC, datetime
-from typing import Protocol
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any, Protocol
 
 from croniter import croniter
 
@@ -16,58 +23,278 @@ log = logging.getLogger(__name__)
 
 
 class _StoreProto(Protocol):
+    @property
+    def generation(self) -> int: ...  # pragma: no cover
+
     def all(self) -> list[Policy]: ...  # pragma: no cover
 
+    def changes_since(
+        self, generation: int
+    ) -> list[tuple[int, str, dict[str, Any]]] | None: ...  # pragma: no cover
+
+    async def wait_changed(
+        self, seen: int, *, max_wait: float | None = None
+    ) -> int: ...  # pragma: no cover
+
 
 class _RunnerProto(Protocol):
     def is_running(self, name: str) -> bool: ...  # pragma: no cover
 
+    def is_queued(self, name: str) -> bool: ...  # pragma: no cover
+
     async def start(
         self, policy: Policy, *, password: str | None, trigger: str
     ) -> object: ...  # pragma: no cover
 
 
+# Store change kinds that can move a policy's next fire time.
+_POLICY_CHANGES = ("policy_upserted", "policy_deleted")
+# Upper bound on one sleep, so clock jumps (suspend, NTP) are noticed.
+MAX_SLEEP_SECONDS = 60.0
+# A start this late still counts as on time even with catch-up off: the
+# old per-second tick fired anywhere within the matching minute.
+ON_TIME_GRACE = timedelta(minutes=1)
+
+
 class Scheduler:
+    """Starts policies when their cron schedule comes due.
+
+    Each enabled policy's next fire time (cron match plus its jitter, in
+    UTC) sits in a min-heap, so a tick only looks at the head. Entries are
+    recomputed when the store generation shows a policy was upserted or
+    deleted, and replaced lazily: `_next` holds the live time per policy
+    and heap entries that don't match it are discarded when popped.
+
+    When each policy last fired is persisted to *state_path*, so a start
+    missed while the server was down (or the loop stalled) can be made up
+    once, if it was missed by no more than *catch_up_hours*.
+    """
+
     def __init__(
         self,
         *,
         store: _StoreProto,
         runner: _RunnerProto,
         password_lookup: Callable[[str], str | None],
+        jitter_minutes: int = 0,
+        catch_up_hours: float = 0,
+        state_path: Path | None = None,
     ) -> None:
         self._store = store
         self._runner = runner
         self._password_lookup = password_lookup
-        self._last_fired: dict[str, datetime] = {}
+        # Server-wide start spread for policies without their own.
+        self._jitter_minutes = jitter_minutes
+        self._catch_up = timedelta(hours=catch_up_hours)
+        self._state_path = state_path
+        self._last_fired: dict[str, datetime] = self._load_state()
         self._stop = asyncio.Event()
         self._pending: list[Policy] = []
+        self._heap: list[tuple[datetime, str]] = []
+        self._next: dict[str, datetime] = {}
+        self._policies: dict[str, Policy] = {}
+        # Store generation the heap reflects; None forces a full rebuild.
+        self._generation: int | None = None
+        # API handlers read next fire times from the threadpool.
+        self._lock = threading.Lock()
+        # State waiting to be written, snapshotted under _lock and written
+        # outside it; _save_lock keeps the writes in order.
+        self._unsaved: dict[str, Any] | None = None
+        self._save_lock = threading.Lock()
+
+    def jitter(self, policy: Policy) -> timedelta:
+        """The policy's fixed delay after each cron match.
+
+        Derived from the policy name, so it is stable across restarts and
+        a fleet sharing one cron string lands evenly across the window.
+        """
+        window = policy.jitter_minutes
+        if window is None:
+            window = self._jitter_minutes
+        if window <= 0:
+            return timedelta(0)
+        return timedelta(seconds=zlib.crc32(policy.name.encode("utf-8")) % (window * 60))
+
+    def set_options(self, *, jitter_minutes: int, catch_up_hours: float) -> None:
+        with self._lock:
+            self._jitter_minutes = jitter_minutes
+            self._catch_up = timedelta(hours=catch_up_hours)
+            self._generation = None
 
     def next_run_at(self, policy: Policy, *, after: datetime) -> datetime:
-        return croniter(policy.cron, after).get_next(datetime)
+        """First start strictly after *after*, in the policy's timezone."""
+        offset = self.jitter(policy)
+        local = self._localize(after - offset, policy)
+        return croniter(policy.cron, local).get_next(datetime) + offset
+
+    def next_fire(self, name: str) -> datetime | None:
+        """The cached next start (UTC) for *name*, or None if not scheduled."""
+        with self._lock:
+            self._refresh_locked(datetime.now(UTC))
+            at = self._next.get(name)
+        self._save_state()
+        return at
 
     def tick(self, now: datetime) -> None:
-        for p in self._store.all():
-            if not p.enabled:
-                continue
-            if self._runner.is_running(p.name):
-                continue
-            local_now = self._localize(now, p)
-            minute = local_now.replace(second=0, microsecond=0)
-            if not croniter.match(p.cron, minute):
-                continue
-            if self._last_fired.get(p.name) == minute:
-                continue
-            self._last_fired[p.name] = minute
-            self._pending.append(p)
+        now = _as_utc(now)
+        with self._lock:
+            self._refresh_locked(now)
+            fired = False
+            while self._heap and self._heap[0][0] <= now:
+                at, name = heapq.heappop(self._heap)
+                if self._next.get(name) != at:
+                    continue  # superseded by a reschedule
+                p = self._policies[name]
+                self._last_fired[name] = at
+                fired = True
+                self._schedule_locked(p, now)
+                if now - at > max(self._catch_up, ON_TIME_GRACE):
+                    log.warning("skipping missed start of %s due at %s", name, at.isoformat())
+                    continue
+                if self._runner.is_running(name) or self._runner.is_queued(name):
+                    continue
+                self._pending.append(p)
+            if fired:
+                self._state_changed_locked()
+        self._save_state()
+
+    def seconds_until_due(self, now: datetime) -> float:
+        """How long the run loop may sleep before the next start is due."""
+        now = _as_utc(now)
+        with self._lock:
+            self._refresh_locked(now)
+            while self._heap and self._next.get(self._heap[0][1]) != self._heap[0][0]:
+                heapq.heappop(self._heap)
+            delay = (self._heap[0][0] - now).total_seconds() if self._heap else None
+        self._save_state()
+        if delay is None:
+            return MAX_SLEEP_SECONDS
+        return min(max(delay, 0.0), MAX_SLEEP_SECONDS)
+
+    def _refresh_locked(self, now: datetime) -> None:
+        generation = self._store.generation
+        if generation == self._generation:
+            return
+        changes = None
+        if self._generation is not None:
+            changes = self._store.changes_since(self._generation)
+        self._generation = generation
+        if changes is None:
+            self._heap.clear()
+            self._next.clear()
+            self._policies.clear()
+            for p in self._store.all():
+                self._schedule_locked(p, now, this_minute=True)
+                self._catch_up_locked(p, now)
+            return
+        # Most bumps are run events; only policy edits touch the heap.
+        names = {d.get("name") for _, kind, d in changes if kind in _POLICY_CHANGES}
+        if not names:
+            return
+        current = {p.name: p for p in self._store.all()}
+        for name in names:
+            p = current.get(name)
+            if p is not None:
+                self._schedule_locked(p, now)
+            else:
+                self._next.pop(name, None)
+                self._policies.pop(name, None)
+                if self._last_fired.pop(name, None) is not None:
+                    self._state_changed_locked()
+
+    def _schedule_locked(self, p: Policy, now: datetime, *, this_minute: bool = False) -> None:
+        self._policies[p.name] = p
+        if not p.enabled:
+            self._next.pop(p.name, None)
+            return
+        # On a full rebuild (startup), start from the top of the current
+        # minute so a policy whose cron matches it still fires this minute.
+        # An edited policy only fires from now on. Either way, never at or
+        # before the time it last fired.
+        after = now
+        if this_minute:
+            after = now.replace(second=0, microsecond=0) - timedelta(seconds=1)
+        last = self._last_fired.get(p.name)
+        if last is not None and last > after:
+            after = last
+        at = _as_utc(self.next_run_at(p, after=after))
+        self._next[p.name] = at
+        heapq.heappush(self._heap, (at, p.name))
+
+    def _catch_up_locked(self, p: Policy, now: datetime) -> None:
+        # Only policies known to have fired before: a new policy, or one
+        # from before state was persisted, has nothing to make up.
+        last = self._last_fired.get(p.name)
+        if not p.enabled or not self._catch_up or last is None:
+            return
+        offset = self.jitter(p)
+        local = self._localize(now - offset, p)
+        missed = _as_utc(croniter(p.cron, local).get_prev(datetime) + offset)
+        if missed <= last or now - missed > self._catch_up:
+            return
+        log.info("catching up missed start of %s due at %s", p.name, missed.isoformat())
+        self._next[p.name] = now
+        heapq.heappush(self._heap, (now, p.name))
+
+    def _load_state(self) -> dict[str, datetime]:
+        if self._state_path is None or not self._state_path.exists():
+            return {}
+        try:
+            data = json.loads(self._state_path.read_text(encoding="utf-8"))
+            return {
+                name: _as_utc(datetime.fromisoformat(ts))
+                for name, ts in data.get("last_fired", {}).items()
+            }
+        except (OSError, ValueError, AttributeError):
+            log.warning("ignoring unreadable scheduler state %s", self._state_path)
+            return {}
+
+    def _state_changed_locked(self) -> None:
+        if self._state_path is not None:
+            self._unsaved = {
+                "last_fired": {n: ts.isoformat() for n, ts in self._last_fired.items()}
+            }
+
+    def _save_state(self) -> None:
+        """Write the latest state snapshot, if any. Called without _lock
+        held, so disk latency never holds up ticks or API reads."""
+        with self._save_lock:
+            with self._lock:
+                payload, self._unsaved = self._unsaved, None
+            if payload is None or self._state_path is None:
+                return
+            tmp = self._state_path.with_suffix(self._state_path.suffix + ".tmp")
+            try:
+                self._state_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+                os.replace(tmp, self._state_path)
+            except OSError:
+                log.warning("could not save scheduler state %s", self._state_path, exc_info=True)
+                with contextlib.suppress(OSError):
+                    tmp.unlink()
 
     async def run_forever(self) -> None:
         while not self._stop.is_set():
-            await asyncio.sleep(1)
             try:
+                await self._sleep(self.seconds_until_due(datetime.now(UTC)))
+                if self._stop.is_set():
+                    break
                 self.tick(datetime.now(UTC))
                 await self._drain_pending()
             except Exception:
                 log.exception("scheduler tick failed")
+                await asyncio.sleep(1)
+
+    async def _sleep(self, delay: float) -> None:
+        """Sleep up to *delay* seconds; wake early on stop or a store change."""
+        seen = self._store.generation
+        stop = asyncio.ensure_future(self._stop.wait())
+        changed = asyncio.ensure_future(self._store.wait_changed(seen, max_wait=delay))
+        try:
+            await asyncio.wait({stop, changed}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in (stop, changed):
+                task.cancel()
 
     def stop(self) -> None:
         self._stop.set()
@@ -93,3 +320,10 @@ class Scheduler:
             # Treat naive as UTC for localization consistency.
             return now.replace(tzinfo=UTC).astimezone(tz)
         return now.astimezone(tz)
+
+
+def _as_utc(dt: datetime) -> datetime:
+    # Naive datetimes are treated as UTC, as in _localize.
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=UTC)
+    return dt.astimezone(UTC)
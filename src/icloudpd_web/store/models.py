@@ -42,11 +42,25 @@ class AwsConfig(BaseModel):
     region: str | None = None
     access_key_id: str | None = None
     secret_access_key: str | None = None
+    # S3-compatible endpoint (MinIO, a local stand-in); None means AWS.
+    endpoint_url: str | None = None
+    # After a run, upload only the files it downloaded (tracked in an
+    # upload manifest) instead of `aws s3 sync`-ing the whole directory.
+    incremental: bool = False
+    # Incremental uploads: files larger than one part go up as a multipart
+    # upload, this many parts at a time. S3 parts are 5 MiB to 5 GiB.
+    part_size_mb: int = Field(default=16, ge=5, le=5120)
+    parallel_parts: int = Field(default=4, ge=1, le=32)
+    # Incremental uploads start on each file as soon as it is downloaded
+    # (and kept by the filters) rather than after the run.
+    upload_while_downloading: bool = False
 
     @model_validator(mode="after")
     def _check(self) -> AwsConfig:
         if self.enabled and not self.bucket:
             raise ValueError("aws.bucket is required when aws.enabled is true")
+        if self.upload_while_downloading and not self.incremental:
+            raise ValueError("aws.upload_while_downloading requires aws.incremental")
         return self
 
 
@@ -66,6 +80,9 @@ class Policy(BaseModel):
     cron: str
     enabled: bool = True
     timezone: str | None = None
+    # Spread scheduled starts over this many minutes after the cron time,
+    # at a fixed per-policy offset. None defers to the server-wide setting.
+    jitter_minutes: int | None = Field(default=None, ge=0, le=1440)
     icloudpd: dict[str, Any] = Field(default_factory=dict)
     # User-facing choice of library. Backend resolves to the actual icloudpd
     # identifier at run time (personal → "PrimarySync"; shared → enumerated
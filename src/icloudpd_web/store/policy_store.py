@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import asyncio
+import collections
 import contextlib
 import logging
 import os
+import secrets
 import threading
 from pathlib import Path
 from typing import Any
@@ -15,19 +18,41 @@ from .models import Policy
 
 log = logging.getLogger(__name__)
 
+# (generation, kind, data) for one store mutation. `kind` is one of
+# policy_upserted / policy_deleted / run_started / run_progress /
+# run_finished, or "generation" for a bump with no typed payload.
+Change = tuple[int, str, dict[str, Any]]
+
 
 class PolicyStore:
+    CHANGE_LOG_CAP = 500
+
     def __init__(self, dir: Path) -> None:
         self._dir = dir
         self._dir.mkdir(parents=True, exist_ok=True)
         self._policies: dict[str, Policy] = {}
         self._generation = 0
+        # Generations restart at 0 with the process; stream ids carry this so
+        # a client's id from an earlier process is never mistaken for ours.
+        self._boot_id = secrets.token_hex(4)
         self._lock = threading.Lock()
+        # Recent mutations, so stream clients can be sent deltas instead of
+        # refetching the whole list. Clients that fall further behind than
+        # the cap get a full "generation" resync.
+        self._changes: collections.deque[Change] = collections.deque(maxlen=self.CHANGE_LOG_CAP)
+        # Pending wait_changed() callers. Mutations happen on threadpool
+        # threads (sync endpoints) as well as the event loop, so each waiter
+        # remembers its loop and is resolved via call_soon_threadsafe.
+        self._waiters: set[tuple[asyncio.AbstractEventLoop, asyncio.Future[int]]] = set()
 
     @property
     def generation(self) -> int:
         return self._generation
 
+    @property
+    def boot_id(self) -> str:
+        return self._boot_id
+
     def load(self) -> None:
         with self._lock:
             self._policies.clear()
@@ -65,7 +90,7 @@ class PolicyStore:
                     tmp.unlink()
                 raise
             self._policies[policy.name] = policy
-            self._generation += 1
+            self._record_locked("policy_upserted", {"name": policy.name})
 
     def delete(self, name: str) -> bool:
         with self._lock:
@@ -75,14 +100,66 @@ class PolicyStore:
             if path.exists():
                 path.unlink()
             del self._policies[name]
-            self._generation += 1
+            self._record_locked("policy_deleted", {"name": name})
             return True
 
-    def bump(self) -> int:
-        """Bump generation without policy change (e.g. run state transition)."""
+    def bump(self, kind: str = "generation", data: dict[str, Any] | None = None) -> int:
+        """Bump generation without policy change (e.g. run state transition).
+
+        *kind* and *data* describe the change for delta-consuming clients.
+        """
+        with self._lock:
+            self._record_locked(kind, data or {})
+            return self._generation
+
+    def changes_since(self, generation: int, *, boot_id: str | None = None) -> list[Change] | None:
+        """Return every change after *generation*, oldest first.
+
+        Returns None if some of those changes have already been evicted from
+        the change log, or if *generation* was counted by another process
+        (*boot_id* isn't ours, or the generation is ahead of ours); the
+        caller must then resync from the full list.
+        """
+        with self._lock:
+            if boot_id is not None and boot_id != self._boot_id:
+                return None
+            if generation == self._generation:
+                return []
+            if generation > self._generation or self._changes[0][0] > generation + 1:
+                return None
+            return [c for c in self._changes if c[0] > generation]
+
+    async def wait_changed(self, seen: int, *, max_wait: float | None = None) -> int:
+        """Sleep until the generation differs from *seen*; return the new value.
+
+        Returns immediately if it already differs. After *max_wait* seconds,
+        returns the current generation (equal to *seen*) so callers can send
+        keepalives.
+        """
+        loop = asyncio.get_running_loop()
         with self._lock:
-            self._generation += 1
+            if self._generation != seen:
+                return self._generation
+            fut: asyncio.Future[int] = loop.create_future()
+            waiter = (loop, fut)
+            self._waiters.add(waiter)
+        try:
+            return await asyncio.wait_for(fut, max_wait)
+        except TimeoutError:
             return self._generation
+        finally:
+            with self._lock:
+                self._waiters.discard(waiter)
+
+    def _record_locked(self, kind: str, data: dict[str, Any]) -> None:
+        self._generation += 1
+        self._changes.append((self._generation, kind, data))
+        self._notify_locked()
+
+    def _notify_locked(self) -> None:
+        for loop, fut in self._waiters:
+            loop.call_soon_threadsafe(_resolve, fut, self._generation)
+        self._waiters.clear()
 
     @staticmethod
     def _from_toml(data: dict[str, Any]) -> Policy:
@@ -91,3 +168,8 @@ class PolicyStore:
         # here. Runtime-only fields like `next_run_at` / `last_run` are not
         # in the TOML so they default to None.
         return Policy.model_validate(data)
+
+
+def _resolve(fut: asyncio.Future[int], generation: int) -> None:
+    if not fut.done():
+        fut.set_result(generation)
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import pytest
 from fastapi.testclient import TestClient
 
 from .conftest import wait_until_idle
@@ -34,3 +35,18 @@ def test_policy_last_run_populated(client: TestClient) -> None:
     assert last_run is not None, "policy.last_run should be populated after a run"
     assert last_run["status"] == "success"
     assert last_run["run_id"] == rid
+
+
+def test_list_runs_includes_in_flight_run(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "slow")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "100")
+    rid = client.post("/policies/p/runs").json()["run_id"]
+
+    runs = client.get("/policies/p/runs").json()
+    assert runs[0]["run_id"] == rid
+    assert runs[0]["status"] == "running"
+
+    client.delete(f"/runs/{rid}")
+    wait_until_idle(client)
@@ -1,3 +1,5 @@
+from pathlib import Path
+
 import pytest
 from fastapi.testclient import TestClient
 
@@ -27,3 +29,213 @@ def test_list_runs_shows_completed(client: TestClient) -> None:
     r2 = client.get("/policies/p/runs")
     assert r2.status_code == 200
     assert any(x["run_id"] == rid for x in r2.json())
+
+
+def _write_log(client: TestClient, run_id: str, n: int) -> bytes:
+    data = b"".join(f"line {i}\n".encode() for i in range(n))
+    log_dir = client.app.state.data_dir / "runs" / "p"  # type: ignore[attr-defined]
+    log_dir.mkdir(parents=True, exist_ok=True)
+    (log_dir / f"{run_id}.log").write_bytes(data)
+    return data
+
+
+def test_get_log_tail(client: TestClient) -> None:
+    data = _write_log(client, "p-tail", 100)
+    r = client.get("/runs/p-tail/log", params={"tail": 3})
+    assert r.status_code == 200
+    assert r.text == "line 97\nline 98\nline 99\n"
+    assert int(r.headers["X-Log-Offset"]) == len(data) - len(r.content)
+    assert int(r.headers["X-Log-Next-Offset"]) == len(data)
+    assert int(r.headers["X-Log-Size"]) == len(data)
+
+
+def test_get_log_pages_whole_lines(client: TestClient) -> None:
+    data = _write_log(client, "p-page", 50)
+    pages: list[bytes] = []
+    offset = 0
+    while offset < len(data):
+        r = client.get("/runs/p-page/log", params={"offset": offset, "limit": 64})
+        assert r.status_code == 200
+        assert r.content.endswith(b"\n")
+        pages.append(r.content)
+        offset = int(r.headers["X-Log-Next-Offset"])
+    assert b"".join(pages) == data
+
+
+def test_get_log_range(client: TestClient) -> None:
+    data = _write_log(client, "p-range", 10)
+    r = client.get("/runs/p-range/log", headers={"Range": "bytes=0-6"})
+    assert r.status_code == 206
+    assert r.content == data[:7]
+
+
+def test_get_log_tail_and_offset_conflict(client: TestClient) -> None:
+    _write_log(client, "p-both", 5)
+    r = client.get("/runs/p-both/log", params={"tail": 1, "offset": 0})
+    assert r.status_code == 422
+
+
+def test_get_compressed_log(client: TestClient) -> None:
+    from icloudpd_web.runner.log_storage import compress_log
+
+    data = _write_log(client, "p-gz", 20)
+    compress_log(client.app.state.data_dir / "runs" / "p" / "p-gz.log")  # type: ignore[attr-defined]
+
+    r = client.get("/runs/p-gz/log", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert r.content == data  # httpx inflates it
+
+    r = client.get("/runs/p-gz/log", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in r.headers
+    assert r.content == data
+
+    r = client.get("/runs/p-gz/log", params={"tail": 2})
+    assert r.text == "line 18\nline 19\n"
+    assert int(r.headers["X-Log-Size"]) == len(data)
+
+
+@pytest.mark.parametrize("encoding", ["gzip", "identity"])
+def test_get_compressed_log_range(client: TestClient, encoding: str) -> None:
+    from icloudpd_web.runner.log_storage import compress_log
+
+    data = _write_log(client, "p-gzr", 20)
+    compress_log(client.app.state.data_dir / "runs" / "p" / "p-gzr.log")  # type: ignore[attr-defined]
+
+    # Ranges address the log's text, never its gzip bytes.
+    for spec, (first, last) in (
+        ("7-20", (7, 20)),
+        ("100-", (100, len(data) - 1)),
+        ("-8", (len(data) - 8, len(data) - 1)),
+    ):
+        r = client.get(
+            "/runs/p-gzr/log", headers={"Range": f"bytes={spec}", "Accept-Encoding": encoding}
+        )
+        assert r.status_code == 206
+        assert "Content-Encoding" not in r.headers
+        assert r.headers["Content-Range"] == f"bytes {first}-{last}/{len(data)}"
+        assert r.content == data[first : last + 1]
+
+    # Past the end, several ranges, or not bytes: refused, not ignored.
+    for header in (f"bytes={len(data)}-", "bytes=0-1,4-5", "lines=1-2"):
+        r = client.get("/runs/p-gzr/log", headers={"Range": header})
+        assert r.status_code == 416
+        assert r.headers["Content-Range"] == f"bytes */{len(data)}"
+
+
+def test_search_logs(client: TestClient) -> None:
+    import time
+
+    rid = client.post("/policies/p/runs").json()["run_id"]
+    wait_until_idle(client)
+    # Indexing runs after the run is reported complete.
+    for _ in range(100):
+        hits = client.get("/runs/search", params={"q": '"Downloading 2 of 2"'}).json()
+        if hits:
+            break
+        time.sleep(0.05)
+    assert [h["run_id"] for h in hits] == [rid]
+    assert hits[0]["level"] == "INFO"
+
+    r = client.get("/runs/search", params={"q": "Downloading", "policy": "other"})
+    assert r.json() == []
+    r = client.get("/runs/search", params={"q": "x", "level": "LOUD"})
+    assert r.status_code == 422
+    r = client.get("/runs/search", params={"q": "Downloading", "since": "2100-01-01T00:00:00Z"})
+    assert r.json() == []
+
+
+def test_queued_run_visible_in_summary(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    from .conftest import make_policy_body, set_policy_password
+
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "slow")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "100")
+    settings = client.get("/settings").json()
+    assert client.put("/settings", json={**settings, "max_concurrent_runs": 1}).status_code == 200
+    client.put("/policies/q", json=make_policy_body("q"))
+    set_policy_password(client, "q")
+
+    client.post("/policies/p/runs")
+    rid = client.post("/policies/q/runs").json()["run_id"]
+
+    q = client.get("/policies/q").json()
+    assert (q["queue_position"], q["active_run_id"], q["is_running"]) == (1, rid, False)
+    assert client.post("/policies/q/runs").status_code == 409
+
+    assert client.delete(f"/runs/{rid}").json() == {"ok": True}
+    wait_until_idle(client, "q")
+    assert client.get("/policies/q").json()["queue_position"] is None
+
+
+def test_aws_sync_status_and_log(client: TestClient) -> None:
+    assert client.get("/runs/p-sync/aws").status_code == 404
+    assert client.get("/runs/p-sync/aws/log").status_code == 404
+    log_dir = client.app.state.data_dir / "runs" / "p"  # type: ignore[attr-defined]
+    log_dir.mkdir(parents=True, exist_ok=True)
+    (log_dir / "p-sync.aws.json").write_text('{"run_id": "p-sync", "status": "success"}')
+    (log_dir / "p-sync.aws").write_text("upload: a\nupload: b\nupload: c\n")
+    assert client.get("/runs/p-sync/aws").json()["status"] == "success"
+    assert client.get("/runs/p-sync/aws/log").text == "upload: a\nupload: b\nupload: c\n"
+    assert client.get("/runs/p-sync/aws/log", params={"tail": 1}).text == "upload: c\n"
+
+
+def test_full_aws_sync_on_demand(client: TestClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    from .conftest import make_policy_body, set_policy_password
+
+    assert client.post("/policies/nope/aws/sync").status_code == 404
+    assert client.post("/policies/p/aws/sync").status_code == 409  # aws not enabled
+    aws = {"enabled": True, "bucket": "b", "incremental": True}
+    client.put("/policies/s", json=make_policy_body("s", aws=aws))
+    assert client.post("/policies/s/aws/sync").status_code == 409  # no runs yet
+
+    started: list[dict] = []
+    aws_sync = client.app.state.aws_sync  # type: ignore[attr-defined]
+    monkeypatch.setattr(aws_sync, "start", lambda cfg, **kw: started.append(kw))
+    set_policy_password(client, "s")
+    rid = client.post("/policies/s/runs").json()["run_id"]
+    wait_until_idle(client, "s")
+    assert started[0]["files"] is not None  # the run's own incremental upload
+    r = client.post("/policies/s/aws/sync")
+    assert r.json() == {"run_id": rid}
+    assert "files" not in started[-1]
+    assert started[-1]["log_path"].stem == rid
+
+
+def test_sweep_endpoint(client: TestClient, tmp_path: Path) -> None:
+    from .conftest import make_policy_body
+
+    assert client.post("/policies/nope/sweep").status_code == 404
+    assert client.post("/policies/p/sweep").status_code == 409  # no filters
+    library = tmp_path / "library"
+    body = {**make_policy_body("p"), "directory": str(library)}
+    body["filters"] = {"file_suffixes": [".heic"]}
+    client.put("/policies/p", json=body)
+    assert client.post("/policies/p/sweep").status_code == 409  # no directory yet
+    library.mkdir()
+    (library / "a.heic").write_bytes(b"x")
+    (library / "b.jpg").write_bytes(b"x")
+
+    rid = client.post("/policies/p/sweep").json()["run_id"]  # dry run by default
+    wait_until_idle(client)
+    assert (library / "b.jpg").exists()
+    assert "would delete" in client.get(f"/runs/{rid}/log").text
+    assert any(r["run_id"] == rid for r in client.get("/policies/p/runs").json())
+
+    client.post("/policies/p/sweep", json={"dry_run": False})
+    wait_until_idle(client)
+    assert not (library / "b.jpg").exists()
+    assert (library / "a.heic").exists()
+
+
+def test_sweep_conflicts_with_a_download(
+    client: TestClient, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from .conftest import make_policy_body
+
+    body = {**make_policy_body("p"), "directory": str(tmp_path)}
+    body["filters"] = {"file_suffixes": [".heic"]}
+    client.put("/policies/p", json=body)
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "slow")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "100")
+    assert client.post("/policies/p/runs").status_code == 200
+    assert client.post("/policies/p/sweep").status_code == 409
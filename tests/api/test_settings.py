@@ -25,6 +25,8 @@ def test_get_defaults(client: TestClient) -> None:
     body = r.json()
     assert body["apprise"]["urls"] == []
     assert body["retention_runs"] == 10
+    # Same-account policies keep running in parallel unless limited.
+    assert body["max_runs_per_account"] == 0
 
 
 def test_put_roundtrip(client: TestClient) -> None:
@@ -40,3 +42,11 @@ def test_put_roundtrip(client: TestClient) -> None:
     r = client.put("/settings", json=body)
     assert r.status_code == 200
     assert client.get("/settings").json()["retention_runs"] == 5
+
+
+def test_notification_stats(client: TestClient) -> None:
+    r = client.get("/settings/notifications")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["delivered"] == 0
+    assert body["pending"] == 0
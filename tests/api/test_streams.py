@@ -1,6 +1,15 @@
+import json
+from collections.abc import Callable
+
+import pytest
+from fastapi import FastAPI
 from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from icloudpd_web.api.streams import policies_stream
+from icloudpd_web.store.models import Policy
 
-from .conftest import parse_sse, wait_until_idle
+from .conftest import make_policy_body, parse_sse, set_policy_password, wait_until_idle
 
 
 def test_run_events_stream(client: TestClient) -> None:
@@ -10,5 +19,103 @@ def test_run_events_stream(client: TestClient) -> None:
     assert r.status_code == 200
     events = parse_sse(r.text)
     kinds = [e["event"] for e in events if "event" in e]
-    assert "log" in kinds
+    assert "log_batch" in kinds
     assert "status" in kinds
+
+
+def test_run_events_stream_follows_queued_run_to_the_end(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("FAKE_ICLOUDPD_SLEEP", "0.1")
+    client.put("/settings", json={"max_runs_per_account": 1})
+    client.put("/policies/q", json=make_policy_body("q"))
+    set_policy_password(client, "q")
+    client.post("/policies/p/runs")
+    rid = client.post("/policies/q/runs").json()["run_id"]
+    assert client.app.state.runner.get_run(rid).status == "queued"  # type: ignore[attr-defined]
+
+    events = parse_sse(client.get(f"/runs/{rid}/events").text)
+
+    statuses = [json.loads(e["data"])["status"] for e in events if e.get("event") == "status"]
+    assert statuses == ["queued", "running", "success"]
+    assert any(e.get("event") == "log_batch" for e in events)
+
+
+def _stream_request(app: FastAPI, last_event_id: str) -> Request:
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": True}
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/policies/stream",
+        "query_string": b"",
+        "headers": [(b"last-event-id", last_event_id.encode())],
+        "app": app,
+    }
+    return Request(scope, receive)
+
+
+async def test_policies_stream_sends_typed_deltas(app_factory: Callable[..., FastAPI]) -> None:
+    """Store changes after Last-Event-ID arrive as typed frames with the summary."""
+    app = app_factory()
+    store = app.state.policy_store
+    store.put(Policy(**make_policy_body("a")))
+    store.put(Policy(**make_policy_body("b")))
+    store.delete("b")
+    store.bump("run_started", {"name": "a", "run_id": "a-1", "status": "running"})
+
+    boot = store.boot_id
+    resp = await policies_stream(_stream_request(app, f"{boot}:0"))
+    body = resp.body_iterator
+    frames = [parse_sse((await anext(body)).decode())[0] for _ in range(4)]  # type: ignore[arg-type]
+    await body.aclose()  # type: ignore[attr-defined]
+
+    assert [f["event"] for f in frames] == [
+        "policy_upserted",
+        "policy_upserted",
+        "policy_deleted",
+        "run_started",
+    ]
+    assert [f["id"] for f in frames] == [f"{boot}:{n}" for n in (1, 2, 3, 4)]
+    started = json.loads(frames[3]["data"])
+    assert started["run_id"] == "a-1"
+    assert started["policy"]["name"] == "a"
+    assert "is_running" in started["policy"]
+    assert json.loads(frames[2]["data"]) == {"generation": 3, "name": "b"}
+
+
+async def test_policies_stream_resyncs_stale_client(app_factory: Callable[..., FastAPI]) -> None:
+    app = app_factory()
+    store = app.state.policy_store
+    store.bump()
+    store.bump()
+    # Ahead of us, from an earlier process (behind or level with us, too),
+    # or from before ids carried a boot id: all resync.
+    for last_id in (f"{store.boot_id}:99", "0123abcd:1", "0123abcd:2", "1"):
+        resp = await policies_stream(_stream_request(app, last_id))
+        body = resp.body_iterator
+        frame = parse_sse((await anext(body)).decode())[0]  # type: ignore[arg-type]
+        await body.aclose()  # type: ignore[attr-defined]
+        assert frame["event"] == "generation"
+        assert frame["id"] == f"{store.boot_id}:2"
+
+
+def test_run_events_replayed_from_disk_after_restart(client: TestClient) -> None:
+    rid = client.post("/policies/p/runs").json()["run_id"]
+    wait_until_idle(client)
+    live = parse_sse(client.get(f"/runs/{rid}/events").text)
+
+    # Simulate a restart: the Run object is gone, only its files remain.
+    client.app.state.runner._by_id.clear()  # type: ignore[attr-defined]  # noqa: SLF001
+    replayed = parse_sse(client.get(f"/runs/{rid}/events").text)
+    assert replayed == live
+
+    resumed = parse_sse(
+        client.get(f"/runs/{rid}/events", headers={"Last-Event-ID": live[0]["id"]}).text
+    )
+    assert resumed == live[1:]
+
+
+def test_run_events_unknown_run_is_404(client: TestClient) -> None:
+    assert client.get("/runs/p-nope/events").status_code == 404
@@ -3,7 +3,6 @@ from __future__ import annotations
 import json
 import time
 from collections.abc import Callable
-from datetime import UTC, datetime
 
 import pytest
 from fastapi import FastAPI
@@ -49,7 +48,7 @@ def test_wf1_happy_path(client: TestClient) -> None:
     assert sse.status_code == 200
     events = parse_sse(sse.text)
     kinds = [e["event"] for e in events if "event" in e]
-    assert "log" in kinds
+    assert "log_batch" in kinds
     assert kinds[-1] == "status"
     final = json.loads(events[-1]["data"])
     assert final["status"] == "success"
@@ -220,7 +219,10 @@ def test_wf7_scheduler_cron_tick(
         set_policy_password(c)
 
         scheduler = app.state.scheduler
-        scheduler.tick(datetime.now(UTC))
+        # An edited policy is scheduled from the next cron match on.
+        due = scheduler.next_fire("p")
+        assert due is not None
+        scheduler.tick(due)
 
         # TestClient owns the app's event loop via an anyio blocking portal.
         # Use c.portal.call() to run _drain_pending on the *same* loop so that
@@ -233,7 +235,7 @@ def test_wf7_scheduler_cron_tick(
         assert runs[0]["status"] == "success"
 
         # Second tick in same minute must not re-enqueue
-        scheduler.tick(datetime.now(UTC))
+        scheduler.tick(due)
         assert scheduler._pending == []
 
 
@@ -278,6 +280,7 @@ def test_wf9_aws_sync_invoked_on_success(
 ) -> None:
     from pathlib import Path
 
+    from icloudpd_web.integrations.aws_sync import AwsSyncStatus
     from icloudpd_web.store.models import AwsConfig
 
     monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "success")
@@ -286,9 +289,19 @@ def test_wf9_aws_sync_invoked_on_success(
 
     invocations: list[tuple[AwsConfig, Path]] = []
 
-    async def spy(cfg: AwsConfig, *, source: Path) -> AwsSyncResult:
+    async def spy(
+        cfg: AwsConfig,
+        *,
+        source: Path,
+        log_path: Path | None = None,
+        status: AwsSyncStatus | None = None,
+    ) -> AwsSyncResult:
         invocations.append((cfg, source))
-        return AwsSyncResult(skipped=False, exit_code=0, output="ok")
+        assert status is not None
+        status.uploaded = 1
+        status.exit_code = 0
+        status.status = "success"
+        return AwsSyncResult(skipped=False, exit_code=0, output="ok", uploaded=1)
 
     app.state.aws_sync.run = spy  # type: ignore[method-assign]
 
@@ -313,9 +326,12 @@ def test_wf9_aws_sync_invoked_on_success(
             },
         )
         set_policy_password(c)
-        c.post("/policies/p/runs")
+        run_id = c.post("/policies/p/runs").json()["run_id"]
         wait_until_idle(c)
         time.sleep(0.2)  # Allow the background AWS task to run
+        sync = c.get(f"/runs/{run_id}/aws").json()
+        assert sync["status"] == "success"
+        assert sync["uploaded"] == 1
 
     assert len(invocations) == 1
     cfg, src = invocations[0]
@@ -378,3 +394,59 @@ def test_wf10_filter_lines_in_log(
     assert (target_dir / "img_apple.heic").exists()
     assert not (target_dir / "img_samsung.jpg").exists()
     assert not (target_dir / "other.png").exists()
+
+
+def test_wf11_upload_while_downloading(
+    app_factory: Callable[..., FastAPI],
+    monkeypatch: pytest.MonkeyPatch,
+    tmp_path: pytest.TempPathFactory,
+) -> None:
+    """WF-11: a pipelined upload gets each kept file during the run, and a
+    file deleted by the filters never reaches S3."""
+    from pathlib import Path
+
+    from icloudpd_web.store.models import AwsConfig
+
+    target_dir = Path(str(tmp_path)) / "photos"
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "filter_demo")
+    monkeypatch.setenv("FAKE_ICLOUDPD_DIR", str(target_dir))
+    app = app_factory()
+    uploaded: list[str] = []
+
+    class Recorder:
+        async def upload(self, cfg: AwsConfig, path: Path, key: str) -> str | None:
+            uploaded.append(key)
+            return None
+
+    app.state.aws_sync._uploader = Recorder()
+
+    with TestClient(app) as c:
+        c.post("/auth/login", json={"password": "pw"})
+        body = {
+            "name": "p",
+            "username": "u@icloud.com",
+            "directory": str(target_dir),
+            "cron": "0 * * * *",
+            "enabled": True,
+            "timezone": None,
+            "icloudpd": {},
+            "aws": {
+                "enabled": True,
+                "bucket": "b",
+                "incremental": True,
+                "upload_while_downloading": True,
+            },
+            "filters": {"file_suffixes": [".heic", ".jpg"]},
+        }
+        assert c.put("/policies/p", json=body).status_code == 200
+        set_policy_password(c)
+        run_id = c.post("/policies/p/runs").json()["run_id"]
+        wait_until_idle(c)
+        deadline = time.monotonic() + 5
+        while (status := c.get(f"/runs/{run_id}/aws").json()).get("status") == "running":
+            assert time.monotonic() < deadline
+            time.sleep(0.05)
+
+    assert status["mode"] == "pipelined"
+    assert status["status"] == "success"
+    assert sorted(uploaded) == ["img_apple.heic", "img_samsung.jpg"]
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Fake `aws s3api` for tests, storing objects as files.
+
+Supports put-object and the multipart calls CliUploader makes. Behavior
+driven by env vars:
+  FAKE_S3_DIR: where buckets live (<dir>/<bucket>/<key>); multipart parts
+               go under <dir>/.uploads/<upload_id>/, and every call is
+               appended to <dir>/.calls
+  FAKE_S3_FAIL_PARTS: comma-separated part numbers whose upload-part fails
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import uuid
+from pathlib import Path
+
+
+def _fail(message: str, code: int = 254) -> None:
+    print(f"\nAn error occurred ({message})", file=sys.stderr)
+    sys.exit(code)
+
+
+def main() -> None:
+    p = argparse.ArgumentParser(prog="fake_aws", allow_abbrev=False)
+    p.add_argument("service", choices=["s3api"])
+    p.add_argument("command")
+    p.add_argument("--bucket", required=True)
+    p.add_argument("--key", required=True)
+    p.add_argument("--body")
+    p.add_argument("--upload-id")
+    p.add_argument("--part-number", type=int)
+    p.add_argument("--multipart-upload")
+    p.add_argument("--output", default="json")
+    args = p.parse_args()
+
+    root = Path(os.environ["FAKE_S3_DIR"])
+    root.mkdir(parents=True, exist_ok=True)
+    with (root / ".calls").open("a") as f:
+        f.write(f"{args.command} {args.key} {args.part_number or ''}\n".rstrip() + "\n")
+    dest = root / args.bucket / args.key
+    uploads = root / ".uploads"
+
+    if args.command == "put-object":
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(args.body, dest)
+        etag = hashlib.md5(dest.read_bytes()).hexdigest()  # noqa: S324
+        print(json.dumps({"ETag": f'"{etag}"'}))
+    elif args.command == "create-multipart-upload":
+        upload_id = uuid.uuid4().hex
+        (uploads / upload_id).mkdir(parents=True)
+        print(json.dumps({"Bucket": args.bucket, "Key": args.key, "UploadId": upload_id}))
+    elif args.command == "upload-part":
+        fail = os.environ.get("FAKE_S3_FAIL_PARTS", "")
+        if str(args.part_number) in fail.split(","):
+            _fail("RequestTimeout) when calling the UploadPart operation: timed out", 255)
+        part_dir = uploads / args.upload_id
+        if not part_dir.is_dir():
+            _fail("NoSuchUpload) when calling the UploadPart operation")
+        data = Path(args.body).read_bytes()
+        (part_dir / str(args.part_number)).write_bytes(data)
+        print(json.dumps({"ETag": f'"{hashlib.md5(data).hexdigest()}"'}))  # noqa: S324
+    elif args.command == "complete-multipart-upload":
+        part_dir = uploads / args.upload_id
+        if not part_dir.is_dir():
+            _fail("NoSuchUpload) when calling the CompleteMultipartUpload operation")
+        parts = json.loads(args.multipart_upload)["Parts"]
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with dest.open("wb") as out:
+            for part in parts:
+                data = (part_dir / str(part["PartNumber"])).read_bytes()
+                if f'"{hashlib.md5(data).hexdigest()}"' != part["ETag"]:  # noqa: S324
+                    _fail("InvalidPart) when calling the CompleteMultipartUpload operation")
+                out.write(data)
+        shutil.rmtree(part_dir)
+        print(json.dumps({"ETag": f'"multipart-{len(parts)}"'}))
+    else:
+        _fail(f"InvalidCommand) {args.command}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,19 @@
+import threading
+import time
 from unittest.mock import MagicMock, patch
 
+import pytest
+
 from icloudpd_web.config import AppriseSettings
+from icloudpd_web.integrations import apprise_notifier
 from icloudpd_web.integrations.apprise_notifier import AppriseNotifier
 
 
+@pytest.fixture(autouse=True)
+def _no_backoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(apprise_notifier, "RETRY_BACKOFF_SECONDS", (0.0, 0.0))
+
+
 def test_empty_urls_no_op() -> None:
     n = AppriseNotifier(AppriseSettings())
     n.emit("success", policy_name="p", summary="ok")  # must not raise
@@ -18,11 +28,15 @@ def test_emit_respects_event_toggles() -> None:
         cls.return_value = inst
         n = AppriseNotifier(settings)
         n.emit("success", policy_name="p", summary="ok")
+        assert n.wait_idle(5)
         inst.notify.assert_not_called()
         n.emit("start", policy_name="p", summary="starting")
+        assert n.wait_idle(5)
         assert inst.notify.call_count == 1
         n.emit("failure", policy_name="p", summary="boom")
+        assert n.wait_idle(5)
         assert inst.notify.call_count == 2
+        assert n.stats()["delivered"] == 2
 
 
 def test_notify_error_never_raises() -> None:
@@ -33,3 +47,75 @@ def test_notify_error_never_raises() -> None:
         cls.return_value = inst
         n = AppriseNotifier(settings)
         n.emit("failure", policy_name="p", summary="boom")  # must not raise
+        assert n.wait_idle(5)
+        assert inst.notify.call_count == apprise_notifier.MAX_ATTEMPTS
+        stats = n.stats()
+        assert stats["failed"] == 1
+        assert stats["retried"] == apprise_notifier.MAX_ATTEMPTS - 1
+        assert stats["last_error"] == "RuntimeError: network down"
+
+
+def test_retry_then_deliver() -> None:
+    settings = AppriseSettings(urls=["mailto://x"], on_failure=True)
+    with patch("icloudpd_web.integrations.apprise_notifier.apprise.Apprise") as cls:
+        inst = MagicMock()
+        inst.notify.side_effect = [False, True]
+        cls.return_value = inst
+        n = AppriseNotifier(settings)
+        n.emit("failure", policy_name="p", summary="boom")
+        assert n.wait_idle(5)
+        stats = n.stats()
+        assert stats["delivered"] == 1
+        assert stats["retried"] == 1
+        assert stats["failed"] == 0
+        assert stats["pending"] == 0
+
+
+def test_emit_does_not_block_on_slow_target() -> None:
+    settings = AppriseSettings(urls=["mailto://x"], on_failure=True)
+    release = threading.Event()
+    with patch("icloudpd_web.integrations.apprise_notifier.apprise.Apprise") as cls:
+        inst = MagicMock()
+        inst.notify.side_effect = lambda **_: release.wait(5)
+        cls.return_value = inst
+        n = AppriseNotifier(settings)
+        for _ in range(apprise_notifier.QUEUE_MAX + 5):
+            n.emit("failure", policy_name="p", summary="boom")
+        stats = n.stats()
+        assert stats["dropped"] >= 4
+        assert stats["queued"] + stats["dropped"] == apprise_notifier.QUEUE_MAX + 5
+        release.set()
+        assert n.wait_idle(5)
+        n.close()
+        assert n.stats()["delivered"] == stats["queued"]
+        n.emit("failure", policy_name="p", summary="after close")
+        assert n.stats()["queued"] == stats["queued"]
+
+
+def test_urls_get_socket_timeouts_unless_set() -> None:
+    n = AppriseNotifier(AppriseSettings(urls=["json://example.com", "json://example.com?rto=30"]))
+    servers = list(n._client)  # type: ignore[arg-type]
+    assert servers[0].socket_read_timeout == apprise_notifier.DELIVERY_TIMEOUT_SECONDS
+    assert servers[1].socket_read_timeout == 30
+
+
+def test_close_drops_backlog_instead_of_sending_it() -> None:
+    settings = AppriseSettings(urls=["mailto://x"], on_failure=True)
+    release = threading.Event()
+    with patch("icloudpd_web.integrations.apprise_notifier.apprise.Apprise") as cls:
+        inst = MagicMock()
+        inst.notify.side_effect = lambda **_: release.wait(5)
+        cls.return_value = inst
+        n = AppriseNotifier(settings)
+        for _ in range(apprise_notifier.QUEUE_MAX + 1):
+            n.emit("failure", policy_name="p", summary="boom")
+        started = time.monotonic()
+        n.close(timeout=0.2)  # the queue is full: must not block on it
+        assert time.monotonic() - started < 2
+        release.set()
+        assert n.wait_idle(5)
+        stats = n.stats()
+        # Only the one in flight when close() gave up went out.
+        assert stats["delivered"] == 1
+        assert stats["dropped"] == apprise_notifier.QUEUE_MAX
+        assert inst.notify.call_count == 1
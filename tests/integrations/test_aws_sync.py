@@ -1,10 +1,23 @@
+import asyncio
+import hashlib
+import json
+import os
 import sys
 from pathlib import Path
 
 import pytest
 
-from icloudpd_web.integrations.aws_sync import AwsSync
-from icloudpd_web.store.models import AwsConfig
+from icloudpd_web.integrations.aws_sync import (
+    PIPELINE_QUEUE_MAX,
+    TAIL_LINES,
+    UPLOAD_CONCURRENCY,
+    AwsSync,
+    AwsSyncStatus,
+    sync_log_path,
+    sync_status_path,
+)
+from icloudpd_web.integrations.upload_manifest import UploadManifest
+from icloudpd_web.store.models import AwsConfig, Policy
 
 
 @pytest.mark.asyncio
@@ -80,3 +93,282 @@ async def test_omits_env_vars_when_creds_unset(tmp_path: Path) -> None:
     # assert they weren't injected as empty strings.)
     for line in out.output.strip().splitlines():
         assert line != "''", "AwsSync injected an empty credential env var"
+
+
+_CHATTY = (
+    "import sys\n"
+    "for i in range(200):\n"
+    "    print(f'upload: ./f{i}.jpg to s3://b/x/f{i}.jpg')\n"
+    "    sys.stdout.write(f'Completed {i + 1}.0 KiB/~200.0 KiB (1.0 MiB/s) with {199 - i} file(s)"
+    " remaining\\r')\n"
+    "print('upload failed: ./bad.jpg to s3://b/x/bad.jpg An error occurred')\n"
+    "sys.exit(1)\n"
+)
+
+
+@pytest.mark.asyncio
+async def test_output_streamed_to_log_with_bounded_tail(tmp_path: Path) -> None:
+    s = AwsSync(argv_fn=lambda src, dst: [sys.executable, "-c", _CHATTY])
+    cfg = AwsConfig(enabled=True, bucket="b", prefix="x")
+    status = AwsSyncStatus(run_id="p-1", policy_name="p")
+    log = tmp_path / "p-1.aws"
+    out = await s.run(cfg, source=tmp_path, log_path=log, status=status)
+    assert out.exit_code == 1
+    assert out.uploaded == 200
+    assert out.failed == 1
+    assert len(out.output.splitlines()) == TAIL_LINES
+    assert out.output.splitlines()[-1].startswith("upload failed: ")
+    # Every whole line is in the log; progress redraws are not.
+    lines = log.read_text().splitlines()
+    assert len(lines) == 201
+    assert not any(line.startswith("Completed") for line in lines)
+    assert status.status == "failed"
+    assert status.bytes_done == 200 * 1024
+    assert status.bytes_total == 200 * 1024
+    assert status.files_remaining == 0
+    assert len(status.tail) == TAIL_LINES
+
+
+@pytest.mark.asyncio
+async def test_start_tracks_and_persists_status(tmp_path: Path) -> None:
+    script = "import time; print('upload: ./a.jpg to s3://b/a.jpg', flush=True); time.sleep(0.3)"
+    s = AwsSync(argv_fn=lambda src, dst: [sys.executable, "-c", script])
+    cfg = AwsConfig(enabled=True, bucket="b")
+    run_log = tmp_path / "p-20260101-000000.log"
+    task = s.start(cfg, source=tmp_path, log_path=run_log, policy_name="p")
+    live = s.status(run_log)
+    assert live is not None
+    assert live["status"] == "running"
+    await task
+    done = s.status(run_log)
+    assert done is not None
+    assert done["status"] == "success"
+    assert done["uploaded"] == 1
+    assert sync_status_path(run_log).is_file()
+    assert sync_log_path(run_log).read_text() == "upload: ./a.jpg to s3://b/a.jpg\n"
+    assert s.status(tmp_path / "other.log") is None
+
+
+@pytest.mark.asyncio
+async def test_close_kills_running_sync(tmp_path: Path) -> None:
+    s = AwsSync(argv_fn=lambda src, dst: [sys.executable, "-c", "import time; time.sleep(30)"])
+    run_log = tmp_path / "p-1.log"
+    s.start(AwsConfig(enabled=True, bucket="b"), source=tmp_path, log_path=run_log, policy_name="p")
+    await asyncio.sleep(0.2)
+    await asyncio.wait_for(s.close(), timeout=5)
+    done = s.status(run_log)
+    assert done is not None
+    assert done["status"] == "interrupted"
+
+
+class LocalS3:
+    """Stand-in for S3: objects are files under *root*/<bucket>/<key>."""
+
+    def __init__(self, root: Path, fail: set[str] | None = None) -> None:
+        self.root = root
+        self.fail = fail or set()
+        self.puts: list[str] = []
+
+    async def upload(self, cfg: AwsConfig, path: Path, key: str) -> str | None:
+        if key in self.fail:
+            raise RuntimeError("503 Slow Down")
+        dest = self.root / str(cfg.bucket) / key
+        dest.parent.mkdir(parents=True, exist_ok=True)  # noqa: ASYNC240
+        dest.write_bytes(path.read_bytes())  # noqa: ASYNC240
+        self.puts.append(key)
+        return hashlib.md5(dest.read_bytes()).hexdigest()  # noqa: ASYNC240, S324
+
+
+def _downloaded(tmp_path: Path, names: list[str]) -> tuple[Path, Path]:
+    photos = tmp_path / "photos"
+    for name in names:
+        (photos / name).parent.mkdir(parents=True, exist_ok=True)
+        (photos / name).write_bytes(name.encode())
+    files = tmp_path / "run.files"
+    files.write_text("".join(f"{photos / n}\n" for n in names))
+    return photos, files
+
+
+@pytest.mark.asyncio
+async def test_incremental_uploads_only_listed_files(tmp_path: Path) -> None:
+    photos, files = _downloaded(tmp_path, ["2026/a.jpg", "2026/b.jpg"])
+    (photos / "old.jpg").write_bytes(b"not from this run")
+    s3 = LocalS3(tmp_path / "s3")
+    manifest = UploadManifest(tmp_path / "uploads.sqlite3")
+    s = AwsSync(uploader=s3, manifest=manifest)
+    cfg = AwsConfig(enabled=True, bucket="b", prefix="p", incremental=True)
+    status = AwsSyncStatus(run_id="r", policy_name="p")
+    out = await s.upload_files(cfg, source=photos, files=files, status=status)
+    assert out.exit_code == 0
+    assert sorted(s3.puts) == ["p/2026/a.jpg", "p/2026/b.jpg"]
+    assert status.mode == "incremental"
+    assert status.uploaded == 2
+    assert manifest.etag("b", "p/2026/a.jpg") == hashlib.md5(b"2026/a.jpg").hexdigest()  # noqa: S324
+    # Uploading the same list again finds everything current.
+    again = AwsSyncStatus(run_id="r2", policy_name="p")
+    await s.upload_files(cfg, source=photos, files=files, status=again)
+    assert len(s3.puts) == 2
+    assert again.skipped == 2
+    # A changed file is uploaded again.
+    (photos / "2026/a.jpg").write_bytes(b"edited")
+    os.utime(photos / "2026/a.jpg", (1, 1))
+    await s.upload_files(cfg, source=photos, files=files)
+    assert s3.puts[-1] == "p/2026/a.jpg"
+
+
+@pytest.mark.asyncio
+async def test_incremental_skips_missing_and_counts_failures(tmp_path: Path) -> None:
+    photos, files = _downloaded(tmp_path, ["a.jpg", "b.jpg", "c.jpg"])
+    (photos / "b.jpg").unlink()  # removed by a post-download filter
+    with files.open("a") as f:
+        f.write("/outside/x.jpg\n")
+    s3 = LocalS3(tmp_path / "s3", fail={"c.jpg"})
+    s = AwsSync(uploader=s3)
+    cfg = AwsConfig(enabled=True, bucket="b", incremental=True)
+    log = tmp_path / "r.aws"
+    status = AwsSyncStatus(run_id="r", policy_name="p")
+    out = await s.upload_files(cfg, source=photos, files=files, log_path=log, status=status)
+    assert out.exit_code == 1
+    assert (status.uploaded, status.skipped, status.failed) == (1, 2, 1)
+    assert status.status == "failed"
+    text = log.read_text()
+    assert "(no longer on disk)" in text
+    assert "upload failed: " in text
+    assert "503 Slow Down" in text
+
+
+@pytest.mark.asyncio
+async def test_start_uses_incremental_when_configured(tmp_path: Path) -> None:
+    photos, files = _downloaded(tmp_path, ["a.jpg"])
+    s3 = LocalS3(tmp_path / "s3")
+    s = AwsSync(argv_fn=lambda src, dst: ["false"], uploader=s3)
+    run_log = tmp_path / "p-1.log"
+    cfg = AwsConfig(enabled=True, bucket="b", incremental=True)
+    await s.start(cfg, source=photos, log_path=run_log, policy_name="p", files=files)
+    done = s.status(run_log)
+    assert done is not None
+    assert done["mode"] == "incremental"
+    assert done["status"] == "success"
+    # Without a file list (an on-demand sync) the whole directory is synced.
+    await s.start(cfg, source=photos, log_path=run_log, policy_name="p")
+    done = s.status(run_log)
+    assert done is not None
+    assert done["mode"] == "sync"
+    assert done["status"] == "failed"
+    # A run that downloaded nothing has no list and uploads nothing.
+    empty = AwsSyncStatus(run_id="r", policy_name="p")
+    await s.upload_files(cfg, source=photos, files=tmp_path / "none.files", status=empty)
+    assert empty.status == "success"
+    assert s3.puts == ["a.jpg"]
+
+
+@pytest.mark.asyncio
+async def test_resume_interrupted_incremental_uploads(tmp_path: Path) -> None:
+    photos, _ = _downloaded(tmp_path, ["a.jpg", "b.jpg"])
+    runs = tmp_path / "runs"
+    (runs / "p").mkdir(parents=True)
+    (tmp_path / "run.files").rename(runs / "p" / "p-1.files")
+    cfg = AwsConfig(enabled=True, bucket="b", incremental=True)
+    policy = Policy(name="p", username="u", directory=str(photos), cron="0 * * * *", aws=cfg)
+    saved = {"run_id": "p-1", "policy_name": "p", "status": "running", "mode": "incremental"}
+    (runs / "p" / "p-1.aws.json").write_text(json.dumps(saved))
+    done = {**saved, "run_id": "p-2", "status": "success"}
+    (runs / "p" / "p-2.aws.json").write_text(json.dumps(done))
+    full = {**saved, "run_id": "p-3", "mode": "sync"}
+    (runs / "p" / "p-3.aws.json").write_text(json.dumps(full))
+    (runs / "p" / "p-4.aws.json").write_text("{")
+
+    s3 = LocalS3(tmp_path / "s3")
+    s = AwsSync(uploader=s3)
+    assert s.resume_interrupted(runs, {"p": policy}.get) == ["p-1"]
+    while s.is_live(runs / "p" / "p-1.log"):  # noqa: ASYNC110
+        await asyncio.sleep(0.01)
+    status = s.status(runs / "p" / "p-1.log")
+    assert status is not None
+    assert status["status"] == "success"
+    assert sorted(s3.puts) == ["a.jpg", "b.jpg"]
+    assert s.resume_interrupted(runs, {}.get) == []
+
+
+@pytest.mark.asyncio
+async def test_pipeline_uploads_during_run_then_reconciles(tmp_path: Path) -> None:
+    photos, files = _downloaded(tmp_path, ["a.jpg", "b.jpg", "c.jpg"])
+    s3 = LocalS3(tmp_path / "s3", fail={"b.jpg"})
+    s = AwsSync(uploader=s3)
+    run_log = tmp_path / "p-1.log"
+    cfg = AwsConfig(enabled=True, bucket="b", incremental=True, upload_while_downloading=True)
+    task = s.start_pipeline(cfg, source=photos, log_path=run_log, policy_name="p")
+    await s.feed(run_log, photos / "a.jpg")
+    await s.feed(run_log, photos / "b.jpg")  # fails for now
+    while len(s3.puts) < 1:  # noqa: ASYNC110
+        await asyncio.sleep(0.01)
+    assert s.status(run_log)["mode"] == "pipelined"  # type: ignore[index]
+    # c.jpg was never fed; the failed b.jpg gets another try.
+    s3.fail.clear()
+    assert s.finish_pipeline(run_log, files)
+    assert not s.finish_pipeline(run_log, files)
+    await task
+    assert sorted(s3.puts) == ["a.jpg", "b.jpg", "c.jpg"]
+    done = s.status(run_log)
+    assert done is not None
+    assert (done["status"], done["uploaded"], done["failed"]) == ("success", 3, 0)
+    # Files fed after the run ended, or for runs without a pipeline, are ignored.
+    await s.feed(run_log, photos / "a.jpg")
+    assert len(s3.puts) == 3
+
+
+class BlockingS3(LocalS3):
+    def __init__(self, root: Path) -> None:
+        super().__init__(root)
+        self.release = asyncio.Event()
+
+    async def upload(self, cfg: AwsConfig, path: Path, key: str) -> str | None:
+        await self.release.wait()
+        return await super().upload(cfg, path, key)
+
+
+@pytest.mark.asyncio
+async def test_pipeline_feed_blocks_when_uploads_fall_behind(tmp_path: Path) -> None:
+    names = [f"{i}.jpg" for i in range(UPLOAD_CONCURRENCY + PIPELINE_QUEUE_MAX + 1)]
+    photos, files = _downloaded(tmp_path, names)
+    s3 = BlockingS3(tmp_path / "s3")
+    s = AwsSync(uploader=s3)
+    run_log = tmp_path / "p-1.log"
+    cfg = AwsConfig(enabled=True, bucket="b", incremental=True, upload_while_downloading=True)
+    task = s.start_pipeline(cfg, source=photos, log_path=run_log, policy_name="p")
+    for name in names[:-1]:
+        await asyncio.wait_for(s.feed(run_log, photos / name), timeout=1)
+        await asyncio.sleep(0)  # let a worker take it
+    last = asyncio.ensure_future(s.feed(run_log, photos / names[-1]))
+    await asyncio.sleep(0.05)
+    assert not last.done()
+    s3.release.set()
+    await asyncio.wait_for(last, timeout=5)
+    s.finish_pipeline(run_log, files)
+    await task
+    assert len(s3.puts) == len(names)
+
+
+@pytest.mark.asyncio
+async def test_close_releases_blocked_feed(tmp_path: Path) -> None:
+    photos, _ = _downloaded(tmp_path, ["a.jpg"])
+    s = AwsSync(uploader=BlockingS3(tmp_path / "s3"))
+    run_log = tmp_path / "p-1.log"
+    cfg = AwsConfig(enabled=True, bucket="b", incremental=True, upload_while_downloading=True)
+    s.start_pipeline(cfg, source=photos, log_path=run_log, policy_name="p")
+    feeds = [
+        asyncio.ensure_future(s.feed(run_log, photos / "a.jpg"))
+        for _ in range(UPLOAD_CONCURRENCY + PIPELINE_QUEUE_MAX + 2)
+    ]
+    await asyncio.sleep(0.05)
+    assert not all(f.done() for f in feeds)
+    await asyncio.wait_for(s.close(), timeout=5)
+    await asyncio.wait_for(asyncio.gather(*feeds), timeout=1)
+    done = s.status(run_log)
+    assert done is not None
+    assert done["status"] == "interrupted"
+
+
+def test_upload_while_downloading_requires_incremental() -> None:
+    with pytest.raises(ValueError, match="requires aws.incremental"):
+        AwsConfig(enabled=True, bucket="b", upload_while_downloading=True)
@@ -0,0 +1,208 @@
+import json
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from icloudpd_web.integrations.s3_upload import (
+    MIB,
+    CliUploader,
+    UploadError,
+    aws_env,
+    object_key,
+)
+from icloudpd_web.store.models import AwsConfig
+
+
+FAKE_AWS = [
+    sys.executable,
+    str(Path(__file__).resolve().parent.parent / "fixtures" / "fake_aws.py"),
+]
+
+
+@pytest.fixture
+def s3(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    root = tmp_path / "s3"
+    monkeypatch.setenv("FAKE_S3_DIR", str(root))
+    return root
+
+
+def _calls(s3: Path, command: str) -> list[str]:
+    return [c for c in (s3 / ".calls").read_text().splitlines() if c.startswith(command + " ")]
+
+
+def _big_file(path: Path, size: int) -> bytes:
+    data = bytes(i % 251 for i in range(size))
+    path.write_bytes(data)
+    return data
+
+
+def test_object_key(tmp_path: Path) -> None:
+    root = tmp_path.resolve()
+    assert object_key("", root, tmp_path / "2026" / "a.jpg") == "2026/a.jpg"
+    assert object_key("/photos/", root, tmp_path / "a.jpg") == "photos/a.jpg"
+    assert object_key("photos", root, Path("/elsewhere/a.jpg")) is None
+
+
+def test_aws_env_sets_endpoint() -> None:
+    env = aws_env(AwsConfig(enabled=True, bucket="b", endpoint_url="http://localhost:9000"))
+    assert env["AWS_ENDPOINT_URL"] == "http://localhost:9000"
+
+
+@pytest.mark.asyncio
+async def test_small_file_is_one_put(tmp_path: Path, s3: Path) -> None:
+    f = tmp_path / "a.jpg"
+    f.write_bytes(b"x")
+    up = CliUploader(aws=FAKE_AWS)
+    etag = await up.upload(AwsConfig(enabled=True, bucket="b"), f, "k/a.jpg")
+    assert etag == "9dd4e461268c8034f5c8564e155c67a6"
+    assert (s3 / "b" / "k" / "a.jpg").read_bytes() == b"x"
+    assert _calls(s3, "put-object") == ["put-object k/a.jpg"]
+
+
+@pytest.mark.asyncio
+async def test_put_failure_raises(tmp_path: Path) -> None:
+    script = "import sys; print('An error occurred (AccessDenied)', file=sys.stderr); sys.exit(255)"
+    up = CliUploader(aws=[sys.executable, "-c", script])
+    f = tmp_path / "a.jpg"
+    f.write_bytes(b"x")
+    with pytest.raises(UploadError, match="AccessDenied"):
+        await up.upload(AwsConfig(enabled=True, bucket="b"), f, "a.jpg")
+
+
+@pytest.mark.asyncio
+async def test_large_file_goes_up_in_parts(tmp_path: Path, s3: Path) -> None:
+    f = tmp_path / "clip.mov"
+    data = _big_file(f, 12 * MIB + 123)
+    up = CliUploader(tmp_path / "multipart", aws=FAKE_AWS)
+    cfg = AwsConfig(enabled=True, bucket="b", part_size_mb=5, parallel_parts=2)
+    assert await up.upload(cfg, f, "clip.mov") == "multipart-3"
+    assert (s3 / "b" / "clip.mov").read_bytes() == data
+    assert sorted(_calls(s3, "upload-part")) == [f"upload-part clip.mov {n}" for n in (1, 2, 3)]
+    # Finished uploads leave no state or part bodies behind.
+    assert list((tmp_path / "multipart").iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_failed_multipart_resumes_at_missing_parts(
+    tmp_path: Path, s3: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    f = tmp_path / "clip.mov"
+    data = _big_file(f, 16 * MIB)
+    cfg = AwsConfig(enabled=True, bucket="b", part_size_mb=5, parallel_parts=4)
+    monkeypatch.setenv("FAKE_S3_FAIL_PARTS", "2")
+    with pytest.raises(UploadError, match="RequestTimeout"):
+        await CliUploader(tmp_path / "multipart", aws=FAKE_AWS).upload(cfg, f, "clip.mov")
+    (state_file,) = (tmp_path / "multipart").glob("*.json")
+    assert sorted(json.loads(state_file.read_text())["parts"]) == ["1", "3", "4"]
+
+    # A new uploader (as after a restart) sends only the part that failed.
+    monkeypatch.delenv("FAKE_S3_FAIL_PARTS")
+    (s3 / ".calls").unlink()
+    assert await CliUploader(tmp_path / "multipart", aws=FAKE_AWS).upload(cfg, f, "clip.mov")
+    assert _calls(s3, "upload-part") == ["upload-part clip.mov 2"]
+    assert _calls(s3, "create-multipart-upload") == []
+    assert (s3 / "b" / "clip.mov").read_bytes() == data
+    assert not state_file.exists()
+
+
+@pytest.mark.asyncio
+async def test_changed_file_starts_a_new_multipart_upload(
+    tmp_path: Path, s3: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    f = tmp_path / "clip.mov"
+    _big_file(f, 11 * MIB)
+    cfg = AwsConfig(enabled=True, bucket="b", part_size_mb=5)
+    monkeypatch.setenv("FAKE_S3_FAIL_PARTS", "3")
+    up = CliUploader(tmp_path / "multipart", aws=FAKE_AWS)
+    with pytest.raises(UploadError):
+        await up.upload(cfg, f, "clip.mov")
+    monkeypatch.delenv("FAKE_S3_FAIL_PARTS")
+    data = _big_file(f, 11 * MIB + 1)
+    (s3 / ".calls").unlink()
+    await up.upload(cfg, f, "clip.mov")
+    assert len(_calls(s3, "create-multipart-upload")) == 1
+    assert len(_calls(s3, "upload-part")) == 3
+    assert (s3 / "b" / "clip.mov").read_bytes() == data
+
+
+@pytest.mark.asyncio
+async def test_expired_upload_is_forgotten(tmp_path: Path, s3: Path) -> None:
+    f = tmp_path / "clip.mov"
+    data = _big_file(f, 6 * MIB)
+    cfg = AwsConfig(enabled=True, bucket="b", part_size_mb=5)
+    state_dir = tmp_path / "multipart"
+    up = CliUploader(state_dir, aws=FAKE_AWS)
+    st = f.stat()
+    stale = {
+        "bucket": "b",
+        "key": "clip.mov",
+        "upload_id": "gone",
+        "size": st.st_size,
+        "mtime": st.st_mtime,
+        "part_size": 5 * MIB,
+        "parts": {"1": "a", "2": "b"},
+    }
+    path = up._state_path("b", "clip.mov")
+    assert path is not None
+    path.write_text(json.dumps(stale))
+    with pytest.raises(UploadError, match="NoSuchUpload"):
+        await up.upload(cfg, f, "clip.mov")
+    assert not path.exists()
+    path.write_text("not json")  # unreadable state is dropped, not fatal
+    await up.upload(cfg, f, "clip.mov")
+    assert (s3 / "b" / "clip.mov").read_bytes() == data
+
+
+def test_stale_part_bodies_are_removed_on_start(tmp_path: Path) -> None:
+    state_dir = tmp_path / "multipart"
+    state_dir.mkdir()
+    (state_dir / "part-abc123").write_bytes(b"x" * 100)
+    (state_dir / "0123abcd.tmp").write_text("{")
+    (state_dir / "0123abcd.json").write_text("{}")
+    CliUploader(state_dir, aws=FAKE_AWS)
+    assert [p.name for p in state_dir.iterdir()] == ["0123abcd.json"]
+
+
+@pytest.mark.asyncio
+async def test_parts_on_disk_are_capped(
+    tmp_path: Path, s3: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    f = tmp_path / "clip.mov"
+    data = _big_file(f, 16 * MIB)
+    state_dir = tmp_path / "multipart"
+    up = CliUploader(state_dir, aws=FAKE_AWS, max_parts_on_disk=1)
+    staged: list[int] = []
+    s3api = up._s3api  # noqa: SLF001
+
+    async def counting(cfg: AwsConfig, *args: str) -> dict:
+        if args[0] == "upload-part":
+            staged.append(len(list(state_dir.glob("part-*"))))
+        return await s3api(cfg, *args)
+
+    monkeypatch.setattr(up, "_s3api", counting)
+    cfg = AwsConfig(enabled=True, bucket="b", part_size_mb=5, parallel_parts=4)
+    assert await up.upload(cfg, f, "clip.mov")
+    assert staged == [1, 1, 1, 1]
+    assert (s3 / "b" / "clip.mov").read_bytes() == data
+
+
+@pytest.mark.asyncio
+async def test_part_is_not_cut_onto_a_full_disk(
+    tmp_path: Path, s3: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    f = tmp_path / "clip.mov"
+    _big_file(f, 6 * MIB)
+    state_dir = tmp_path / "multipart"
+    up = CliUploader(state_dir, aws=FAKE_AWS)
+    monkeypatch.setattr(
+        "icloudpd_web.integrations.s3_upload.shutil.disk_usage",
+        lambda _: SimpleNamespace(free=10 * MIB),
+    )
+    cfg = AwsConfig(enabled=True, bucket="b", part_size_mb=5)
+    with pytest.raises(UploadError, match="not enough free space"):
+        await up.upload(cfg, f, "clip.mov")
+    assert list(state_dir.glob("part-*")) == []
+    # The upload's state is kept for a retry.
+    assert len(list(state_dir.glob("*.json"))) == 1
@@ -0,0 +1,133 @@
+"""Tests for the on-disk run event journal."""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from pathlib import Path
+from typing import IO
+
+import pytest
+
+from icloudpd_web.runner import event_log
+from icloudpd_web.runner.event_log import (
+    EventLogWriter,
+    RunEvent,
+    journal_path,
+    last_seq,
+    replay_events,
+    replay_events_async,
+)
+from icloudpd_web.runner.log_storage import compress_log
+from icloudpd_web.runner.run import Run
+
+
+def _write_run(tmp_path: Path) -> Path:
+    log_path = tmp_path / "p-1.log"
+    lines = ["first", "second", "third ünïcode"]
+    blob = b"".join(line.encode() + b"\n" for line in lines)
+    log_path.write_bytes(blob)
+    w = EventLogWriter(log_path)
+    ends = [len(b"".join(x.encode() + b"\n" for x in lines[: i + 1])) for i in range(3)]
+    w.append(RunEvent(1, "log", 1.0, {"line": "first"}), span=(0, ends[0]))
+    w.append(RunEvent(2, "progress", 2.0, {"downloaded": 1, "total": 2}))
+    w.append(RunEvent(3, "log_batch", 3.0, {"lines": lines[1:]}), span=(ends[0], ends[2]))
+    w.append(RunEvent(4, "status", 4.0, {"status": "success"}))
+    w.close()
+    return log_path
+
+
+def test_replay_materializes_log_spans(tmp_path: Path) -> None:
+    log_path = _write_run(tmp_path)
+    events = list(replay_events(log_path))
+    assert [e.seq for e in events] == [1, 2, 3, 4]
+    assert events[0].data == {"line": "first"}
+    assert events[1].data == {"downloaded": 1, "total": 2}
+    assert events[2].data == {"lines": ["second", "third ünïcode"]}
+    assert last_seq(log_path) == 4
+
+
+def test_replay_reads_spans_from_compressed_log(tmp_path: Path) -> None:
+    log_path = _write_run(tmp_path)
+    compress_log(log_path)
+    events = list(replay_events(log_path, since=2))
+    assert events[0].data == {"lines": ["second", "third ünïcode"]}
+
+
+def test_replay_seeks_to_range(tmp_path: Path) -> None:
+    log_path = _write_run(tmp_path)
+    assert [e.seq for e in replay_events(log_path, since=1, until=3)] == [2, 3]
+    assert list(replay_events(log_path, since=4)) == []
+
+
+def test_replay_stops_at_torn_write(tmp_path: Path) -> None:
+    log_path = _write_run(tmp_path)
+    with open(journal_path(log_path), "ab") as f:
+        f.write(b'{"seq":5,"ki')
+    with open(log_path.with_suffix(".events.idx"), "ab") as f:
+        f.write((journal_path(log_path).stat().st_size - 12).to_bytes(8, "little"))
+    assert [e.seq for e in replay_events(log_path, since=2)] == [3, 4]
+
+
+async def test_async_replay_reads_in_worker_threads(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    log_path = _write_run(tmp_path)
+    monkeypatch.setattr("icloudpd_web.runner.event_log.REPLAY_CHUNK", 3)
+    readers: set[threading.Thread] = set()
+    materialize = event_log._materialize  # noqa: SLF001
+
+    def spy(record: dict, log: IO[bytes]) -> RunEvent:
+        readers.add(threading.current_thread())
+        return materialize(record, log)
+
+    monkeypatch.setattr(event_log, "_materialize", spy)
+    events = [ev async for ev in replay_events_async(log_path, since=1)]
+    assert [e.seq for e in events] == [2, 3, 4]
+    assert readers
+    assert threading.main_thread() not in readers
+
+
+def test_writer_ignores_appends_after_close(tmp_path: Path) -> None:
+    log_path = _write_run(tmp_path)
+    w = EventLogWriter(tmp_path / "p-2.log")
+    w.close()
+    w.append(RunEvent(1, "progress", 1.0, {}))
+    w.flush()
+    assert last_seq(log_path) == 4
+
+
+@pytest.mark.asyncio
+async def test_resume_older_than_ring_buffer_replays_from_disk(
+    tmp_path: Path, fake_icloudpd_cmd: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "success")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "30")
+    monkeypatch.setenv("FAKE_ICLOUDPD_SLEEP", "0")
+    monkeypatch.setattr(Run, "BUFFER_CAP", 5)
+
+    run = Run(
+        run_id="p-disk",
+        policy_name="p",
+        argv=[
+            *fake_icloudpd_cmd,
+            "--username",
+            "u@icloud.com",
+            "--directory",
+            str(tmp_path),
+            "--password-provider",
+            "console",
+        ],
+        log_dir=tmp_path,
+        password="pw",
+    )
+    await run.start()
+    await asyncio.wait_for(run.wait(), timeout=10)
+
+    events = [ev async for ev in run.subscribe(since=3)]
+    seqs = [e.seq for e in events]
+    assert seqs == list(range(4, seqs[-1] + 1))
+    assert seqs[-1] > 5 + 3  # reached past what the ring buffer still holds
+    assert events[-1].kind == "status"
+    lines = [e.data["line"] for e in events if e.kind == "log"]
+    assert any("Downloading 2 of 30" in line for line in lines)
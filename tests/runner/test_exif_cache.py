@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import itertools
+import os
+from collections.abc import Iterator
+from pathlib import Path
+from types import SimpleNamespace
+from unittest.mock import Mock, patch
+
+import pytest
+from PIL import Image
+
+from icloudpd_web.runner import exif_cache
+from icloudpd_web.runner.exif_cache import ExifCache, close_shared, shared_cache
+from icloudpd_web.runner.exif_header import TAG_MAKE, TAG_MODEL, ImageMetadata, read_metadata
+from icloudpd_web.runner.filter_pool import apply_filters
+from icloudpd_web.runner.post_filter import compile_filters
+from icloudpd_web.store.models import Filters
+
+
+META = ImageMetadata("Apple", "iPhone 15", "2026:10:17 09:30:00", 4032, 3024)
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> Iterator[ExifCache]:
+    c = ExifCache(tmp_path / "exif.sqlite3")
+    yield c
+    c.close()
+
+
+@pytest.fixture
+def ticking_clock(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Distinct, increasing used_at stamps, so LRU order is deterministic."""
+    ticks = itertools.count(1)
+    monkeypatch.setattr(exif_cache, "time", SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def _file(tmp_path: Path, name: str, data: bytes = b"x") -> Path:
+    path = tmp_path / name
+    path.write_bytes(data)
+    return path
+
+
+def test_lookup_reads_once_then_hits(tmp_path: Path, cache: ExifCache) -> None:
+    path = _file(tmp_path, "a.jpg")
+    read = Mock(return_value=META)
+    assert cache.lookup(path, read) == META
+    assert cache.lookup(path, read) == META
+    read.assert_called_once_with(path)
+    assert cache.get(path) == META
+
+
+def test_changed_file_is_read_again(tmp_path: Path, cache: ExifCache) -> None:
+    path = _file(tmp_path, "a.jpg")
+    cache.lookup(path, Mock(return_value=META))
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+    assert cache.get(path) is None
+    other = ImageMetadata(make="Canon")
+    assert cache.lookup(path, Mock(return_value=other)) == other
+    path.write_bytes(b"longer")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1))  # same mtime, new size
+    assert cache.get(path) is None
+
+
+def test_missing_file_is_read_not_cached(tmp_path: Path, cache: ExifCache) -> None:
+    path = tmp_path / "gone.jpg"
+    read = Mock(return_value=ImageMetadata())
+    assert cache.lookup(path, read) == ImageMetadata()
+    assert cache.get(path) is None
+    assert len(cache) == 0
+
+
+def test_persists_across_opens(tmp_path: Path) -> None:
+    path = _file(tmp_path, "a.jpg")
+    first = ExifCache(tmp_path / "exif.sqlite3")
+    first.lookup(path, Mock(return_value=META))
+    first.close()
+    second = ExifCache(tmp_path / "exif.sqlite3")
+    try:
+        assert second.get(path) == META
+    finally:
+        second.close()
+
+
+@pytest.mark.usefixtures("ticking_clock")
+def test_least_recently_used_rows_are_pruned(tmp_path: Path) -> None:
+    cache = ExifCache(tmp_path / "exif.sqlite3", max_entries=10, touch_interval=0)
+    try:
+        paths = [_file(tmp_path, f"{i}.jpg") for i in range(11)]
+        for p in paths[:10]:
+            cache.lookup(p, Mock(return_value=META))
+        cache.get(paths[0])  # recently used again: survives
+        cache.lookup(paths[10], Mock(return_value=META))  # 11 > 10: prune to 9
+        assert len(cache) == 9
+        kept = {p.name for p in paths if cache.get(p) is not None}
+        assert kept == {"0.jpg", "10.jpg"} | {f"{i}.jpg" for i in range(3, 10)}
+    finally:
+        cache.close()
+
+
+@pytest.mark.usefixtures("ticking_clock")
+def test_hits_touch_stale_rows_on_flush(tmp_path: Path) -> None:
+    cache = ExifCache(tmp_path / "exif.sqlite3", touch_interval=5)
+    fresh, stale = _file(tmp_path, "fresh.jpg"), _file(tmp_path, "stale.jpg")
+    try:
+        cache.lookup(stale, Mock(return_value=META))  # used_at 1
+        for _ in range(5):
+            cache.lookup(fresh, Mock(return_value=META))  # used_at 2, then hits at 3-6
+        assert cache.get(stale) == META  # at 7: 7 - 1 >= 5, stale
+
+        def used_at() -> dict[str, float]:
+            rows = cache._conn.execute("SELECT path, used_at FROM exif")  # noqa: SLF001
+            return {Path(p).name: t for p, t in rows}
+
+        assert used_at() == {"stale.jpg": 1.0, "fresh.jpg": 2.0}
+        cache.flush()
+        assert used_at() == {"stale.jpg": 7.0, "fresh.jpg": 2.0}
+    finally:
+        cache.close()
+
+
+def test_discard(tmp_path: Path, cache: ExifCache) -> None:
+    path = _file(tmp_path, "a.jpg")
+    cache.lookup(path, Mock(return_value=META))
+    cache.discard(path)
+    assert cache.get(path) is None
+
+
+@pytest.fixture
+def shared() -> Iterator[None]:
+    yield
+    close_shared()
+
+
+@pytest.mark.usefixtures("shared")
+def test_filtering_again_reads_only_the_cache(tmp_path: Path) -> None:
+    apple, samsung = tmp_path / "apple.jpg", tmp_path / "samsung.jpg"
+    for path, make in ((apple, "Apple"), (samsung, "samsung")):
+        exif = Image.Exif()
+        exif[TAG_MAKE] = make
+        exif[TAG_MODEL] = "phone"
+        Image.new("RGB", (8, 8)).save(path, "JPEG", exif=exif)
+    db = tmp_path / "exif.sqlite3"
+    plan = compile_filters(Filters(device_makes=["apple"]))
+    with patch("icloudpd_web.runner.post_filter.read_metadata", wraps=read_metadata) as read:
+        first = apply_filters([apple, samsung], plan, db)
+        again = apply_filters([apple], plan, db)
+    assert [o.kept for o in first] == [True, False]
+    assert again[0].kept
+    assert [c.args[0] for c in read.call_args_list] == [apple, samsung]
+    # The deleted file's row went with it.
+    cache = shared_cache(db)
+    assert cache.get(apple) is not None
+    assert len(cache) == 1
+    # Filters that don't read EXIF don't open the cache.
+    close_shared()
+    apply_filters([apple], compile_filters(Filters(file_suffixes=[".jpg"])), tmp_path / "no.db")
+    assert not (tmp_path / "no.db").exists()
@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import struct
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from PIL import Image
+
+from icloudpd_web.runner.exif_header import (
+    MAX_IFD_ENTRIES,
+    MAX_META_BYTES,
+    MAX_SEGMENTS,
+    TAG_DATETIME,
+    TAG_DATETIME_ORIGINAL,
+    TAG_EXIF_IFD,
+    TAG_MAKE,
+    TAG_MODEL,
+    ImageMetadata,
+    read_metadata,
+)
+from icloudpd_web.runner.post_filter import _pillow_metadata, _read_exif_make_model
+
+
+def _pillow_image(
+    path: Path,
+    fmt: str,
+    make: str | None,
+    model: str | None,
+    *,
+    taken: str | None = None,
+    size: tuple[int, int] = (8, 8),
+) -> None:
+    exif = Image.Exif()
+    if make is not None:
+        exif[TAG_MAKE] = make
+    if model is not None:
+        exif[TAG_MODEL] = model
+    if taken is not None:
+        exif[TAG_DATETIME] = "2000:01:01 00:00:00"
+        exif.get_ifd(TAG_EXIF_IFD)[TAG_DATETIME_ORIGINAL] = taken
+    Image.new("RGB", size, "red").save(path, fmt, exif=exif)
+
+
+def _tiff(make: bytes, model: bytes, *, order: str = ">") -> bytes:
+    """A bare TIFF header with Make/Model in IFD0 (null-terminated)."""
+    mark = b"MM" if order == ">" else b"II"
+    entries = []
+    data = b""
+    data_at = 8 + 2 + 2 * 12 + 4
+    for tag, value in ((TAG_MAKE, make + b"\0"), (TAG_MODEL, model + b"\0")):
+        if len(value) <= 4:
+            entries.append(struct.pack(order + "HHI4s", tag, 2, len(value), value))
+        else:
+            entries.append(struct.pack(order + "HHII", tag, 2, len(value), data_at + len(data)))
+            data += value
+    return (
+        mark
+        + struct.pack(order + "HI", 42, 8)
+        + struct.pack(order + "H", len(entries))
+        + b"".join(entries)
+        + b"\0\0\0\0"
+        + data
+    )
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I4s", 8 + len(payload), kind) + payload
+
+
+def _full_box(kind: bytes, version: int, payload: bytes) -> bytes:
+    return _box(kind, bytes([version, 0, 0, 0]) + payload)
+
+
+def _heic(tiff: bytes, *, iloc_version: int = 0, infe_version: int = 2) -> bytes:
+    """ftyp + meta(hdlr, iinf, iloc) + mdat, with item 2 the Exif item."""
+    exif_item = struct.pack(">I", 6) + b"Exif\0\0" + tiff
+    # Item ids are 32-bit from infe v3 and iloc v2 on.
+    infe_id = ">I" if infe_version >= 3 else ">H"
+    iloc_id = ">I" if iloc_version >= 2 else ">H"
+    infe = b"".join(
+        _full_box(b"infe", infe_version, struct.pack(infe_id + "H4s", item_id, 0, kind) + b"\0")
+        for item_id, kind in ((1, b"hvc1"), (2, b"Exif"))
+    )
+    iinf = _full_box(b"iinf", 0, struct.pack(">H", 2) + infe)
+    ftyp = _box(b"ftyp", b"heic\0\0\0\0mif1heic")
+
+    def build(offset: int) -> bytes:
+        method = struct.pack(">H", 0) if iloc_version else b""
+        items = b"".join(
+            struct.pack(iloc_id, item_id) + method + struct.pack(">HHII", 0, 1, at, length)
+            for item_id, at, length in ((1, offset, 4), (2, offset + 4, len(exif_item)))
+        )
+        iloc = _full_box(
+            b"iloc", iloc_version, bytes([0x44, 0x00]) + struct.pack(iloc_id, 2) + items
+        )
+        hdlr = _full_box(b"hdlr", 0, b"\0\0\0\0pict" + b"\0" * 13)
+        return ftyp + _full_box(b"meta", 0, hdlr + iinf + iloc)
+
+    head = build(0)
+    # mdat payload starts after its 8-byte header; sizes don't change.
+    mdat_payload = b"\0\0\0\0" + exif_item
+    return build(len(head) + 8) + _box(b"mdat", mdat_payload)
+
+
+@pytest.mark.parametrize(
+    ("fmt", "suffix", "taken"),
+    [
+        ("JPEG", ".jpg", "2026:10:17 09:30:00"),
+        # Pillow's TIFF writer drops the Exif IFD; IFD0's DateTime is next best.
+        ("TIFF", ".tif", "2000:01:01 00:00:00"),
+    ],
+)
+def test_matches_pillow(tmp_path: Path, fmt: str, suffix: str, taken: str) -> None:
+    path = tmp_path / f"img{suffix}"
+    _pillow_image(path, fmt, "Apple", "iPhone 15 Pro", taken="2026:10:17 09:30:00", size=(40, 30))
+    assert read_metadata(path) == ImageMetadata("Apple", "iPhone 15 Pro", taken, 40, 30)
+    assert read_metadata(path) == _pillow_metadata(path)
+
+
+def test_jpeg_missing_tag(tmp_path: Path) -> None:
+    path = tmp_path / "img.jpg"
+    _pillow_image(path, "JPEG", "Canon", None)
+    assert read_metadata(path) == ImageMetadata(make="Canon", width=8, height=8)
+
+
+def test_jpeg_without_exif(tmp_path: Path) -> None:
+    path = tmp_path / "img.jpg"
+    Image.new("RGB", (8, 8)).save(path, "JPEG")
+    assert read_metadata(path) == ImageMetadata(width=8, height=8)
+
+
+@pytest.mark.parametrize("order", [">", "<"])
+def test_tiff_byte_orders_and_inline_values(tmp_path: Path, order: str) -> None:
+    path = tmp_path / "raw.dng"
+    path.write_bytes(_tiff(b"SONY", b"ILCE-7M4", order=order))
+    # "SONY\0" is 5 bytes (stored at an offset); "Leo" fits in the entry.
+    assert read_metadata(path) == ImageMetadata("SONY", "ILCE-7M4")
+    path.write_bytes(_tiff(b"Leo", b"M11", order=order))
+    assert read_metadata(path) == ImageMetadata("Leo", "M11")
+
+
+@pytest.mark.parametrize(("iloc_version", "infe_version"), [(0, 2), (1, 2), (2, 3)])
+def test_heic_exif_item(tmp_path: Path, iloc_version: int, infe_version: int) -> None:
+    path = tmp_path / "img.heic"
+    tiff = _tiff(b"Apple", b"iPhone 13 mini")
+    path.write_bytes(_heic(tiff, iloc_version=iloc_version, infe_version=infe_version))
+    assert read_metadata(path) == ImageMetadata("Apple", "iPhone 13 mini")
+
+
+def test_heic_without_exif_item(tmp_path: Path) -> None:
+    path = tmp_path / "img.heic"
+    ftyp = _box(b"ftyp", b"heic\0\0\0\0mif1heic")
+    path.write_bytes(ftyp + _full_box(b"meta", 0, _full_box(b"hdlr", 0, b"\0" * 21)))
+    assert read_metadata(path) == ImageMetadata()
+
+
+def test_unknown_and_damaged_files(tmp_path: Path) -> None:
+    png = tmp_path / "img.png"
+    Image.new("RGB", (8, 8)).save(png, "PNG")
+    assert read_metadata(png) is None
+    truncated = tmp_path / "cut.dng"
+    truncated.write_bytes(_tiff(b"Nikon", b"Z 8")[:20])
+    assert read_metadata(truncated) is None
+    assert read_metadata(tmp_path / "missing.jpg") is None
+
+
+def test_post_filter_falls_back_to_pillow(tmp_path: Path) -> None:
+    path = tmp_path / "img.jpg"
+    _pillow_image(path, "JPEG", " Apple ", "iPhone")
+    assert _read_exif_make_model(path) == ("Apple", "iPhone")
+    with (
+        patch("icloudpd_web.runner.post_filter.read_metadata", return_value=None),
+        patch("icloudpd_web.runner.post_filter._pillow_metadata", wraps=_pillow_metadata) as pillow,
+    ):
+        assert _read_exif_make_model(path) == ("Apple", "iPhone")
+    pillow.assert_called_once_with(path)
+
+
+def _segment(kind: int, payload: bytes) -> bytes:
+    return bytes([0xFF, kind]) + struct.pack(">H", 2 + len(payload)) + payload
+
+
+def _jpeg(*segments: bytes) -> bytes:
+    return b"\xff\xd8" + b"".join(segments)
+
+
+_SOS = b"\xff\xda\x00\x02"
+
+
+def _app1(tiff: bytes) -> bytes:
+    return _segment(0xE1, b"Exif\0\0" + tiff)
+
+
+@pytest.mark.parametrize("stop", [_SOS, b"\xff\xd9"])
+def test_jpeg_fill_bytes_and_stop_markers(tmp_path: Path, stop: bytes) -> None:
+    path = tmp_path / "img.jpg"
+    # Fill bytes before a marker are skipped; the walk ends at the scan (or
+    # image end) without a frame size, and never reads past it.
+    path.write_bytes(_jpeg(b"\xff", _app1(_tiff(b"Apple", b"iPhone")), stop, b"\xff\xc0garbage"))
+    assert read_metadata(path) == ImageMetadata("Apple", "iPhone")
+
+
+def _ifd_overflow() -> bytes:
+    return b"MM" + struct.pack(">HIH", 42, 8, MAX_IFD_ENTRIES + 1) + b"\0" * 12
+
+
+_FTYP = _box(b"ftyp", b"heic\0\0\0\0mif1heic")
+
+
+def _meta_too_large(*, largesize: bool = False) -> bytes:
+    # Only the header is there: the size alone must be refused.
+    if largesize:
+        header = struct.pack(">I4sQ", 1, b"meta", MAX_META_BYTES + 1)
+    else:
+        header = struct.pack(">I4s", MAX_META_BYTES + 1, b"meta")
+    return _FTYP + header + b"\0" * 64
+
+
+def _meta_with_child(header: bytes) -> bytes:
+    return _FTYP + _full_box(b"meta", 0, header + b"\0" * 8)
+
+
+def _heic_patched(old: bytes, new: bytes) -> bytes:
+    data = _heic(_tiff(b"Apple", b"iPhone"))
+    assert data.count(old) == 1
+    return data.replace(old, new)
+
+
+_MALFORMED = [
+    ("bad-marker.jpg", _jpeg(b"\x00\xe1\x00\x08")),
+    ("bad-magic.jpg", _jpeg(_app1(b"MM\x00\x2b\x00\x00\x00\x08"), _SOS)),
+    ("bad-order.jpg", _jpeg(_app1(b"XX\x00\x2a\x00\x00\x00\x08"), _SOS)),
+    ("ifd-overflow.dng", _ifd_overflow()),
+    ("meta-too-large.heic", _meta_too_large()),
+    ("meta-too-large-64.heic", _meta_too_large(largesize=True)),
+    ("bad-box-size.heic", _meta_with_child(struct.pack(">I4s", 1000, b"iinf"))),
+    ("bad-box-size-64.heic", _meta_with_child(struct.pack(">I4sQ", 1, b"iinf", 1000))),
+    # iloc field sizes other than 0, 4 and 8
+    ("bad-iloc.heic", _heic_patched(b"iloc\0\0\0\0\x44", b"iloc\0\0\0\0\x22")),
+    # Exif item whose TIFF offset points past its end
+    ("bad-exif-item.heic", _heic_patched(b"\0\0\0\x06Exif", b"\0\0\xff\xffExif")),
+]
+
+
+@pytest.mark.parametrize(("name", "data"), _MALFORMED, ids=[name for name, _ in _MALFORMED])
+def test_malformed_headers_are_refused(tmp_path: Path, name: str, data: bytes) -> None:
+    path = tmp_path / name
+    path.write_bytes(data)
+    assert read_metadata(path) is None
+
+
+def test_walks_stop_at_their_bounds(tmp_path: Path) -> None:
+    path = tmp_path / "many.jpg"
+    # More segments than MAX_SEGMENTS before the frame: give up, no size.
+    app0 = _segment(0xE0, b"JFIF\0")
+    frame = _segment(0xC0, b"\x08\x00\x08\x00\x10\x03")
+    path.write_bytes(_jpeg(*[app0] * MAX_SEGMENTS, frame))
+    assert read_metadata(path) == ImageMetadata()
+    path.write_bytes(_jpeg(*[app0] * (MAX_SEGMENTS - 1), frame))
+    assert read_metadata(path) == ImageMetadata(width=16, height=8)
+
+    heic = tmp_path / "img.heic"
+    # No meta box before the end of the file, or a box too short to be one.
+    heic.write_bytes(_FTYP)
+    assert read_metadata(heic) == ImageMetadata()
+    heic.write_bytes(_FTYP + struct.pack(">I4s", 4, b"free") + b"\0" * 16)
+    assert read_metadata(heic) == ImageMetadata()
+    # A size-0 box runs to the end of its parent; this meta has no iinf.
+    heic.write_bytes(_meta_with_child(struct.pack(">I4s", 0, b"hdlr")))
+    assert read_metadata(heic) == ImageMetadata()
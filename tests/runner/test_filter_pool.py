@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from icloudpd_web.runner import filter_pool
+from icloudpd_web.runner import run as run_module
+from icloudpd_web.runner.filter_pool import FilterOutcome, FilterPool, apply_filters
+from icloudpd_web.runner.post_filter import FilterPlan, compile_filters
+from icloudpd_web.runner.run import Run
+from icloudpd_web.store.models import Filters
+
+
+def _files(tmp_path: Path, *names: str) -> list[Path]:
+    paths = []
+    for name in names:
+        (tmp_path / name).write_bytes(b"x")
+        paths.append(tmp_path / name)
+    return paths
+
+
+def test_apply_filters_deletes_rejected(tmp_path: Path) -> None:
+    keep, drop = _files(tmp_path, "a.heic", "b.jpg")
+    gone = tmp_path / "c.jpg"  # rejected, but already deleted
+    out = apply_filters([keep, drop, gone], compile_filters(Filters(file_suffixes=[".heic"])))
+    assert [(o.path.name, o.kept, o.error is None) for o in out] == [
+        ("a.heic", True, True),
+        ("b.jpg", False, True),
+        ("c.jpg", False, False),
+    ]
+    assert keep.exists()
+    assert not drop.exists()
+    assert out[2].error is not None
+    assert out[2].error.startswith("could not delete")
+
+
+def test_apply_filters_reports_evaluation_errors(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def boom(path: Path, plan: FilterPlan) -> None:
+        raise OSError("unreadable")
+
+    monkeypatch.setattr(filter_pool, "evaluate", boom)
+    (path,) = _files(tmp_path, "a.jpg")
+    out = apply_filters([path], compile_filters(Filters(file_suffixes=[".heic"])))
+    assert out[0].kept
+    assert out[0].error is not None
+    assert out[0].error.startswith("evaluation failed")
+    assert path.exists()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("kind", ["thread", "process"])
+async def test_pool_runs_batches(tmp_path: Path, kind: str) -> None:
+    paths = _files(tmp_path, "a.heic", "b.jpg", "c.heic")
+    pool = FilterPool(2, kind=kind)  # type: ignore[arg-type]
+    try:
+        # The plan's compiled pattern has to survive pickling to a process.
+        plan = compile_filters(Filters(file_suffixes=[".heic", ".jpg"], match_patterns=["^[ac]"]))
+        out = await pool.run(paths, plan)
+    finally:
+        pool.close()
+    assert [o.kept for o in out] == [True, False, True]
+    assert not paths[1].exists()
+
+
+@pytest.mark.asyncio
+async def test_configure_replaces_executor(tmp_path: Path) -> None:
+    pool = FilterPool(1)
+    assert pool.size == 1
+    await pool.run(_files(tmp_path, "a.jpg"), compile_filters(Filters(file_suffixes=[".jpg"])))
+    pool.configure(3, kind="thread")
+    assert (pool.size, pool.kind) == (3, "thread")
+    pool.configure(3, kind="thread")  # unchanged: no-op
+    out = await pool.run(
+        _files(tmp_path, "b.jpg"), compile_filters(Filters(file_suffixes=[".jpg"]))
+    )
+    assert out[0].kept
+    pool.close()
+    assert FilterPool(0).size >= 1
+
+
+class GatedPool(FilterPool):
+    """Records batches and holds each until *release* is set."""
+
+    def __init__(self) -> None:
+        super().__init__(1)
+        self.batches: list[list[str]] = []
+        self.release = asyncio.Event()
+
+    async def run(
+        self, paths: list[Path], plan: FilterPlan, *, delete: bool = True
+    ) -> list[FilterOutcome]:
+        self.batches.append([p.name for p in paths])
+        await self.release.wait()
+        return [FilterOutcome(p, p.suffix == ".heic", "test") for p in paths]
+
+
+def _run(tmp_path: Path, pool: FilterPool) -> Run:
+    return Run(
+        run_id="r",
+        policy_name="p",
+        argv=["true"],
+        log_dir=tmp_path / "logs",
+        filters=Filters(file_suffixes=[".heic"]),
+        filter_pool=pool,
+    )
+
+
+@pytest.mark.asyncio
+async def test_paths_are_batched(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(run_module, "FILTER_BATCH_SIZE", 3)
+    monkeypatch.setattr(run_module, "FILTER_BATCH_INTERVAL", 0.05)
+    pool = GatedPool()
+    pool.release.set()
+    run = _run(tmp_path, pool)
+    for name in ("1.heic", "2.jpg", "3.heic", "4.heic"):
+        await run._queue_for_filter(tmp_path / name)  # noqa: SLF001
+    await asyncio.sleep(0)
+    assert pool.batches == [["1.heic", "2.jpg", "3.heic"]]
+    await asyncio.sleep(0.1)  # the partial batch goes once the interval passes
+    assert pool.batches[1:] == [["4.heic"]]
+    await asyncio.gather(*run._filter_tasks)  # noqa: SLF001
+    assert (run._filter_kept, run._filter_deleted) == (3, 1)  # noqa: SLF001
+
+
+@pytest.mark.asyncio
+async def test_drain_waits_while_batches_are_in_flight(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(run_module, "FILTER_BATCH_SIZE", 1)
+    monkeypatch.setattr(run_module, "MAX_BATCHES_IN_FLIGHT", 2)
+    pool = GatedPool()
+    run = _run(tmp_path, pool)
+    await asyncio.wait_for(run._queue_for_filter(tmp_path / "1.heic"), 1)  # noqa: SLF001
+    blocked = asyncio.ensure_future(run._queue_for_filter(tmp_path / "2.heic"))  # noqa: SLF001
+    await asyncio.sleep(0.05)
+    assert not blocked.done()
+    pool.release.set()
+    await asyncio.wait_for(blocked, 1)
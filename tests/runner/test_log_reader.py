@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import gzip
+import io
+
+from icloudpd_web.runner.log_reader import read_lines, tail_lines
+
+
+def _log(n: int, *, trailing_newline: bool = True) -> bytes:
+    body = "\n".join(f"line {i}" for i in range(n)).encode()
+    return body + b"\n" if trailing_newline else body
+
+
+def test_tail_spans_blocks() -> None:
+    data = _log(1000)
+    start, tail = tail_lines(io.BytesIO(data), 5, block_size=16)
+    assert tail == b"line 995\nline 996\nline 997\nline 998\nline 999\n"
+    assert data[start:] == tail
+
+
+def test_tail_without_trailing_newline() -> None:
+    start, tail = tail_lines(io.BytesIO(_log(4, trailing_newline=False)), 2)
+    assert tail == b"line 2\nline 3"
+    assert start == len(b"line 0\nline 1\n")
+
+
+def test_tail_more_than_file() -> None:
+    data = _log(3)
+    assert tail_lines(io.BytesIO(data), 10, block_size=4) == (0, data)
+
+
+def test_tail_zero_and_empty() -> None:
+    assert tail_lines(io.BytesIO(_log(3)), 0) == (len(_log(3)), b"")
+    assert tail_lines(io.BytesIO(b""), 5) == (0, b"")
+
+
+def test_read_lines_snaps_to_next_line() -> None:
+    data = _log(5)
+    start, page = read_lines(io.BytesIO(data), 3, 1024)
+    assert start == len(b"line 0\n")
+    assert page == data[start:]
+
+
+def test_read_lines_trims_to_whole_lines() -> None:
+    start, page = read_lines(io.BytesIO(_log(5)), 0, 10)
+    assert (start, page) == (0, b"line 0\n")
+
+
+def test_read_lines_cuts_overlong_line() -> None:
+    start, page = read_lines(io.BytesIO(b"x" * 100 + b"\n"), 0, 10)
+    assert (start, page) == (0, b"x" * 10)
+
+
+def test_tail_of_gzip_stream() -> None:
+    data = _log(1000)
+    f = gzip.GzipFile(fileobj=io.BytesIO(gzip.compress(data)))
+    start, tail = tail_lines(f, 2)
+    assert tail == b"line 998\nline 999\n"
+    assert data[start:] == tail
+
+
+def test_read_lines_from_gzip_stream() -> None:
+    data = _log(100)
+    f = gzip.GzipFile(fileobj=io.BytesIO(gzip.compress(data)))
+    start, page = read_lines(f, 500, 20)
+    assert data[start : start + len(page)] == page
+    assert page.endswith(b"\n")
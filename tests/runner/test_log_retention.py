@@ -64,3 +64,69 @@ def test_prune_log_without_sidecar_ok(tmp_path: Path) -> None:
 
     kept = prune_logs(tmp_path, keep=10)
     assert kept == 10
+
+
+def test_prunes_event_journal_alongside_log(tmp_path: Path) -> None:
+    for i in range(3):
+        p = tmp_path / f"policy-{i:02d}.log"
+        p.write_text("x")
+        ts = time.time() + i
+        os.utime(p, (ts, ts))
+        (tmp_path / f"policy-{i:02d}.events").write_text("")
+        (tmp_path / f"policy-{i:02d}.events.idx").write_text("")
+
+    prune_logs(tmp_path, keep=1)
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "policy-02.events",
+        "policy-02.events.idx",
+        "policy-02.log",
+    ]
+
+
+def test_prunes_compressed_logs(tmp_path: Path) -> None:
+    for i in range(3):
+        p = tmp_path / f"policy-{i:02d}.log.gz"
+        p.write_bytes(b"")
+        ts = time.time() + i
+        os.utime(p, (ts, ts))
+        (tmp_path / f"policy-{i:02d}.meta.json").write_text("{}")
+    # The live run's log is still plain.
+    live = tmp_path / "policy-03.log"
+    live.write_text("x")
+    os.utime(live, (time.time() + 3, time.time() + 3))
+
+    kept = prune_logs(tmp_path, keep=2)
+
+    assert kept == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "policy-02.log.gz",
+        "policy-02.meta.json",
+        "policy-03.log",
+    ]
+
+
+def test_skips_runs_still_in_use(tmp_path: Path) -> None:
+    for i in range(3):
+        p = tmp_path / f"policy-{i:02d}.log"
+        p.write_text("x")
+        ts = time.time() + i
+        os.utime(p, (ts, ts))
+        (tmp_path / f"policy-{i:02d}.aws.json").write_text("{}")
+        (tmp_path / f"policy-{i:02d}.files").write_text("")
+
+    # policy-00's upload is still running: its status and file list stay.
+    kept = prune_logs(tmp_path, keep=1, in_use=lambda p: p.stem == "policy-00")
+
+    assert kept == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "policy-00.aws.json",
+        "policy-00.files",
+        "policy-00.log",
+        "policy-02.aws.json",
+        "policy-02.files",
+        "policy-02.log",
+    ]
+    # Once it's done, the next prune takes it.
+    assert prune_logs(tmp_path, keep=1, in_use=lambda p: False) == 1
+    assert not (tmp_path / "policy-00.aws.json").exists()
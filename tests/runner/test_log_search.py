@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+import os
+import sqlite3
+from pathlib import Path
+
+from icloudpd_web.runner.log_retention import prune_logs
+from icloudpd_web.runner.log_search import SEARCH_NAME, LogSearch
+from icloudpd_web.runner.log_storage import compress_log
+
+
+def _write_run(base: Path, policy: str, run_id: str, lines: list[str]) -> Path:
+    d = base / policy
+    d.mkdir(parents=True, exist_ok=True)
+    log = d / f"{run_id}.log"
+    log.write_text("".join(line + "\n" for line in lines))
+    (d / f"{run_id}.meta.json").write_text("{}")
+    return log
+
+
+def test_search_finds_file_names_and_filters(tmp_path: Path) -> None:
+    search = LogSearch(tmp_path)
+    a = _write_run(
+        tmp_path,
+        "p",
+        "p-1",
+        [
+            "2026-04-20 10:00:00 INFO     Downloaded /photos/IMG_1234.HEIC",
+            "2026-04-20 10:00:01 ERROR    auth failed: bad password",
+        ],
+    )
+    b = _write_run(tmp_path, "q", "q-1", ["2026-04-21 09:00:00 ERROR    auth failed: locked"])
+    assert search.index_run("p", "p-1", a) == 2
+    search.index_run("q", "q-1", compress_log(b).with_suffix(""))
+
+    (hit,) = search.search("IMG_1234.HEIC")
+    assert (hit.run_id, hit.line_no, hit.offset) == ("p-1", 1, 0)
+    assert (hit.level, hit.ts) == ("INFO", "2026-04-20 10:00:00")
+
+    assert [h.run_id for h in search.search("auth failed")] == ["q-1", "p-1"]
+    assert [h.run_id for h in search.search('"failed: bad"')] == ["p-1"]
+    assert [h.run_id for h in search.search("auth", policy_name="p")] == ["p-1"]
+    assert [h.run_id for h in search.search("auth", run_id="q-1")] == ["q-1"]
+    assert search.search("IMG_1234", level="ERROR") == []
+    assert [h.run_id for h in search.search("auth", since="2026-04-21 00:00:00")] == ["q-1"]
+    assert [h.run_id for h in search.search("auth", until="2026-04-21 00:00:00")] == ["p-1"]
+    assert search.search('"; DROP TABLE lines --') == []
+    assert search.search("!!!") == []
+
+
+def test_index_is_idempotent_and_prunable(tmp_path: Path) -> None:
+    search = LogSearch(tmp_path)
+    log = _write_run(tmp_path, "p", "p-1", ["2026-04-20 10:00:00 INFO     hello"])
+    search.index_run("p", "p-1", log)
+    assert search.index_run("p", "p-1", log) == 0
+    assert len(search.search("hello")) == 1
+
+    search.remove(["p-1"])
+    assert search.search("hello") == []
+    assert not search.is_indexed("p-1")
+    # The tokens went too, not just the rows they point at.
+    rows = search._conn.execute(  # noqa: SLF001
+        "SELECT rowid FROM line_text WHERE line_text MATCH 'hello'"
+    ).fetchall()
+    assert rows == []
+
+
+def test_index_holds_no_log_text(tmp_path: Path) -> None:
+    search = LogSearch(tmp_path)
+    log = _write_run(
+        tmp_path, "p", "p-1", ["2026-04-20 10:00:00 INFO     Downloaded IMG_0042.HEIC"]
+    )
+    search.index_run("p", "p-1", compress_log(log).with_suffix(""))
+    search.close()
+    assert b"IMG_0042" not in (tmp_path / SEARCH_NAME).read_bytes()
+
+    search = LogSearch(tmp_path)
+    (hit,) = search.search("IMG_0042.HEIC")
+    assert hit.line == "2026-04-20 10:00:00 INFO     Downloaded IMG_0042.HEIC"
+
+
+def test_hits_whose_log_is_gone_are_dropped(tmp_path: Path) -> None:
+    search = LogSearch(tmp_path)
+    log = _write_run(tmp_path, "p", "p-1", ["2026-04-20 10:00:00 INFO     hello"])
+    search.index_run("p", "p-1", log)
+    log.unlink()
+    assert search.search("hello") == []
+    # Unindexing without the log leaves orphan tokens that match nothing.
+    search.remove(["p-1"])
+    again = _write_run(tmp_path, "p", "p-2", ["2026-04-20 11:00:00 INFO     hello"])
+    search.index_run("p", "p-2", again)
+    assert [h.run_id for h in search.search("hello")] == ["p-2"]
+
+
+def test_legacy_index_is_dropped_and_rebuilt(tmp_path: Path) -> None:
+    conn = sqlite3.connect(tmp_path / SEARCH_NAME)
+    conn.executescript(
+        "CREATE VIRTUAL TABLE lines USING fts5(text, run_id UNINDEXED);"
+        "CREATE TABLE indexed_runs (run_id TEXT PRIMARY KEY, policy_name TEXT, lines INTEGER);"
+        "INSERT INTO indexed_runs VALUES ('p-1', 'p', 1);"
+    )
+    conn.close()
+    _write_run(tmp_path, "p", "p-1", ["2026-04-20 10:00:00 INFO     hello"])
+    search = LogSearch(tmp_path)
+    assert search.sync() == 1
+    assert [h.run_id for h in search.search("hello")] == ["p-1"]
+
+
+def test_sync_reconciles_with_disk(tmp_path: Path) -> None:
+    _write_run(tmp_path, "p", "p-1", ["2026-04-20 10:00:00 INFO     one"])
+    gone = _write_run(tmp_path, "p", "p-2", ["2026-04-20 11:00:00 INFO     two"])
+    # A live run (no sidecar yet) is left for the Runner to index on exit.
+    (tmp_path / "p" / "p-3.log").write_text("2026-04-20 12:00:00 INFO     three\n")
+
+    search = LogSearch(tmp_path)
+    assert search.sync() == 2
+    gone.unlink()
+    assert search.sync() == 0
+    assert [h.run_id for h in search.search("one")] == ["p-1"]
+    assert search.search("two") == []
+    assert search.search("three") == []
+
+
+def test_closed_index_ignores_writes(tmp_path: Path) -> None:
+    search = LogSearch(tmp_path)
+    log = _write_run(tmp_path, "p", "p-1", ["x"])
+    search.close()
+    assert search.index_run("p", "p-1", log) == 0
+    assert search.sync() == 0
+    assert search.search("x") == []
+    search.remove(["p-1"])
+
+
+def test_retention_unindexes_before_deleting(tmp_path: Path) -> None:
+    search = LogSearch(tmp_path)
+    old = _write_run(tmp_path, "p", "p-1", ["2026-04-20 10:00:00 INFO     hello"])
+    new = _write_run(tmp_path, "p", "p-2", ["2026-04-21 10:00:00 INFO     bye"])
+    os.utime(old, (1_000_000, 1_000_000))
+    search.index_run("p", "p-1", compress_log(old).with_suffix(""))
+    search.index_run("p", "p-2", new)
+
+    prune_logs(tmp_path / "p", keep=1, search=search)
+
+    assert not search.is_indexed("p-1")
+    rows = search._conn.execute(  # noqa: SLF001
+        "SELECT rowid FROM line_text WHERE line_text MATCH 'hello'"
+    ).fetchall()
+    assert rows == []
+    assert [h.run_id for h in search.search("bye")] == ["p-2"]
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import gzip
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+from icloudpd_web.runner.log_reader import read_lines, tail_lines
+from icloudpd_web.runner.log_storage import (
+    BLOCK_SIZE,
+    _BlockReader,
+    block_index_path,
+    compress_log,
+    compressed_path,
+    find_log,
+    iter_log_lines,
+    open_log,
+)
+
+
+def test_compress_round_trip(tmp_path: Path) -> None:
+    log = tmp_path / "p-1.log"
+    log.write_bytes(b"Downloaded a\nDownloaded b\n")
+    os.utime(log, (1_000_000, 1_000_000))
+
+    gz = compress_log(log)
+
+    assert gz == compressed_path(log)
+    assert not log.exists()
+    assert gzip.decompress(gz.read_bytes()) == b"Downloaded a\nDownloaded b\n"
+    assert gz.stat().st_mtime == 1_000_000
+    assert find_log(log) == gz
+    with open_log(log) as f:
+        assert f.read() == b"Downloaded a\nDownloaded b\n"
+    assert list(iter_log_lines(log)) == ["Downloaded a", "Downloaded b"]
+
+
+def test_find_log_prefers_plain(tmp_path: Path) -> None:
+    log = tmp_path / "p-1.log"
+    assert find_log(log) is None
+    compressed_path(log).write_bytes(gzip.compress(b"old\n"))
+    log.write_text("new\n")
+    assert find_log(log) == log
+
+
+def test_open_missing_log(tmp_path: Path) -> None:
+    with pytest.raises(FileNotFoundError):
+        open_log(tmp_path / "nope.log")
+
+
+def test_compressed_log_seeks_by_block(tmp_path: Path) -> None:
+    log = tmp_path / "p-1.log"
+    text = b"".join(
+        b"2026-04-20 10:00:00 INFO     Downloaded IMG_%06d.HEIC\n" % i for i in range(20000)
+    )
+    log.write_bytes(text)
+
+    gz = compress_log(log, block_size=4096)
+
+    assert block_index_path(log).is_file()
+    # Still one ordinary gzip stream.
+    assert gzip.decompress(gz.read_bytes()) == text
+    with open_log(log) as f:
+        assert f.read() == text
+        f.seek(123_457)
+        assert f.read(100) == text[123_457:123_557]
+        assert f.seek(0, 2) == len(text)
+
+
+def test_tail_of_large_compressed_log_inflates_only_the_end(tmp_path: Path) -> None:
+    log = tmp_path / "p-1.log"
+    text = b"".join(b"line %d\n" % i for i in range(200_000))
+    log.write_bytes(text)
+    compress_log(log)
+
+    inflated: list[int] = []
+    inflate = _BlockReader._inflate  # noqa: SLF001
+
+    def counting(self: _BlockReader, block: int) -> bytes:
+        inflated.append(block)
+        return inflate(self, block)
+
+    with patch.object(_BlockReader, "_inflate", counting), open_log(log) as f:
+        start, tail = tail_lines(f, 3)
+        _, page = read_lines(f, start - 14, 100)
+    assert tail == b"line 199997\nline 199998\nline 199999\n"
+    assert text[start:] == tail
+    assert page == b"line 199996\n" + tail
+    # Only the block holding the tail, out of the whole log's.
+    last = len(text) // BLOCK_SIZE
+    assert last >= 8
+    assert set(inflated) == {last}
+
+
+def test_compressed_log_without_index_is_still_readable(tmp_path: Path) -> None:
+    log = tmp_path / "p-1.log"
+    compressed_path(log).write_bytes(gzip.compress(b"a\nb\n"))
+    with open_log(log) as f:
+        assert tail_lines(f, 1) == (2, b"b\n")
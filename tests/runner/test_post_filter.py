@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import re
 from collections.abc import Callable
 from pathlib import Path
 from unittest.mock import patch
@@ -9,7 +10,7 @@ from unittest.mock import patch
 import pytest
 from pydantic import ValidationError
 
-from icloudpd_web.runner.post_filter import evaluate, evaluate_all
+from icloudpd_web.runner.post_filter import FilterPlan, compile_filters, evaluate, evaluate_all
 from icloudpd_web.store.models import Filters
 
 
@@ -259,3 +260,65 @@ def test_evaluate_all() -> None:
 def test_invalid_regex_raises() -> None:
     with pytest.raises(ValidationError, match="invalid regex"):
         Filters(match_patterns=["[unclosed"])
+
+
+# ---------------------------------------------------------------------------
+# compiled plan
+# ---------------------------------------------------------------------------
+
+
+def test_compile_filters_normalises_once() -> None:
+    plan = compile_filters(
+        Filters(
+            file_suffixes=["HEIC", ".Jpg"],
+            match_patterns=["^IMG_", r"\.MOV$"],
+            device_makes=[" Apple ", ""],
+        )
+    )
+    assert plan.suffixes == frozenset({".heic", ".jpg"})
+    assert plan.patterns is not None
+    assert len(plan.patterns) == 1
+    assert plan.makes == ("apple",)
+    assert plan.models is None
+    assert plan.needs_exif
+    assert compile_filters(Filters()).is_empty
+    assert FilterPlan() == compile_filters(Filters())
+
+
+def test_blank_needles_still_reject() -> None:
+    plan = compile_filters(Filters(device_makes=["  "]))
+    assert plan.makes == ()
+    with patch(
+        "icloudpd_web.runner.post_filter._read_exif_make_model",
+        side_effect=_make_exif_mock("Apple", "iPhone"),
+    ):
+        assert evaluate(_path("a.jpg"), plan).kept is False
+
+
+@pytest.mark.parametrize(
+    "patterns",
+    [
+        ["^(a)\\1", "^b"],  # no groups after the first: combined
+        ["^b", "^(a)\\1"],  # a later backreference: kept separate
+        ["^b", "(?i)^A"],  # inline global flag mid-pattern: kept separate
+    ],
+)
+def test_plan_patterns_match_like_separate_searches(patterns: list[str]) -> None:
+    plan = compile_filters(Filters(match_patterns=patterns))
+    for name in ["aa.jpg", "ab.jpg", "b.jpg", "A.jpg", "c.jpg"]:
+        expected = any(re.search(p, name) for p in patterns)
+        assert evaluate(_path(name), plan).kept is expected, name
+
+
+def test_plan_does_no_per_file_compiling() -> None:
+    plan = compile_filters(Filters(file_suffixes=[".jpg"], match_patterns=["^a", "^b"]))
+    with (
+        patch("icloudpd_web.runner.post_filter.re.compile") as compile_,
+        patch("icloudpd_web.runner.post_filter.re.search") as search,
+        patch("icloudpd_web.runner.post_filter._read_exif_make_model") as exif,
+    ):
+        decisions = evaluate_all([_path(f"{c}{i}.jpg") for i in range(50) for c in "abc"], plan)
+    assert sum(d.kept for d in decisions) == 100
+    compile_.assert_not_called()
+    search.assert_not_called()
+    exif.assert_not_called()  # no EXIF filter configured: files aren't opened
@@ -221,3 +221,187 @@ def test_emit_log_prepends_timestamp_for_inconsistent_lines(tmp_path: Path) -> N
         assert ts_re.match(line), f"no timestamp prefix: {line!r}"
     # Second line kept its original timestamp (not double-prefixed).
     assert lines[1].startswith("2026-04-20 11:17:10 INFO     Downloaded")
+
+
+@pytest.mark.asyncio
+async def test_coalesced_logs_publish_batches(
+    tmp_path: Path, fake_icloudpd_cmd: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """With coalesce_logs, lines arrive as log_batch events, in order, before status."""
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "success")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "20")
+    monkeypatch.setenv("FAKE_ICLOUDPD_SLEEP", "0")
+
+    run = Run(
+        run_id="policy-G",
+        policy_name="policy",
+        argv=_argv(fake_icloudpd_cmd),
+        log_dir=tmp_path,
+        password="pw",
+        coalesce_logs=True,
+    )
+    await run.start()
+    await run.wait()
+
+    events = [ev async for ev in run.subscribe(since=None)]
+    assert "log" not in {e.kind for e in events}
+    batches = [e for e in events if e.kind == "log_batch"]
+    lines = [line for b in batches for line in b.data["lines"]]
+    # Far fewer events than lines.
+    assert len(batches) < len(lines)
+    assert lines == run.log_path.read_text().splitlines()
+    assert events[-1].kind == "status"
+
+
+@pytest.mark.asyncio
+async def test_coalesced_logs_flush_at_max_lines(tmp_path: Path) -> None:
+    run = Run(
+        run_id="policy-H",
+        policy_name="policy",
+        argv=["/bin/true"],
+        log_dir=tmp_path,
+        coalesce_logs=True,
+    )
+    for i in range(Run.LOG_BATCH_MAX_LINES + 1):
+        run._emit_log(f"INFO     line {i}")  # noqa: SLF001
+    # The first full batch went out immediately; the remainder waits for the timer.
+    batches = [e for e in run._buffer if e.kind == "log_batch"]  # noqa: SLF001
+    assert [len(b.data["lines"]) for b in batches] == [Run.LOG_BATCH_MAX_LINES]
+    await asyncio.sleep(Run.LOG_BATCH_INTERVAL * 2)
+    batches = [e for e in run._buffer if e.kind == "log_batch"]  # noqa: SLF001
+    assert [len(b.data["lines"]) for b in batches] == [Run.LOG_BATCH_MAX_LINES, 1]
+
+
+def _idle_run(tmp_path: Path) -> Run:
+    return Run(run_id="policy-Q", policy_name="policy", argv=["/bin/true"], log_dir=tmp_path)
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_queue_stays_bounded(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """A stalled consumer never holds more than SUBSCRIBER_QUEUE_CAP events and
+    still receives every event, in order, from the ring buffer once it reads."""
+    monkeypatch.setattr(Run, "SUBSCRIBER_QUEUE_CAP", 4)
+    run = _idle_run(tmp_path)
+    run._publish("progress", {"i": -1})  # noqa: SLF001
+    agen = run.subscribe(since=None)
+    assert (await anext(agen)).seq == 1
+
+    for i in range(50):
+        run._publish("progress", {"i": i})  # noqa: SLF001
+    assert all(s.queue.qsize() <= 4 for s in run._subscribers)  # noqa: SLF001
+
+    seqs = [(await anext(agen)).seq for _ in range(50)]
+    assert seqs == list(range(2, 52))
+    await agen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_gets_resync_marker_on_gap(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(Run, "SUBSCRIBER_QUEUE_CAP", 4)
+    monkeypatch.setattr(Run, "BUFFER_CAP", 10)
+    run = _idle_run(tmp_path)
+    run._publish("progress", {"i": -1})  # noqa: SLF001
+    agen = run.subscribe(since=None)
+    await anext(agen)
+
+    for i in range(50):
+        run._publish("progress", {"i": i})  # noqa: SLF001
+
+    marker = await anext(agen)
+    assert marker.kind == "resync"
+    assert marker.data == {"missed_from": 2, "resume_at": 42}
+    seqs = [(await anext(agen)).seq for _ in range(10)]
+    assert seqs == list(range(42, 52))
+    await agen.aclose()
+
+
+@pytest.mark.asyncio
+async def test_log_compressed_on_exit(
+    tmp_path: Path, fake_icloudpd_cmd: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import json
+
+    from icloudpd_web.runner.log_storage import compressed_path, iter_log_lines
+
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "success")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "3")
+
+    run = Run(
+        run_id="policy-A",
+        policy_name="policy",
+        argv=_argv(fake_icloudpd_cmd),
+        log_dir=tmp_path,
+        password="pw",
+        compress_log=True,
+    )
+    await run.start()
+    await run.wait()
+
+    assert not run.log_path.exists()
+    assert compressed_path(run.log_path).is_file()
+    lines = list(iter_log_lines(run.log_path))
+    assert any("Downloading 1 of 3" in line for line in lines)
+    meta = json.loads(run.log_path.with_suffix(".meta.json").read_text())
+    assert meta["log_size"] == sum(len(line.encode()) + 1 for line in lines)
+    # Replay past the ring buffer still resolves spans in the gzipped log.
+    events = [ev async for ev in run.subscribe(since=0)]
+    assert events[-1].kind == "status"
+
+
+@pytest.mark.asyncio
+async def test_queued_run_publishes_position_then_running(
+    tmp_path: Path, fake_icloudpd_cmd: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from icloudpd_web.runner.event_log import replay_events
+
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "success")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "1")
+    run = Run(
+        run_id="policy-Q",
+        policy_name="policy",
+        argv=_argv(fake_icloudpd_cmd),
+        log_dir=tmp_path,
+        password="pw",
+    )
+    run.mark_queued(2)
+    run.mark_queued(2)  # unchanged: no new event
+    run.mark_queued(1)
+    await run.start()
+    await run.wait()
+
+    events = [ev async for ev in run.subscribe(since=0)]
+    statuses = [ev.data for ev in events if ev.kind == "status"]
+    assert statuses[:3] == [
+        {"status": "queued", "queue_position": 2},
+        {"status": "queued", "queue_position": 1},
+        {"status": "running"},
+    ]
+    # The journal covers the events published before the run started.
+    assert [ev.seq for ev in replay_events(run.log_path)] == [ev.seq for ev in events]
+
+
+@pytest.mark.asyncio
+async def test_downloaded_files_are_listed(
+    tmp_path: Path, fake_icloudpd_cmd: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    photos = tmp_path / "photos"
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "filter_demo")
+    monkeypatch.setenv("FAKE_ICLOUDPD_DIR", str(photos))
+    run = Run(
+        run_id="policy-files",
+        policy_name="policy",
+        argv=_argv(fake_icloudpd_cmd),
+        log_dir=tmp_path / "runs",
+        password="pw",
+    )
+    await run.start()
+    await run.wait()
+    assert run.downloaded_list.read_text().splitlines() == [
+        str(photos / "img_apple.heic"),
+        str(photos / "img_samsung.jpg"),
+        str(photos / "other.png"),
+    ]
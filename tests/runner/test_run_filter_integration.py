@@ -145,3 +145,40 @@ async def test_filter_device_make_only(
     # PNG: non-image-extension? .png IS in _image_suffixes, so EXIF will be checked.
     # _write_minimal_png produces no EXIF Make → "EXIF Make unreadable" → deleted.
     assert not (target_dir / "other.png").exists()
+
+
+@pytest.mark.asyncio
+async def test_on_downloaded_gets_only_kept_files(
+    tmp_path: Path,
+    fake_icloudpd_cmd: list[str],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    target_dir = tmp_path / "photos"
+    target_dir.mkdir()
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "filter_demo")
+    monkeypatch.setenv("FAKE_ICLOUDPD_DIR", str(target_dir))
+    handed: dict[str, list[str]] = {"filtered": [], "unfiltered": []}
+
+    for name, filters in (
+        ("filtered", Filters(file_suffixes=[".heic"])),
+        ("unfiltered", None),
+    ):
+
+        async def on_downloaded(run: Run, path: Path, name: str = name) -> None:
+            assert run.status == "running"
+            handed[name].append(path.name)
+
+        run = Run(
+            run_id=f"test-{name}",
+            policy_name="test-policy",
+            argv=_argv(fake_icloudpd_cmd, str(target_dir)),
+            log_dir=tmp_path / "logs",
+            password="pw",
+            filters=filters,
+            on_downloaded=on_downloaded,
+        )
+        await run.start()
+        await run.wait()
+
+    assert handed["filtered"] == ["img_apple.heic"]
+    assert handed["unfiltered"] == ["img_apple.heic", "img_samsung.jpg", "other.png"]
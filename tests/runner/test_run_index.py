@@ -0,0 +1,95 @@
+"""Tests for the SQLite run-history index."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+from icloudpd_web.runner.log_retention import prune_logs
+from icloudpd_web.runner.run_index import RunIndex
+
+
+def _meta(run_id: str, ended_at: str, status: str = "success") -> dict:
+    return {
+        "run_id": run_id,
+        "policy_name": run_id.rsplit("-", 1)[0],
+        "status": status,
+        "started_at": "2026-04-20 10:00:00+00:00",
+        "ended_at": ended_at,
+        "exit_code": 0 if status == "success" else 1,
+        "error_id": None,
+        "downloaded": 3,
+        "total": 3,
+    }
+
+
+def test_record_and_query_newest_first(tmp_path: Path) -> None:
+    idx = RunIndex(tmp_path)
+    idx.record(_meta("p-1", "2026-04-20 10:01:00+00:00"))
+    idx.record(_meta("p-3", "2026-04-20 10:03:00+00:00", status="failed"))
+    idx.record(_meta("p-2", "2026-04-20 10:02:00+00:00"))
+    idx.record(_meta("q-1", "2026-04-21 00:00:00+00:00"))
+
+    assert [r["run_id"] for r in idx.runs_for("p")] == ["p-3", "p-2", "p-1"]
+    assert idx.runs_for("p")[0]["status"] == "failed"
+    assert idx.runs_for("missing") == []
+
+
+def test_record_captures_log_stat(tmp_path: Path) -> None:
+    log = tmp_path / "p" / "p-1.log"
+    log.parent.mkdir()
+    log.write_text("hello\n")
+    idx = RunIndex(tmp_path)
+    idx.record(_meta("p-1", "2026-04-20 10:01:00+00:00"), log_path=log)
+    row = idx.runs_for("p")[0]
+    assert row["log_size"] == 6
+    assert row["mtime"] is not None
+
+
+def test_rebuild_from_existing_sidecars(tmp_path: Path) -> None:
+    """Opening an index over a pre-index data dir picks up the sidecars."""
+    pdir = tmp_path / "p"
+    pdir.mkdir()
+    for i in range(3):
+        meta = _meta(f"p-{i}", f"2026-04-20 10:0{i}:00+00:00")
+        (pdir / f"p-{i}.meta.json").write_text(json.dumps(meta))
+        (pdir / f"p-{i}.log").write_text("x")
+    (pdir / "p-bad.meta.json").write_text("{not json")
+
+    idx = RunIndex(tmp_path)
+    assert [r["run_id"] for r in idx.runs_for("p")] == ["p-2", "p-1", "p-0"]
+    idx.close()
+
+    # Re-opening an existing index does not rescan the sidecars.
+    (pdir / "p-0.meta.json").unlink()
+    idx2 = RunIndex(tmp_path)
+    assert len(idx2.runs_for("p")) == 3
+    assert idx2.rebuild() == 2
+    assert len(idx2.runs_for("p")) == 2
+
+
+def test_prune_logs_drops_index_rows(tmp_path: Path) -> None:
+    import os
+    import time
+
+    pdir = tmp_path / "p"
+    pdir.mkdir()
+    idx = RunIndex(tmp_path)
+    for i in range(4):
+        log = pdir / f"p-{i}.log"
+        log.write_text("x")
+        ts = time.time() + i
+        os.utime(log, (ts, ts))
+        idx.record(_meta(f"p-{i}", f"2026-04-20 10:0{i}:00+00:00"))
+
+    prune_logs(pdir, keep=2, index=idx)
+    assert [r["run_id"] for r in idx.runs_for("p")] == ["p-3", "p-2"]
+
+
+def test_last_runs_one_row_per_policy(tmp_path: Path) -> None:
+    idx = RunIndex(tmp_path)
+    idx.record(_meta("p-1", "2026-04-20 10:01:00+00:00"))
+    idx.record(_meta("p-2", "2026-04-20 10:02:00+00:00"))
+    idx.record(_meta("q-1", "2026-04-19 10:00:00+00:00"))
+    rows = {r["policy_name"]: r["run_id"] for r in idx.last_runs()}
+    assert rows == {"p": "p-2", "q": "q-1"}
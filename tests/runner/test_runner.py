@@ -86,3 +86,190 @@ async def test_start_raises_without_password(tmp_path: Path, fake_icloudpd_cmd:
     )
     with pytest.raises(ValueError, match="password is required"):
         await r.start(_policy(), password=None, trigger="manual")
+
+
+@pytest.mark.asyncio
+async def test_last_run_cached_on_exit(
+    tmp_path: Path, fake_icloudpd_cmd: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from icloudpd_web.runner.run_index import RunIndex
+
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "success")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "1")
+
+    index = RunIndex(tmp_path)
+    r = Runner(
+        runs_base=tmp_path,
+        icloudpd_argv=lambda argv_tail: [*fake_icloudpd_cmd, *argv_tail],
+        run_index=index,
+    )
+    assert r.last_run("p") is None
+    run = await r.start(_policy(), password="pw", trigger="manual")
+    await run.wait()
+    last = r.last_run("p")
+    assert last is not None
+    assert last.run_id == run.run_id
+    assert last.status == "success"
+
+    # A fresh Runner seeds its cache from the index without a new run.
+    r2 = Runner(runs_base=tmp_path, icloudpd_argv=lambda t: t, run_index=index)
+    seeded = r2.last_run("p")
+    assert seeded is not None
+    assert seeded.run_id == run.run_id
+
+
+def _named(name: str) -> Policy:
+    return _policy().model_copy(update={"name": name})
+
+
+@pytest.mark.asyncio
+async def test_max_concurrent_queues_and_dispatches(
+    tmp_path: Path, fake_icloudpd_cmd: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "success")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "3")
+    monkeypatch.setenv("FAKE_ICLOUDPD_SLEEP", "0.05")
+    events: list[tuple[str, str]] = []
+    r = Runner(
+        runs_base=tmp_path,
+        icloudpd_argv=lambda argv_tail: [*fake_icloudpd_cmd, *argv_tail],
+        on_run_event=lambda run, ev: events.append((run.policy_name, ev)),
+        max_concurrent=1,
+    )
+    a = await r.start(_named("a"), password="pw", trigger="cron")
+    b = await r.start(_named("b"), password="pw", trigger="cron")
+    c = await r.start(_named("c"), password="pw", trigger="manual")
+
+    assert a.status == "running"
+    # The manual start jumps ahead of the earlier cron one.
+    assert (c.status, c.queue_position) == ("queued", 1)
+    assert (b.status, b.queue_position) == ("queued", 2)
+    assert r.is_queued("b")
+    assert r.queue_position("b") == 2
+    assert [run.policy_name for run in r.queued_runs()] == ["c", "b"]
+    with pytest.raises(RuntimeError, match="already queued"):
+        await r.start(_named("b"), password="pw", trigger="manual")
+
+    await asyncio.wait_for(asyncio.gather(a.wait(), b.wait(), c.wait()), timeout=10)
+    assert [run.status for run in (a, b, c)] == ["success"] * 3
+    assert a.ended_at is not None
+    assert c.ended_at is not None
+    assert c.started_at is not None
+    assert b.started_at is not None
+    assert c.started_at >= a.ended_at
+    assert b.started_at >= c.ended_at
+    assert ("b", "queued") in events
+    assert events.index(("c", "started")) < events.index(("b", "started"))
+
+
+@pytest.mark.asyncio
+async def test_stop_queued_run(
+    tmp_path: Path, fake_icloudpd_cmd: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    import json
+
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "slow")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "20")
+    r = Runner(
+        runs_base=tmp_path,
+        icloudpd_argv=lambda argv_tail: [*fake_icloudpd_cmd, *argv_tail],
+        max_concurrent=1,
+    )
+    a = await r.start(_named("a"), password="pw", trigger="cron")
+    b = await r.start(_named("b"), password="pw", trigger="cron")
+    c = await r.start(_named("c"), password="pw", trigger="cron")
+
+    assert await r.stop(b.run_id) is True
+    await b.wait()
+    assert b.status == "stopped"
+    assert c.queue_position == 1
+    meta = json.loads(b.log_path.with_suffix(".meta.json").read_text())
+    assert meta["status"] == "stopped"
+    assert "stopped before it started" in b.log_path.read_text()
+    await asyncio.sleep(0.05)
+    assert r.last_run("b") is not None
+
+    # Raising the limit launches the rest of the queue right away.
+    await r.set_limits(max_concurrent=0, max_per_account=0)
+    assert c.status == "running"
+    await r.stop(a.run_id)
+    await r.stop(c.run_id)
+    await asyncio.wait_for(asyncio.gather(a.wait(), c.wait()), timeout=10)
+
+
+@pytest.mark.asyncio
+async def test_runs_serialized_per_account(
+    tmp_path: Path, fake_icloudpd_cmd: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "success")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "3")
+    monkeypatch.setenv("FAKE_ICLOUDPD_SLEEP", "0.05")
+    r = Runner(
+        runs_base=tmp_path,
+        icloudpd_argv=lambda argv_tail: [*fake_icloudpd_cmd, *argv_tail],
+        max_concurrent=2,
+        max_per_account=1,
+    )
+    shared = {"username": "Shared@icloud.com"}
+    a1 = await r.start(_named("a1").model_copy(update=shared), password="pw", trigger="cron")
+    a2 = await r.start(
+        _named("a2").model_copy(update={"username": "shared@icloud.com "}),
+        password="pw",
+        trigger="cron",
+    )
+    b = await r.start(
+        _named("b").model_copy(update={"username": "other@icloud.com"}),
+        password="pw",
+        trigger="cron",
+    )
+
+    # a2 waits for a1 (same account, case-insensitive); b has its own account.
+    assert (a1.status, a2.status, b.status) == ("running", "queued", "running")
+    await asyncio.wait_for(asyncio.gather(a1.wait(), a2.wait(), b.wait()), timeout=10)
+    assert a1.ended_at is not None
+    assert a2.started_at is not None
+    assert a2.started_at >= a1.ended_at
+
+
+@pytest.mark.asyncio
+async def test_blocked_account_does_not_hold_up_queue(
+    tmp_path: Path, fake_icloudpd_cmd: list[str], monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("FAKE_ICLOUDPD_MODE", "slow")
+    monkeypatch.setenv("FAKE_ICLOUDPD_TOTAL", "20")
+    r = Runner(
+        runs_base=tmp_path,
+        icloudpd_argv=lambda argv_tail: [*fake_icloudpd_cmd, *argv_tail],
+        max_concurrent=2,
+        max_per_account=1,
+    )
+    a1 = await r.start(_named("a1"), password="pw", trigger="cron")
+    b1 = await r.start(
+        _named("b1").model_copy(update={"username": "b@icloud.com"}), password="pw", trigger="cron"
+    )
+    a2 = await r.start(_named("a2"), password="pw", trigger="cron")
+    c1 = await r.start(
+        _named("c1").model_copy(update={"username": "c@icloud.com"}), password="pw", trigger="cron"
+    )
+    assert [run.policy_name for run in r.queued_runs()] == ["a2", "c1"]
+
+    # b's slot frees up: a2 is still blocked by a1, so c1 goes first.
+    await r.stop(b1.run_id)
+    await asyncio.wait_for(b1.wait(), timeout=10)
+    for _ in range(50):
+        if c1.status == "running":
+            break
+        await asyncio.sleep(0.02)
+    assert c1.status == "running"
+    assert (a2.status, a2.queue_position) == ("queued", 1)
+
+    for run in (a1, c1):
+        await r.stop(run.run_id)
+    await asyncio.wait_for(a1.wait(), timeout=10)
+    for _ in range(50):
+        if a2.status == "running":
+            break
+        await asyncio.sleep(0.02)
+    assert a2.status == "running"
+    await r.stop(a2.run_id)
+    await asyncio.wait_for(asyncio.gather(a2.wait(), c1.wait()), timeout=10)
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from icloudpd_web.runner.filter_pool import FilterOutcome, FilterPool
+from icloudpd_web.runner.post_filter import FilterPlan
+from icloudpd_web.runner.sweep import SweepRun, iter_library_files
+from icloudpd_web.store.models import Filters
+
+
+class GatedPool(FilterPool):
+    """Counts batches and holds each until *release* is set."""
+
+    def __init__(self) -> None:
+        super().__init__(1)
+        self.batches = 0
+        self.release = asyncio.Event()
+
+    async def run(
+        self, paths: list[Path], plan: FilterPlan, *, delete: bool = True
+    ) -> list[FilterOutcome]:
+        self.batches += 1
+        await self.release.wait()
+        return [FilterOutcome(p, True, "test") for p in paths]
+
+
+def _library(root: Path) -> list[Path]:
+    files = [
+        root / "2026" / "01" / "IMG_1.heic",
+        root / "2026" / "01" / "IMG_2.jpg",
+        root / "2026" / "02" / "IMG_3.heic",
+        root / "clip.mov",
+    ]
+    for f in files:
+        f.parent.mkdir(parents=True, exist_ok=True)
+        f.write_bytes(b"x")
+    (root / ".folderstructure").write_text("{:%Y/%m}")
+    (root / ".partial").mkdir()
+    (root / ".partial" / "IMG_4.jpg").write_bytes(b"x")
+    return files
+
+
+def _sweep(tmp_path: Path, *, list_only: bool, pool: FilterPool | None = None) -> SweepRun:
+    return SweepRun(
+        run_id="p-sweep",
+        policy_name="p",
+        log_dir=tmp_path / "logs",
+        directory=tmp_path / "lib",
+        filters=Filters(file_suffixes=[".heic"]),
+        list_only=list_only,
+        filter_pool=pool,
+    )
+
+
+def test_iter_library_files(tmp_path: Path) -> None:
+    files = _library(tmp_path)
+    (tmp_path / "link").symlink_to(tmp_path / "2026")
+    assert sorted(iter_library_files(tmp_path)) == sorted(files)
+    with pytest.raises(FileNotFoundError):
+        list(iter_library_files(tmp_path / "missing"))
+
+
+@pytest.mark.asyncio
+async def test_dry_run_lists_without_deleting(tmp_path: Path) -> None:
+    files = _library(tmp_path / "lib")
+    run = _sweep(tmp_path, list_only=True)
+    await run.start()
+    await run.wait()
+    assert run.status == "success"
+    assert all(f.exists() for f in files)
+    log = run.log_path.read_text()
+    assert f"would delete {files[1]}" in log
+    assert f"would delete {files[3]}" in log
+    assert "Filter summary: kept 2, would delete 2" in log
+    # Only rejections are logged file by file; kept files are counted.
+    assert "Filter: kept" not in log
+    progress = [ev.data for ev in run._buffer if ev.kind == "progress"]  # noqa: SLF001
+    assert progress[-1] == {"downloaded": 4, "total": None, "kept": 2, "deleted": 2}
+    assert run.progress == progress[-1]
+    # The sentinel isn't a photo, whatever the filters say.
+    assert (tmp_path / "lib" / ".folderstructure").exists()
+
+
+@pytest.mark.asyncio
+async def test_sweep_deletes_rejected(tmp_path: Path) -> None:
+    files = _library(tmp_path / "lib")
+    run = _sweep(tmp_path, list_only=False)
+    await run.start()
+    await run.wait()
+    assert run.status == "success"
+    assert [f.exists() for f in files] == [True, False, True, False]
+    assert "Filter summary: kept 2, deleted 2" in run.log_path.read_text()
+
+
+@pytest.mark.asyncio
+async def test_missing_directory_fails(tmp_path: Path) -> None:
+    run = _sweep(tmp_path, list_only=True)
+    await run.start()
+    await run.wait()
+    assert run.status == "failed"
+    assert "Sweep failed" in run.log_path.read_text()
+
+
+@pytest.mark.asyncio
+async def test_stop_ends_the_walk(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from icloudpd_web.runner import run as run_module
+    from icloudpd_web.runner import sweep as sweep_module
+
+    monkeypatch.setattr(sweep_module, "FILTER_BATCH_SIZE", 1)
+    monkeypatch.setattr(run_module, "FILTER_BATCH_SIZE", 1)
+    monkeypatch.setattr(run_module, "MAX_BATCHES_IN_FLIGHT", 1)
+    _library(tmp_path / "lib")
+    pool = GatedPool()
+    run = _sweep(tmp_path, list_only=True, pool=pool)
+    await run.start()
+    while not pool.batches:  # noqa: ASYNC110
+        await asyncio.sleep(0.01)
+    await run.stop()
+    pool.release.set()
+    await run.wait()
+    assert run.status == "stopped"
+    assert pool.batches < 4
+
+
+@pytest.mark.asyncio
+async def test_unexpected_error_still_settles_the_run(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    _library(tmp_path / "lib")
+    run = _sweep(tmp_path, list_only=True)
+
+    async def broken(path: Path) -> None:
+        raise RuntimeError("pool gone")
+
+    monkeypatch.setattr(run, "_queue_for_filter", broken)
+    await run.start()
+    await asyncio.wait_for(run.wait(), 5)
+    assert run.status == "failed"
+    assert "Sweep failed: RuntimeError: pool gone" in run.log_path.read_text()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_sweep_is_stopped(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    from icloudpd_web.runner import run as run_module
+    from icloudpd_web.runner import sweep as sweep_module
+
+    # One file per batch and one batch in flight: the walk waits on the pool.
+    monkeypatch.setattr(sweep_module, "FILTER_BATCH_SIZE", 1)
+    monkeypatch.setattr(run_module, "FILTER_BATCH_SIZE", 1)
+    monkeypatch.setattr(run_module, "MAX_BATCHES_IN_FLIGHT", 1)
+    _library(tmp_path / "lib")
+    pool = GatedPool()
+    run = _sweep(tmp_path, list_only=True, pool=pool)
+    await run.start()
+    while not pool.batches:  # noqa: ASYNC110
+        await asyncio.sleep(0.01)
+    await asyncio.sleep(0.05)
+    run._task.cancel()  # type: ignore[union-attr]  # noqa: SLF001
+    await asyncio.sleep(0)
+    pool.release.set()
+    await asyncio.wait_for(run.wait(), 5)
+    assert run.status == "stopped"
@@ -1,19 +1,37 @@
-from datetime import UTC, datetime
+import asyncio
+import json
+import os
+from datetime import UTC, datetime, timedelta
 from pathlib import Path
+from typing import Any
 
-import pytest  # noqa: F401
+import pytest
 
-from icloudpd_web.scheduler.scheduler import Scheduler
+from icloudpd_web.scheduler.scheduler import MAX_SLEEP_SECONDS, Scheduler
 from icloudpd_web.store.models import Policy
 
 
 class FakeStore:
     def __init__(self, policies: list[Policy]) -> None:
         self._policies = policies
+        self.generation = 1
+        self.all_calls = 0
 
     def all(self) -> list[Policy]:
+        self.all_calls += 1
         return list(self._policies)
 
+    def replace(self, policies: list[Policy]) -> None:
+        self._policies = policies
+        self.generation += 1
+
+    def changes_since(self, generation: int) -> list[tuple[int, str, dict[str, Any]]] | None:
+        return None
+
+    async def wait_changed(self, seen: int, *, max_wait: float | None = None) -> int:
+        await asyncio.sleep(max_wait or 0)
+        return self.generation
+
 
 class FakeRunner:
     def __init__(self) -> None:
@@ -23,12 +41,21 @@ class FakeRunner:
     def is_running(self, name: str) -> bool:
         return name in self.running
 
+    def is_queued(self, name: str) -> bool:
+        return False
+
     async def start(self, policy: Policy, *, password: str | None = None, trigger: str) -> object:
         self.fired.append((policy.name, datetime.now()))
         return object()
 
 
-def _p(name: str, cron: str, enabled: bool = True, tz: str | None = None) -> Policy:
+def _p(
+    name: str,
+    cron: str,
+    enabled: bool = True,
+    tz: str | None = None,
+    jitter: int | None = None,
+) -> Policy:
     return Policy(
         name=name,
         username="u@icloud.com",
@@ -36,6 +63,7 @@ def _p(name: str, cron: str, enabled: bool = True, tz: str | None = None) -> Pol
         cron=cron,
         enabled=enabled,
         timezone=tz,
+        jitter_minutes=jitter,
         icloudpd={},
         aws=None,
     )
@@ -89,6 +117,195 @@ def test_next_run_at() -> None:
     assert dt == datetime(2026, 1, 1, 13, 0)
 
 
+def test_jitter_is_deterministic_and_bounded() -> None:
+    s = Scheduler(
+        store=FakeStore([]), runner=FakeRunner(), password_lookup=_passwords, jitter_minutes=30
+    )
+    offsets = {s.jitter(_p(f"p{i}", "0 * * * *")) for i in range(20)}
+    assert all(timedelta(0) <= o < timedelta(minutes=30) for o in offsets)
+    assert len(offsets) > 1  # spread, not all on one second
+    assert s.jitter(_p("p1", "0 * * * *")) == s.jitter(_p("p1", "0 * * * *"))
+    # The policy's own window overrides the server default; 0 turns it off.
+    assert s.jitter(_p("p1", "0 * * * *", jitter=0)) == timedelta(0)
+    assert s.jitter(_p("p1", "0 * * * *", jitter=5)) < timedelta(minutes=5)
+
+
+def test_jittered_start_waits_for_its_offset() -> None:
+    p = _p("a", "0 * * * *", jitter=10)
+    store = FakeStore([p])
+    s = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords)
+    offset = s.jitter(p)
+    assert offset > timedelta(seconds=5)
+    top = datetime(2026, 1, 1, 12, 0, 5)
+    s.tick(top)
+    assert s._pending == []
+    s.tick(top.replace(second=0) + offset - timedelta(seconds=1))
+    assert s._pending == []
+    s.tick(top.replace(second=0) + offset)
+    assert [q.name for q in s._pending] == ["a"]
+    s.tick(top.replace(second=0) + offset + timedelta(seconds=30))
+    assert len(s._pending) == 1
+
+
+def test_jittered_start_dropped_if_policy_disabled_or_deleted() -> None:
+    p = _p("a", "0 * * * *", jitter=10)
+    store = FakeStore([p])
+    s = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords)
+    s.tick(datetime(2026, 1, 1, 12, 0, 5))
+    assert s.next_fire("a") is not None
+    store.replace([_p("a", "0 * * * *", enabled=False, jitter=10)])
+    s.tick(datetime(2026, 1, 1, 12, 11))
+    assert s._pending == []
+    assert s.next_fire("a") is None
+    store.replace([])
+    s.tick(datetime(2026, 1, 1, 13, 11))
+    assert s._pending == []
+
+
+def test_next_run_at_includes_jitter() -> None:
+    s = Scheduler(store=FakeStore([]), runner=FakeRunner(), password_lookup=_passwords)
+    p = _p("a", "0 * * * *", jitter=10)
+    offset = s.jitter(p)
+    assert s.next_run_at(p, after=datetime(2026, 1, 1, 12, 30)) == datetime(2026, 1, 1, 13) + offset
+    # Between the cron match and the jittered start, the pending start is next.
+    assert s.next_run_at(p, after=datetime(2026, 1, 1, 13, 0)) == datetime(2026, 1, 1, 13) + offset
+
+
+def test_tick_only_rescans_policies_on_generation_change() -> None:
+    store = FakeStore([_p(f"p{i}", "0 * * * *") for i in range(50)])
+    s = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords)
+    for sec in range(600):
+        s.tick(datetime(2026, 1, 1, 12, 1) + timedelta(seconds=sec))
+    assert store.all_calls == 1
+    assert s._pending == []
+    s.tick(datetime(2026, 1, 1, 13, 0, 1))
+    assert len(s._pending) == 50
+    store.replace([_p("p0", "30 * * * *")])
+    s.tick(datetime(2026, 1, 1, 13, 0, 2))
+    assert store.all_calls == 2
+    assert s.next_fire("p0") == datetime(2026, 1, 1, 13, 30, tzinfo=UTC)
+    assert s.next_fire("p1") is None
+
+
+def test_next_fire_honours_policy_timezone() -> None:
+    store = FakeStore([_p("a", "0 9 * * *", tz="America/New_York")])
+    s = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords)
+    s.tick(datetime(2026, 1, 1, 12, 0))
+    # 09:00 EST is 14:00 UTC in January.
+    assert s.next_fire("a") == datetime(2026, 1, 1, 14, 0, tzinfo=UTC)
+    s.tick(datetime(2026, 1, 1, 14, 0, 1))
+    assert [p.name for p in s._pending] == ["a"]
+    assert s.next_fire("a") == datetime(2026, 1, 2, 14, 0, tzinfo=UTC)
+
+
+def test_seconds_until_due() -> None:
+    store = FakeStore([_p("a", "0 * * * *")])
+    s = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords)
+    assert s.seconds_until_due(datetime(2026, 1, 1, 12, 59, 30)) == 30
+    assert s.seconds_until_due(datetime(2026, 1, 1, 13, 0, 30)) == 0
+    store.replace([])
+    assert s.seconds_until_due(datetime(2026, 1, 1, 13, 0, 30)) == MAX_SLEEP_SECONDS
+
+
+def test_last_fired_is_persisted(tmp_path: Path) -> None:
+    state = tmp_path / "scheduler.json"
+    store = FakeStore([_p("a", "0 3 * * *")])
+    s = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords, state_path=state)
+    s.tick(datetime(2026, 1, 1, 2, 59))
+    assert not state.exists()
+    s.tick(datetime(2026, 1, 1, 3, 0, 2))
+    assert [p.name for p in s._pending] == ["a"]
+    s2 = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords, state_path=state)
+    assert s2._last_fired == {"a": datetime(2026, 1, 1, 3, tzinfo=UTC)}
+
+
+def test_state_is_written_outside_the_lock(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    import icloudpd_web.scheduler.scheduler as scheduler_module
+
+    state = tmp_path / "scheduler.json"
+    store = FakeStore([_p("a", "0 3 * * *")])
+    s = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords, state_path=state)
+    held: list[bool] = []
+    replace = os.replace
+
+    def spy(src: Path, dst: Path) -> None:
+        held.append(s._lock.locked())
+        replace(src, dst)
+
+    monkeypatch.setattr(scheduler_module.os, "replace", spy)
+    s.tick(datetime(2026, 1, 1, 3, 0, 2))
+    assert held == [False]
+    assert json.loads(state.read_text())["last_fired"] == {"a": "2026-01-01T03:00:00+00:00"}
+
+
+def test_catches_up_start_missed_while_down(tmp_path: Path) -> None:
+    state = tmp_path / "scheduler.json"
+    store = FakeStore([_p("a", "0 3 * * *")])
+    s = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords, state_path=state)
+    s.tick(datetime(2026, 1, 1, 3, 0, 2))
+    # Down from 02:00 to 05:00 the next day: the 03:00 start was missed.
+    restarted = datetime(2026, 1, 2, 5, 0)
+    off = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords, state_path=state)
+    off.tick(restarted)
+    assert off._pending == []
+    on = Scheduler(
+        store=store,
+        runner=FakeRunner(),
+        password_lookup=_passwords,
+        catch_up_hours=6,
+        state_path=state,
+    )
+    on.tick(restarted)
+    assert [p.name for p in on._pending] == ["a"]
+    # Once only: the next start is the regular one.
+    assert on.next_fire("a") == datetime(2026, 1, 3, 3, tzinfo=UTC)
+    on.tick(restarted + timedelta(minutes=5))
+    assert len(on._pending) == 1
+
+
+def test_no_catch_up_outside_window_or_without_history(tmp_path: Path) -> None:
+    state = tmp_path / "scheduler.json"
+    store = FakeStore([_p("a", "0 3 * * *")])
+    fresh = Scheduler(
+        store=store, runner=FakeRunner(), password_lookup=_passwords, catch_up_hours=6
+    )
+    fresh.tick(datetime(2026, 1, 2, 5, 0))
+    assert fresh._pending == []
+    s = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords, state_path=state)
+    s.tick(datetime(2026, 1, 1, 3, 0, 2))
+    late = Scheduler(
+        store=store,
+        runner=FakeRunner(),
+        password_lookup=_passwords,
+        catch_up_hours=1,
+        state_path=state,
+    )
+    late.tick(datetime(2026, 1, 2, 5, 0))
+    assert late._pending == []
+
+
+def test_stalled_loop_start_within_window(tmp_path: Path) -> None:
+    store = FakeStore([_p("a", "0 3 * * *"), _p("b", "0 3 * * *")])
+    s = Scheduler(store=store, runner=FakeRunner(), password_lookup=_passwords)
+    s.tick(datetime(2026, 1, 1, 2, 0))
+    # The loop is blocked across 03:00; with catch-up off the start is lost.
+    s.tick(datetime(2026, 1, 1, 3, 20))
+    assert s._pending == []
+    s.set_options(jitter_minutes=0, catch_up_hours=1)
+    s.tick(datetime(2026, 1, 2, 2, 0))
+    s.tick(datetime(2026, 1, 2, 3, 20))
+    assert sorted(p.name for p in s._pending) == ["a", "b"]
+
+
+def test_unreadable_state_is_ignored(tmp_path: Path) -> None:
+    state = tmp_path / "scheduler.json"
+    state.write_text("{not json", encoding="utf-8")
+    s = Scheduler(
+        store=FakeStore([]), runner=FakeRunner(), password_lookup=_passwords, state_path=state
+    )
+    assert s._last_fired == {}
+
+
 def test_localize_with_named_timezone() -> None:
     """_localize converts a UTC-aware datetime into the policy's timezone."""
 
@@ -130,8 +347,6 @@ async def test_drain_pending_logs_on_start_failure() -> None:
 
 async def test_run_forever_stops_on_stop() -> None:
     """run_forever exits cleanly when stop() is called."""
-    import asyncio
-
     store = FakeStore([])
     runner = FakeRunner()
     s = Scheduler(store=store, runner=runner, password_lookup=_passwords)
@@ -124,3 +124,55 @@ def test_invalid_toml_file_is_skipped_with_warning(
     s.load()
     assert s.all() == []
     assert any("skipping invalid policy file" in r.message for r in caplog.records)
+
+
+async def test_wait_changed_wakes_on_put_from_thread(store: PolicyStore) -> None:
+    g0 = store.generation
+    waiter = asyncio.create_task(store.wait_changed(g0, max_wait=5))
+    await asyncio.sleep(0)
+    # Sync endpoints mutate the store from threadpool threads.
+    await asyncio.to_thread(store.put, _policy("a"))
+    assert await asyncio.wait_for(waiter, timeout=5) == g0 + 1
+
+
+async def test_wait_changed_returns_immediately_when_stale(store: PolicyStore) -> None:
+    store.bump()
+    assert await store.wait_changed(0, max_wait=5) == 1
+
+
+async def test_wait_changed_timeout_returns_current(store: PolicyStore) -> None:
+    g0 = store.generation
+    assert await store.wait_changed(g0, max_wait=0.01) == g0
+
+
+def test_changes_since_returns_typed_deltas(store: PolicyStore) -> None:
+    store.put(_policy("a"))
+    store.bump("run_started", {"name": "a", "run_id": "a-1"})
+    store.delete("a")
+    assert store.changes_since(0) == [
+        (1, "policy_upserted", {"name": "a"}),
+        (2, "run_started", {"name": "a", "run_id": "a-1"}),
+        (3, "policy_deleted", {"name": "a"}),
+    ]
+    assert [c[0] for c in store.changes_since(2) or []] == [3]
+    assert store.changes_since(3) == []
+
+
+def test_changes_since_requires_resync_when_evicted(store: PolicyStore) -> None:
+    for _ in range(store.CHANGE_LOG_CAP + 5):
+        store.bump()
+    assert store.changes_since(0) is None
+    assert store.changes_since(store.generation - 1) == [(store.generation, "generation", {})]
+    # A client id from before a restart is ahead of us: also a resync.
+    assert store.changes_since(store.generation + 10) is None
+
+
+def test_changes_since_requires_resync_across_restarts(tmp_path: Path) -> None:
+    before = PolicyStore(tmp_path)
+    before.bump()
+    after = PolicyStore(tmp_path)
+    after.bump()
+    after.bump()
+    assert before.boot_id != after.boot_id
+    assert after.changes_since(1, boot_id=before.boot_id) is None
+    assert after.changes_since(1, boot_id=after.boot_id) == [(2, "generation", {})]
@@ -1,5 +1,5 @@
 import { apiFetch } from "./client";
-import type { RunSummary } from "@/types/api";
+import type { AwsSyncStatus, LogSearchHit, LogSearchParams, RunSummary } from "@/types/api";
 
 export const runsApi = {
   start: (policyName: string) =>
@@ -11,4 +11,23 @@ export const runsApi = {
   history: (policyName: string) =>
     apiFetch<RunSummary[]>(`/policies/${encodeURIComponent(policyName)}/runs`),
   logUrl: (runId: string) => `/runs/${runId}/log`,
+  logTailUrl: (runId: string, lines: number) => `/runs/${runId}/log?tail=${lines}`,
+  search: (params: LogSearchParams) => {
+    const qs = new URLSearchParams();
+    for (const [key, value] of Object.entries(params)) {
+      if (value !== undefined && value !== null && value !== "") qs.set(key, String(value));
+    }
+    return apiFetch<LogSearchHit[]>(`/runs/search?${qs}`);
+  },
+  awsSync: (runId: string) => apiFetch<AwsSyncStatus>(`/runs/${runId}/aws`),
+  awsSyncLogUrl: (runId: string) => `/runs/${runId}/aws/log`,
+  fullSync: (policyName: string) =>
+    apiFetch<{ run_id: string }>(`/policies/${encodeURIComponent(policyName)}/aws/sync`, {
+      method: "POST",
+    }),
+  sweep: (policyName: string, dryRun: boolean) =>
+    apiFetch<{ run_id: string }>(`/policies/${encodeURIComponent(policyName)}/sweep`, {
+      method: "POST",
+      body: { dry_run: dryRun },
+    }),
 };
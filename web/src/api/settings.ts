@@ -1,8 +1,9 @@
 import { apiFetch } from "./client";
-import type { AppSettings } from "@/types/api";
+import type { AppSettings, NotificationStats } from "@/types/api";
 
 export const settingsApi = {
   get: () => apiFetch<AppSettings>("/settings"),
   put: (settings: AppSettings) =>
     apiFetch<AppSettings>("/settings", { method: "PUT", body: settings }),
+  notificationStats: () => apiFetch<NotificationStats>("/settings/notifications"),
 };
@@ -248,6 +248,29 @@ export function EditPolicyModal({
                   </FieldWithInfo>
                 </FormControl>
 
+                <FormControl>
+                  <FieldWithInfo
+                    label="Start jitter (minutes)"
+                    info="Delay each scheduled start by a fixed, per-policy amount within this window, so policies sharing a schedule don't all start at once. Leave blank for server default."
+                  >
+                    <Input
+                      type="number"
+                      min={0}
+                      max={1440}
+                      value={formData.jitter_minutes ?? ""}
+                      onChange={(e) =>
+                        update(
+                          "jitter_minutes",
+                          e.target.value === "" ? null : Number(e.target.value),
+                        )
+                      }
+                      maxW="200px"
+                      placeholder="0"
+                      isDisabled={!formData.enabled}
+                    />
+                  </FieldWithInfo>
+                </FormControl>
+
                 <IntegrationField
                   value={formData.upload_to_aws_s3}
                   onChange={(value) => update("upload_to_aws_s3", value)}
@@ -327,6 +350,84 @@ export function EditPolicyModal({
                           />
                         </FieldWithInfo>
                       </FormControl>
+                      <FormControl>
+                        <FieldWithInfo
+                          label="S3 Endpoint URL"
+                          info="Optional — for S3-compatible storage such as MinIO. Leave blank for AWS."
+                        >
+                          <Input
+                            value={formData.aws_endpoint_url}
+                            onChange={(e) =>
+                              update("aws_endpoint_url", e.target.value)
+                            }
+                            maxW="300px"
+                          />
+                        </FieldWithInfo>
+                      </FormControl>
+                      <FormControl>
+                        <FieldWithInfo
+                          label="Upload Only New Downloads"
+                          info="After each run, upload just the files it downloaded instead of syncing the whole directory."
+                        >
+                          <Switch
+                            isChecked={formData.aws_incremental}
+                            onChange={(e) =>
+                              update("aws_incremental", e.target.checked)
+                            }
+                          />
+                        </FieldWithInfo>
+                      </FormControl>
+                      {formData.aws_incremental && (
+                        <>
+                          <FormControl>
+                            <FieldWithInfo
+                              label="Upload While Downloading"
+                              info="Start uploading each file as soon as it is downloaded (and kept by the filters), rather than after the run. Files from a failed run are still uploaded."
+                            >
+                              <Switch
+                                isChecked={formData.aws_upload_while_downloading}
+                                onChange={(e) =>
+                                  update("aws_upload_while_downloading", e.target.checked)
+                                }
+                              />
+                            </FieldWithInfo>
+                          </FormControl>
+                          <FormControl>
+                            <FieldWithInfo
+                              label="Part Size (MiB)"
+                              info="Files larger than this are uploaded in parts of this size (5 to 5120)."
+                            >
+                              <Input
+                                type="number"
+                                min={5}
+                                max={5120}
+                                value={formData.aws_part_size_mb}
+                                onChange={(e) =>
+                                  update("aws_part_size_mb", Number(e.target.value))
+                                }
+                                maxW="200px"
+                              />
+                            </FieldWithInfo>
+                          </FormControl>
+                          <FormControl>
+                            <FieldWithInfo
+                              label="Parallel Parts"
+                              info="How many parts of one file to upload at once (1 to 32)."
+                            >
+                              <Input
+                                type="number"
+                                min={1}
+                                max={32}
+                                value={formData.aws_parallel_parts}
+                                onChange={(e) =>
+                                  update("aws_parallel_parts", Number(e.target.value))
+                                }
+                                maxW="200px"
+                              />
+                            </FieldWithInfo>
+                          </FormControl>
+                        </>
+                      )}
                     </VStack>
                   </Box>
                 )}
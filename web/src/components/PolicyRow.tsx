@@ -23,6 +23,7 @@ import { ApiError } from "@/api/client";
 import { useStartRun, useStopRun } from "@/hooks/useRuns";
 import { useRunEvents } from "@/hooks/useRunEvents";
 import { runsApi } from "@/api/runs";
+import { MAX_LOG_LINES } from "@/store/runStore";
 import { pushError, pushSuccess } from "@/store/toastStore";
 import { PolicyDialogs } from "./PolicyDialogs";
 
@@ -33,6 +34,7 @@ interface PolicyRowProps {
 type PolicyRowState =
   | "ready"
   | "waiting"
+  | "queued"
   | "running"
   | "errored"
   | "awaiting_mfa"
@@ -70,6 +72,10 @@ export const PolicyRow = ({ policy }: PolicyRowProps) => {
   const [policyRowState, setPolicyRowState] = useState<PolicyRowState>("ready");
 
   useEffect(() => {
+    if (policy.queue_position != null) {
+      setPolicyRowState("queued");
+      return;
+    }
     if (policy.is_running) {
       if (runState?.status === "awaiting_mfa") {
         setPolicyRowState("awaiting_mfa");
@@ -83,7 +89,7 @@ export const PolicyRow = ({ policy }: PolicyRowProps) => {
     else if (lastStatus === "success") setPolicyRowState("done");
     else if (lastStatus === "awaiting_mfa") setPolicyRowState("awaiting_mfa");
     else setPolicyRowState("ready");
-  }, [policy.is_running, policy.last_run, runState?.status]);
+  }, [policy.queue_position, policy.is_running, policy.last_run, runState?.status]);
 
   // Auto-open MFA modal when a run is awaiting_mfa; auto-close it when it
   // transitions out (icloudpd accepted the code, the run failed, or the
@@ -122,8 +128,8 @@ export const PolicyRow = ({ policy }: PolicyRowProps) => {
     return runState.logs.map((l) => l.line).join("\n");
   }, [runState]);
 
-  // When the row is expanded and we have no live logs, fetch the persisted log
-  // for the last completed run.
+  // When the row is expanded and we have no live logs, fetch the tail of the
+  // persisted log for the last completed run; Export still downloads it whole.
   const [historicalLog, setHistoricalLog] = useState<string>("");
   useEffect(() => {
     const runId = policy.last_run?.run_id;
@@ -131,7 +137,7 @@ export const PolicyRow = ({ policy }: PolicyRowProps) => {
       return;
     }
     let aborted = false;
-    fetch(runsApi.logUrl(runId), { credentials: "include" })
+    fetch(runsApi.logTailUrl(runId, MAX_LOG_LINES), { credentials: "include" })
       .then((r) => (r.ok ? r.text() : ""))
       .then((text) => {
         if (!aborted) setHistoricalLog(text);
@@ -192,6 +198,7 @@ export const PolicyRow = ({ policy }: PolicyRowProps) => {
             size="sm"
           />
         );
+      case "queued":
       case "running":
         return (
           <IconButton
@@ -243,6 +250,12 @@ export const PolicyRow = ({ policy }: PolicyRowProps) => {
             running
           </Text>
         );
+      case "queued":
+        return (
+          <Text color="purple.500" fontWeight="medium">
+            queued
+          </Text>
+        );
       case "errored":
         return (
           <Text color="red.500" fontWeight="medium">
@@ -280,6 +293,8 @@ export const PolicyRow = ({ policy }: PolicyRowProps) => {
     switch (state) {
       case "running":
         return "blue";
+      case "queued":
+        return "purple";
       case "errored":
         return "red";
       case "awaiting_mfa":
@@ -330,15 +345,17 @@ export const PolicyRow = ({ policy }: PolicyRowProps) => {
                     : downloaded > 0
                       ? `running • ${downloaded}`
                       : "running…"
-                  : policyRowState === "awaiting_mfa"
-                    ? "awaiting 2FA"
-                    : policyRowState === "errored"
-                      ? "failed"
-                      : policyRowState === "done"
-                        ? total > 0
-                          ? `done • ${downloaded}/${total}`
-                          : "done"
-                        : "idle"}
+                  : policyRowState === "queued"
+                    ? `queued • #${policy.queue_position}`
+                    : policyRowState === "awaiting_mfa"
+                      ? "awaiting 2FA"
+                      : policyRowState === "errored"
+                        ? "failed"
+                        : policyRowState === "done"
+                          ? total > 0
+                            ? `done • ${downloaded}/${total}`
+                            : "done"
+                          : "idle"}
               </Text>
               <Progress
                 isIndeterminate={
@@ -37,14 +37,51 @@ export function useSetPolicyPassword() {
   });
 }
 
+interface PolicyDelta {
+  generation: number;
+  name: string;
+  policy?: PolicyView | null;
+}
+
+const UPSERT_KINDS = [
+  "policy_upserted",
+  "run_queued",
+  "run_started",
+  "run_progress",
+  "run_finished",
+] as const;
+
 export function usePoliciesLiveUpdate(enabled: boolean) {
   const qc = useQueryClient();
   useEffect(() => {
     if (!enabled) return;
+    const upsert = (data: unknown) => {
+      const { name, policy } = data as PolicyDelta;
+      if (!policy) {
+        qc.invalidateQueries({ queryKey: LIST_KEY });
+        return;
+      }
+      qc.setQueryData<PolicyView[]>(LIST_KEY, (old) => {
+        if (!old) return old;
+        const idx = old.findIndex((p) => p.name === name);
+        if (idx === -1) return [...old, policy];
+        const next = [...old];
+        next[idx] = policy;
+        return next;
+      });
+      qc.setQueryData(["policies", name], policy);
+    };
     const sub = subscribeEvents("/policies/stream", {
+      // Full resync: the server could not send deltas for this gap.
       generation: () => {
         qc.invalidateQueries({ queryKey: LIST_KEY });
       },
+      ...Object.fromEntries(UPSERT_KINDS.map((kind) => [kind, upsert])),
+      policy_deleted: (data) => {
+        const { name } = data as PolicyDelta;
+        qc.setQueryData<PolicyView[]>(LIST_KEY, (old) => old?.filter((p) => p.name !== name));
+        qc.removeQueries({ queryKey: ["policies", name], exact: true });
+      },
     });
     return () => sub.close();
   }, [enabled, qc]);
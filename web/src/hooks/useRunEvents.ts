@@ -1,7 +1,8 @@
 import { useEffect } from "react";
 import { useQueryClient } from "@tanstack/react-query";
+import { runsApi } from "@/api/runs";
 import { subscribeEvents } from "@/api/sse";
-import { useRunStore } from "@/store/runStore";
+import { MAX_LOG_LINES, useRunStore } from "@/store/runStore";
 import type { RunStatus } from "@/types/api";
 
 interface StatusPayload {
@@ -18,21 +19,46 @@ interface LogPayload {
   line: string;
 }
 
+interface LogBatchPayload {
+  lines: string[];
+}
+
 export function useRunEvents(runId: string | null, policyName: string | null) {
   const qc = useQueryClient();
   const init = useRunStore((s) => s.init);
   const appendLog = useRunStore((s) => s.appendLog);
+  const appendLogs = useRunStore((s) => s.appendLogs);
+  const replaceLogs = useRunStore((s) => s.replaceLogs);
   const setProgress = useRunStore((s) => s.setProgress);
   const setStatus = useRunStore((s) => s.setStatus);
 
   useEffect(() => {
     if (!runId || !policyName) return;
     init(runId, policyName);
+    let closed = false;
     const sub = subscribeEvents(`/runs/${runId}/events`, {
       log: (data, id) => {
         const payload = data as LogPayload;
         appendLog(runId, payload.line, id);
       },
+      log_batch: (data, id) => {
+        const payload = data as LogBatchPayload;
+        appendLogs(runId, payload.lines, id);
+      },
+      // The server skipped events we fell behind on; the lines they carried
+      // are only in the log file now, so take its tail as the buffer.
+      resync: (_data, id) => {
+        fetch(runsApi.logTailUrl(runId, MAX_LOG_LINES), { credentials: "include" })
+          .then((r) => (r.ok ? r.text() : null))
+          .then((text) => {
+            if (closed || text === null) return;
+            const lines = text ? text.replace(/\n$/, "").split("\n") : [];
+            replaceLogs(runId, lines, id);
+          })
+          .catch(() => {
+            /* keep what we have; the lines are still in the full log */
+          });
+      },
       progress: (data) => {
         const payload = data as ProgressPayload;
         setProgress(runId, payload.downloaded, payload.total);
@@ -40,14 +66,18 @@ export function useRunEvents(runId: string | null, policyName: string | null) {
       status: (data) => {
         const payload = data as StatusPayload;
         setStatus(runId, payload.status, payload.error_id ?? null);
-        if (payload.status !== "running" && payload.status !== "awaiting_mfa") {
+        const live = ["queued", "running", "awaiting_mfa"];
+        if (!live.includes(payload.status)) {
           qc.invalidateQueries({ queryKey: ["policies"] });
           qc.invalidateQueries({ queryKey: ["runs", "history", policyName] });
         }
       },
     });
-    return () => sub.close();
-  }, [runId, policyName, init, appendLog, setProgress, setStatus, qc]);
+    return () => {
+      closed = true;
+      sub.close();
+    };
+  }, [runId, policyName, init, appendLog, appendLogs, replaceLogs, setProgress, setStatus, qc]);
 
   return useRunStore((s) => (runId ? s.runs[runId] ?? null : null));
 }
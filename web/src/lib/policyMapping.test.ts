@@ -163,6 +163,28 @@ describe("toBackendPolicy", () => {
     });
   });
 
+  it("roundtrip keeps incremental upload settings", () => {
+    const view: PolicyView = {
+      ...baseView,
+      aws: {
+        enabled: true,
+        bucket: "b",
+        endpoint_url: "http://minio:9000",
+        incremental: true,
+        part_size_mb: 64,
+        parallel_parts: 8,
+        upload_while_downloading: true,
+      },
+    };
+    expect(toBackendPolicy(fromPolicyView(view)).aws).toMatchObject({
+      endpoint_url: "http://minio:9000",
+      incremental: true,
+      part_size_mb: 64,
+      parallel_parts: 8,
+      upload_while_downloading: true,
+    });
+  });
+
   it("roundtrip stability: toBackend(fromPolicyView(view)) preserves meta + icloudpd", () => {
     const view: PolicyView = {
       ...baseView,
@@ -22,12 +22,18 @@ const NEW_BACKEND_EXTRAS = new Set([
   "cron",
   "enabled",
   "timezone",
+  "jitter_minutes",
   "library_kind",
   "aws_bucket",
   "aws_prefix",
   "aws_region",
   "aws_access_key_id",
   "aws_secret_access_key",
+  "aws_endpoint_url",
+  "aws_incremental",
+  "aws_part_size_mb",
+  "aws_parallel_parts",
+  "aws_upload_while_downloading",
   "has_password",
   "filter_file_suffixes",
   "filter_match_patterns",
@@ -40,12 +46,18 @@ export interface FormPolicy extends OldPolicy {
   cron: string;
   enabled: boolean;
   timezone: string | null;
+  jitter_minutes: number | null;
   library_kind: "personal" | "shared";
   aws_bucket: string;
   aws_prefix: string;
   aws_region: string;
   aws_access_key_id: string;
   aws_secret_access_key: string;
+  aws_endpoint_url: string;
+  aws_incremental: boolean;
+  aws_part_size_mb: number;
+  aws_parallel_parts: number;
+  aws_upload_while_downloading: boolean;
   // has_password is read from PolicyView when editing
   has_password?: boolean;
   // Post-download filter fields
@@ -97,12 +109,18 @@ export function defaultFormPolicy(): FormPolicy {
     cron: "0 * * * *",
     enabled: true,
     timezone: null,
+    jitter_minutes: null,
     library_kind: "personal",
     aws_bucket: "",
     aws_prefix: "",
     aws_region: "",
     aws_access_key_id: "",
     aws_secret_access_key: "",
+    aws_endpoint_url: "",
+    aws_incremental: false,
+    aws_part_size_mb: 16,
+    aws_parallel_parts: 4,
+    aws_upload_while_downloading: false,
     // post-download filter fields:
     filter_file_suffixes: [],
     filter_match_patterns: [],
@@ -126,6 +144,7 @@ export function fromPolicyView(view: PolicyView): FormPolicy {
     cron: view.cron,
     enabled: view.enabled,
     timezone: view.timezone ?? null,
+    jitter_minutes: view.jitter_minutes ?? null,
     library_kind: view.library_kind ?? "personal",
     upload_to_aws_s3: view.aws != null && view.aws.enabled !== false,
     aws_bucket: view.aws?.bucket ?? "",
@@ -133,6 +152,11 @@ export function fromPolicyView(view: PolicyView): FormPolicy {
     aws_region: view.aws?.region ?? "",
     aws_access_key_id: view.aws?.access_key_id ?? "",
     aws_secret_access_key: view.aws?.secret_access_key ?? "",
+    aws_endpoint_url: view.aws?.endpoint_url ?? "",
+    aws_incremental: view.aws?.incremental ?? false,
+    aws_part_size_mb: view.aws?.part_size_mb ?? 16,
+    aws_parallel_parts: view.aws?.parallel_parts ?? 4,
+    aws_upload_while_downloading: view.aws?.upload_while_downloading ?? false,
     has_password: view.has_password,
     filter_file_suffixes: view.filters?.file_suffixes ?? [],
     filter_match_patterns: view.filters?.match_patterns ?? [],
@@ -161,6 +185,7 @@ export function toBackendPolicy(form: FormPolicy): BackendPolicy {
     cron: form.cron,
     enabled: form.enabled,
     timezone: form.timezone,
+    jitter_minutes: form.jitter_minutes,
     icloudpd,
     library_kind: form.library_kind,
     aws: form.upload_to_aws_s3
@@ -171,6 +196,11 @@ export function toBackendPolicy(form: FormPolicy): BackendPolicy {
           region: form.aws_region || undefined,
           access_key_id: form.aws_access_key_id || undefined,
           secret_access_key: form.aws_secret_access_key || undefined,
+          endpoint_url: form.aws_endpoint_url || undefined,
+          incremental: form.aws_incremental,
+          part_size_mb: form.aws_part_size_mb,
+          parallel_parts: form.aws_parallel_parts,
+          upload_while_downloading: form.aws_incremental && form.aws_upload_while_downloading,
         }
       : null,
     filters: {
@@ -21,12 +21,14 @@ interface Store {
   runs: Record<string, RunStateEntry>;
   init(runId: string, policyName: string): void;
   appendLog(runId: string, line: string, seq: string): void;
+  appendLogs(runId: string, lines: string[], seq: string): void;
+  replaceLogs(runId: string, lines: string[], seq: string): void;
   setProgress(runId: string, downloaded: number, total: number): void;
   setStatus(runId: string, status: RunStatus, errorId?: string | null): void;
   clear(runId: string): void;
 }
 
-const MAX_LINES = 2000;
+export const MAX_LOG_LINES = 2000;
 
 export const useRunStore = create<Store>((set) => ({
   runs: {},
@@ -51,11 +53,33 @@ export const useRunStore = create<Store>((set) => ({
       const entry = state.runs[runId];
       if (!entry) return state;
       const seqNum = Number(seq) || entry.logs.length;
-      const logs = [...entry.logs, { seq: seqNum, line }].slice(-MAX_LINES);
+      const logs = [...entry.logs, { seq: seqNum, line }].slice(-MAX_LOG_LINES);
       return {
         runs: { ...state.runs, [runId]: { ...entry, logs, lastEventId: seq } },
       };
     }),
+  appendLogs: (runId, lines, seq) =>
+    set((state) => {
+      const entry = state.runs[runId];
+      if (!entry) return state;
+      const seqNum = Number(seq) || entry.logs.length;
+      const logs = [...entry.logs, ...lines.map((line) => ({ seq: seqNum, line }))].slice(
+        -MAX_LOG_LINES
+      );
+      return {
+        runs: { ...state.runs, [runId]: { ...entry, logs, lastEventId: seq } },
+      };
+    }),
+  replaceLogs: (runId, lines, seq) =>
+    set((state) => {
+      const entry = state.runs[runId];
+      if (!entry) return state;
+      const seqNum = Number(seq) || 0;
+      const logs = lines.slice(-MAX_LOG_LINES).map((line) => ({ seq: seqNum, line }));
+      return {
+        runs: { ...state.runs, [runId]: { ...entry, logs } },
+      };
+    }),
   setProgress: (runId, downloaded, total) =>
     set((state) => {
       const entry = state.runs[runId];
@@ -5,6 +5,11 @@ export interface PolicyAwsConfig {
   region?: string;
   access_key_id?: string;
   secret_access_key?: string;
+  endpoint_url?: string | null;
+  incremental?: boolean;
+  part_size_mb?: number;
+  parallel_parts?: number;
+  upload_while_downloading?: boolean;
 }
 
 export interface Filters {
@@ -23,6 +28,7 @@ export interface Policy {
   cron: string;
   enabled: boolean;
   timezone?: string | null;
+  jitter_minutes?: number | null;
   icloudpd: Record<string, unknown>;
   library_kind?: LibraryKind | null;
   aws: PolicyAwsConfig | null;
@@ -30,6 +36,7 @@ export interface Policy {
 }
 
 export type RunStatus =
+  | "queued"
   | "running"
   | "awaiting_mfa"
   | "success"
@@ -48,11 +55,49 @@ export interface RunSummary {
   total?: number;
 }
 
+export interface LogSearchParams {
+  q: string;
+  policy?: string;
+  run_id?: string;
+  level?: string;
+  since?: string;
+  until?: string;
+  limit?: number;
+}
+
+export interface LogSearchHit {
+  run_id: string;
+  policy_name: string;
+  line_no: number;
+  offset: number;
+  ts: string | null;
+  level: string | null;
+  line: string;
+}
+
+export interface AwsSyncStatus {
+  run_id: string;
+  policy_name: string;
+  status: "running" | "success" | "failed" | "interrupted";
+  mode: "sync" | "incremental" | "pipelined";
+  started_at: number;
+  ended_at: number | null;
+  exit_code: number | null;
+  uploaded: number;
+  failed: number;
+  skipped: number;
+  bytes_done: number | null;
+  bytes_total: number | null;
+  files_remaining: number | null;
+  tail: string[];
+}
+
 export interface PolicyView extends Policy {
   is_running: boolean;
   active_run_id?: string | null;
   next_run_at?: string | null;
   last_run?: RunSummary | null;
+  queue_position?: number | null;
   has_password: boolean;
 }
 
@@ -64,6 +109,25 @@ export interface AuthStatus {
 export interface AppSettings {
   apprise: { urls: string[]; on_start: boolean; on_success: boolean; on_failure: boolean };
   retention_runs: number;
+  compress_logs: boolean;
+  max_concurrent_runs: number;
+  max_runs_per_account: number;
+  schedule_jitter_minutes: number;
+  schedule_catch_up_hours: number;
+  filter_workers: number;
+  filter_executor: "thread" | "process";
+}
+
+export interface NotificationStats {
+  queued: number;
+  delivered: number;
+  failed: number;
+  retried: number;
+  dropped: number;
+  pending: number;
+  last_error: string | null;
+  last_delivered_at: number | null;
+  last_failed_at: number | null;
 }
 
 export interface ApiErrorBody {
@@ -37,8 +37,8 @@ class FakeEventSource {
   }
   removeEventListener() {}
   close() {}
-  dispatch(type: string) {
-    const e = new MessageEvent(type, { data: JSON.stringify({ generation: 2 }) });
+  dispatch(type: string, data: unknown = { generation: 2 }) {
+    const e = new MessageEvent(type, { data: JSON.stringify(data) });
     (this.listeners[type] || []).forEach((fn) => fn(e));
   }
 }
@@ -84,4 +84,34 @@ describe("usePolicies + usePoliciesLiveUpdate", () => {
 
     await waitFor(() => expect(callCount).toBe(2));
   });
+
+  it("patches the list from typed deltas without refetching", async () => {
+    const W = wrapper();
+    const { result } = renderHook(
+      () => {
+        usePoliciesLiveUpdate(true);
+        return usePolicies();
+      },
+      { wrapper: W }
+    );
+
+    await waitFor(() => expect(result.current.isSuccess).toBe(true));
+    const running = { ...result.current.data![0], is_running: true, active_run_id: "p-1" };
+
+    act(() => {
+      FakeEventSource.last!.dispatch("run_started", {
+        generation: 3,
+        name: "p",
+        run_id: "p-1",
+        policy: running,
+      });
+    });
+    await waitFor(() => expect(result.current.data![0].is_running).toBe(true));
+
+    act(() => {
+      FakeEventSource.last!.dispatch("policy_deleted", { generation: 4, name: "p" });
+    });
+    await waitFor(() => expect(result.current.data).toEqual([]));
+    expect(callCount).toBe(1);
+  });
 });
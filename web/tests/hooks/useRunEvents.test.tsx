@@ -1,5 +1,5 @@
-import { describe, expect, it, beforeAll, afterAll, beforeEach } from "vitest";
-import { renderHook, act } from "@testing-library/react";
+import { describe, expect, it, beforeAll, afterAll, beforeEach, vi } from "vitest";
+import { renderHook, act, waitFor } from "@testing-library/react";
 import { QueryClient, QueryClientProvider } from "@tanstack/react-query";
 import type { ReactNode } from "react";
 import { useRunEvents } from "@/hooks/useRunEvents";
@@ -53,4 +53,39 @@ describe("useRunEvents", () => {
     expect(run.total).toBe(5);
     expect(run.status).toBe("success");
   });
+
+  it("appends every line of a log_batch", () => {
+    renderHook(() => useRunEvents("r2", "p1"), { wrapper: wrapper() });
+    const es = FakeEventSource.last!;
+    act(() => {
+      es.emit("log_batch", { lines: ["a", "b"] }, "4");
+    });
+    const run = useRunStore.getState().runs["r2"];
+    expect(run.logs.map((l) => l.line)).toEqual(["a", "b"]);
+    expect(run.lastEventId).toBe("4");
+  });
+
+  it("replaces the buffer with the log tail on resync", async () => {
+    const origFetch = globalThis.fetch;
+    const spy = vi.fn().mockResolvedValueOnce(new Response("x\ny\nz\n", { status: 200 }));
+    globalThis.fetch = spy as unknown as typeof fetch;
+    try {
+      renderHook(() => useRunEvents("r3", "p1"), { wrapper: wrapper() });
+      const es = FakeEventSource.last!;
+      act(() => {
+        es.emit("log_batch", { lines: ["x"] }, "2");
+        es.emit("resync", { missed_from: 3, resume_at: 9 }, "2");
+      });
+      expect(spy).toHaveBeenCalledWith("/runs/r3/log?tail=2000", { credentials: "include" });
+      await waitFor(() =>
+        expect(useRunStore.getState().runs["r3"].logs.map((l) => l.line)).toEqual([
+          "x",
+          "y",
+          "z",
+        ])
+      );
+    } finally {
+      globalThis.fetch = origFetch;
+    }
+  });
 });
@@ -33,4 +33,14 @@ describe("runStore", () => {
     expect(run.total).toBe(10);
     expect(run.status).toBe("success");
   });
+
+  it("replaces logs, keeping the newest 2000", () => {
+    useRunStore.getState().init("r1", "p1");
+    useRunStore.getState().appendLog("r1", "stale", "1");
+    const lines = Array.from({ length: 2500 }, (_, i) => `line ${i}`);
+    useRunStore.getState().replaceLogs("r1", lines, "7");
+    const logs = useRunStore.getState().runs["r1"].logs;
+    expect(logs.length).toBe(2000);
+    expect(logs[0]).toEqual({ seq: 7, line: "line 500" });
+  });
 });